@@ -0,0 +1,159 @@
+"""
+Micro-benchmark for track page classification and selector matching.
+
+Compares the precompiled header classifier and CSS selectors in the scraper
+against the previous substring chain and per-call selector strings, on a
+synthetic track page with hundreds of connections.
+
+Usage:
+    python benchmarks/bench_parse.py [connections_per_section]
+"""
+
+import re
+import sys
+import timeit
+
+from bs4 import BeautifulSoup
+
+from whosampled_connector import scraper as scraper_module
+from whosampled_connector.scraper import _classify_header, _select_track_links
+
+HEADERS = [
+    "Contains samples of 120 songs",
+    "Was sampled in 342 songs",
+    "Cover of",
+    "Covered in 57 songs",
+    "Remix of",
+    "Remixed in 12 songs",
+    "Music Video",
+]
+
+
+def classify_header_chain(header_text):
+    """Substring chain used before the precompiled classifier."""
+    header_text = header_text.lower()
+    if "contains sample" in header_text or (
+        "sampled" in header_text and "sampled in" not in header_text
+    ):
+        return "samples"
+    elif "sampled in" in header_text:
+        return "sampled_by"
+    elif "cover of" in header_text:
+        return "covers"
+    elif "covered in" in header_text or "covered by" in header_text:
+        return "covered_by"
+    elif "remix of" in header_text:
+        return "remixes"
+    elif "remixed in" in header_text or "remixed by" in header_text:
+        return "remixed_by"
+    return None
+
+
+# Single alternation regex, the other way to build the classifier from the
+# keyword table; kept here to show why the scraper does not use it
+_HEADER_ALTERNATION_RE = re.compile(
+    "|".join(re.escape(keyword) for keyword, _ in scraper_module._HEADER_KEYWORDS)
+)
+_HEADER_ALTERNATION_TYPES = dict(scraper_module._HEADER_KEYWORDS)
+
+
+def classify_header_regex(header_text):
+    """Classifier using one precompiled alternation regex."""
+    match = _HEADER_ALTERNATION_RE.search(header_text.lower())
+    return _HEADER_ALTERNATION_TYPES[match.group()] if match else None
+
+
+def strip_year_recompiled(text):
+    """Year suffix removal as done before, with an import and pattern per call."""
+    import re
+
+    return re.sub(r"\s*\(\d{4}\)$", "", text)
+
+
+def build_page(per_section):
+    """Build a track page with one subsection per header."""
+    sections = []
+    for header in HEADERS:
+        items = "".join(
+            f'<div class="trackItem"><span class="trackDetails">'
+            f'<a class="trackName" href="/Artist-{i}/Track-{i}/">Track {i}</a>'
+            f'<span class="trackArtist">by <a href="/Artist-{i}/">Artist {i}</a>'
+            f" (2001)</span></span></div>"
+            for i in range(per_section)
+        )
+        sections.append(
+            f'<section class="subsection"><h3>{header}</h3>{items}</section>'
+        )
+    return (
+        '<html><body><h1 class="trackName">Title</h1>'
+        '<div class="embed-placeholder" data-id="abc123"></div>'
+        + "".join(sections)
+        + "</body></html>"
+    )
+
+
+def bench(label, old, new, number):
+    old_time = timeit.timeit(old, number=number)
+    new_time = timeit.timeit(new, number=number)
+    print(
+        f"{label:<30} old {old_time * 1e6 / number:9.2f} us  "
+        f"new {new_time * 1e6 / number:9.2f} us  "
+        f"speedup {old_time / new_time:5.2f}x"
+    )
+
+
+def main():
+    per_section = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    soup = BeautifulSoup(build_page(per_section), "lxml")
+    subsections = soup.select("section.subsection")
+    headers = [s.find(["h2", "h3", "h4"]).get_text(strip=True) for s in subsections]
+
+    for header in headers:
+        assert _classify_header(header) == classify_header_chain(header), header
+        assert classify_header_regex(header) == classify_header_chain(header), header
+
+    print(f"{len(HEADERS) * per_section} connections in {len(HEADERS)} subsections\n")
+
+    bench(
+        "header classification",
+        lambda: [classify_header_chain(h) for h in headers],
+        lambda: [_classify_header(h) for h in headers],
+        20000,
+    )
+    bench(
+        "header classification (cold)",
+        lambda: [classify_header_chain(h) for h in headers],
+        lambda: [_classify_header.__wrapped__(h) for h in headers],
+        20000,
+    )
+    bench(
+        "header classification (regex)",
+        lambda: [classify_header_chain(h) for h in headers],
+        lambda: [classify_header_regex(h) for h in headers],
+        20000,
+    )
+    artist_texts = [f"Artist {i} (2001)" for i in range(per_section)]
+    bench(
+        "year suffix removal",
+        lambda: [strip_year_recompiled(t) for t in artist_texts],
+        lambda: [scraper_module._YEAR_SUFFIX_RE.sub("", t) for t in artist_texts],
+        200,
+    )
+    bench(
+        "track link selection",
+        lambda: [s.select("a.trackName") for s in subsections],
+        lambda: [_select_track_links(s) for s in subsections],
+        50,
+    )
+    bench(
+        "youtube embed lookup",
+        lambda: soup.select_one(
+            "div.embed-placeholder[data-id], div.youtube-placeholder[data-id]"
+        ),
+        lambda: scraper_module._YOUTUBE_EMBED.select_one(soup),
+        500,
+    )
+
+
+if __name__ == "__main__":
+    main()
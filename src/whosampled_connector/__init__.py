@@ -4,7 +4,24 @@ WhoSampled Connector - MCP server for searching WhoSampled
 
 __version__ = "0.1.0"
 
-from .server import main, app
-from .scraper import WhoSampledScraper
+from .models import Track, Connection, TrackDetails
 
-__all__ = ["main", "app", "WhoSampledScraper"]
+__all__ = ["main", "app", "WhoSampledScraper", "Track", "Connection", "TrackDetails"]
+
+# Loaded on first access: they pull in mcp, Playwright and BeautifulSoup
+_LAZY_ATTRIBUTES = {
+    "main": "server",
+    "app": "server",
+    "WhoSampledScraper": "scraper",
+}
+
+
+def __getattr__(name: str):
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
@@ -2,7 +2,7 @@
 Entry point for running the WhoSampled MCP server.
 """
 
-from .server import cli
+from .cli import cli
 
 if __name__ == "__main__":
     cli()
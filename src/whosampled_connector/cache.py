@@ -0,0 +1,253 @@
+"""
+In-process caches and request coalescing for WhoSampled data.
+"""
+
+import asyncio
+import contextvars
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+# True inside bypass_caches()
+_bypass: contextvars.ContextVar = contextvars.ContextVar("bypass_caches", default=False)
+
+
+@contextmanager
+def bypass_caches():
+    """
+    Fetch data again inside this block (and tasks created in it).
+
+    The scraper skips its cached pages and resolved queries there; what it
+    fetches is still stored for later calls.
+    """
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def caches_bypassed() -> bool:
+    """Check whether the current task is inside bypass_caches()."""
+    return _bypass.get()
+
+
+class TTLCache:
+    """Least-recently-used cache whose entries expire after a fixed time."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+    ):
+        """
+        Args:
+            max_entries: Maximum number of entries kept; the least recently
+                used entry is evicted first
+            ttl: Seconds after which an entry expires
+            on_evict: Called with (key, value) when an entry is dropped
+                because it expired or the cache was full (not on pop/clear)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get a cached value.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value, or None if missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            if self.on_evict is not None:
+                self.on_evict(key, value)
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entries if full."""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted_key, (_, evicted) = self._entries.popitem(last=False)
+            if self.on_evict is not None:
+                self.on_evict(evicted_key, evicted)
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """Remove an entry and return its value (None if missing)."""
+        entry = self._entries.pop(key, None)
+        return entry[1] if entry else None
+
+    def clear(self):
+        """Remove all entries."""
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Get entry count and hit/miss counters."""
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class ResponseCache:
+    """
+    Least-recently-used cache bounded by the total size of its values.
+
+    Unlike TTLCache, each entry has its own time to live, so one cache can
+    hold results that go stale at different rates.
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        Args:
+            max_bytes: Maximum total size of the cached values; the least
+                recently used entries are evicted first
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # key -> (expires_at, size, value)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get a cached value.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value, or None if missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, size, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.size -= size
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any, size: int, ttl: float):
+        """
+        Store a value, evicting the least recently used entries if full.
+
+        Args:
+            key: Cache key
+            value: Value to store
+            size: Size of the value, in the unit of max_bytes
+            ttl: Seconds after which the entry expires
+        """
+        self.pop(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (time.monotonic() + ttl, size, value)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self.size -= evicted_size
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """Remove an entry and return its value (None if missing)."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self.size -= entry[1]
+        return entry[2]
+
+    def clear(self):
+        """Remove all entries."""
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> Dict:
+        """Get entry count, total size and hit/miss counters."""
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class InFlight:
+    """
+    Shares one running task among concurrent callers with the same key.
+
+    The task is cancelled only when every caller waiting on it has been
+    cancelled, so one caller giving up does not fail the others.
+    """
+
+    def __init__(self):
+        # key -> [task, number of callers waiting]
+        self._entries: Dict[Hashable, list] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable]) -> Any:
+        """
+        Await the running task for a key, starting it if there is none.
+
+        Args:
+            key: Coalescing key
+            factory: Called without arguments to create the awaitable when no
+                task for the key is running
+
+        Returns:
+            Result of the shared task
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(factory())
+            entry = self._entries[key] = [task, 0]
+
+            def forget(_task, entry=entry):
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+
+            task.add_done_callback(forget)
+
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not entry[0].done():
+                entry[0].cancel()
@@ -0,0 +1,200 @@
+"""
+Command line entry point.
+
+Only argparse is imported here; the server, the scraper and their heavy
+dependencies (mcp, Playwright, BeautifulSoup) load once a transport is
+chosen, so --help returns at once.
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+# Log level of the server's messages on stderr (stdout carries MCP messages)
+LOG_LEVEL_ENV = "WHOSAMPLED_LOG_LEVEL"
+
+
+def cli():
+    """CLI entry point for uvx and pip installations."""
+    parser = argparse.ArgumentParser(
+        prog="whosampled-connector",
+        description=(
+            "WhoSampled MCP Server - Search WhoSampled and discover sampling sources, covers, and remixes\n"
+            "\n"
+            "WhoSampledで検索して結果を返すMCPサーバー\n"
+            "アーティスト名、曲名などの文字列を受け取ってWhoSampled?で検索を実行し、\n"
+            "その曲のサンプリングソースやカバー音源などを発見するためのMCPサーバーです。\n"
+        ),
+        epilog=(
+            "USAGE:\n"
+            "  This is an MCP (Model Context Protocol) server that communicates via stdin/stdout.\n"
+            "  It should be configured in your MCP client (e.g., Claude Desktop, Cursor).\n"
+            "\n"
+            "  使い方:\n"
+            "  これはstdin/stdoutで通信するMCP (Model Context Protocol) サーバーです。\n"
+            "  MCPクライアント（Claude Desktop、Cursorなど）で設定して使用してください。\n"
+            "\n"
+            "AVAILABLE TOOLS:\n"
+            "  search_track              - Find a track on WhoSampled by query\n"
+            "                              クエリでWhoSampledから曲を検索\n"
+            "\n"
+            "  search_tracks             - List top candidate tracks with relevance scores\n"
+            "                              関連度付きで候補曲を一覧表示\n"
+            "\n"
+            "  get_track_samples         - Discover what a song sampled, who sampled it,\n"
+            "                              covers, and remixes\n"
+            "                              サンプリング元、カバー、リミックス情報を取得\n"
+            "\n"
+            "  get_track_samples_batch   - Get samples, covers, and remixes for many tracks\n"
+            "                              複数の曲の情報を一度に取得\n"
+            "\n"
+            "  get_track_details_by_url  - Get details from a WhoSampled URL directly\n"
+            "                              WhoSampled URLから直接詳細を取得\n"
+            "\n"
+            "  get_youtube_links         - Get YouTube links from search results\n"
+            "                              検索結果からYouTubeリンクを取得\n"
+            "\n"
+            "  get_deferred_youtube_links - Collect YouTube links fetched in the background\n"
+            "                              バックグラウンドで取得したYouTubeリンクを受け取る\n"
+            "\n"
+            "  get_track_connections     - List every connection of one type, paginated\n"
+            "                              関連曲の全件をページ単位で取得\n"
+            "\n"
+            "  trace_sample_lineage      - Trace a track's sample chain several levels deep\n"
+            "                              サンプリングの系譜を複数階層たどる\n"
+            "\n"
+            "  server_stats              - Show latency percentiles, cache hit rates and\n"
+            "                              fetch queue metrics of the server\n"
+            "                              サーバーの遅延・キャッシュ・取得キューの統計\n"
+            "\n"
+            "  profile_server            - Profile the server for N seconds (WHOSAMPLED_ADMIN=1)\n"
+            "                              サーバーをN秒間プロファイルする（管理用）\n"
+            "\n"
+            "  memory_snapshot           - Snapshot memory and diff with the previous one\n"
+            "                              (WHOSAMPLED_ADMIN=1)\n"
+            "                              メモリのスナップショットと前回との差分（管理用）\n"
+            "\n"
+            "EXAMPLES:\n"
+            "  # Run the server (it will listen on stdin/stdout)\n"
+            "  whosampled-connector\n"
+            "\n"
+            "  # Serve many clients from one process over streamable HTTP\n"
+            "  # (endpoint: http://127.0.0.1:8000/mcp)\n"
+            "  whosampled-connector --transport http --port 8000\n"
+            "\n"
+            "  # Share one browser and cache among stdio clients: attach to the\n"
+            "  # local daemon, starting it on first use\n"
+            "  whosampled-connector --attach\n"
+            "\n"
+            "  # Display this help message\n"
+            "  whosampled-connector --help\n"
+            "\n"
+            "  # Configuration in Claude Desktop (claude_desktop_config.json):\n"
+            "  {\n"
+            '    "mcpServers": {\n'
+            '      "whosampled": {\n'
+            '        "command": "uvx",\n'
+            '        "args": ["--from", "git+https://github.com/dj-oyu/whosampled-connector-mcp",\n'
+            '                 "whosampled-connector"]\n'
+            "      }\n"
+            "    }\n"
+            "  }\n"
+            "\n"
+            "TESTING:\n"
+            "  This project has unit tests (fast, mocked) and integration tests (slow, real).\n"
+            "  テストにはユニットテスト（高速・モック）と統合テスト（低速・実環境）があります。\n"
+            "\n"
+            "  # Run unit tests only (recommended, ~0.1s, 20 tests)\n"
+            "  uv run pytest -v -m \"not integration\"\n"
+            "  pytest -v -m \"not integration\"\n"
+            "\n"
+            "  # Run all tests including integration tests (~30-60s, 28 tests)\n"
+            "  # Note: Requires Playwright browser: uv run playwright install chromium\n"
+            "  uv run pytest -v\n"
+            "  pytest -v\n"
+            "\n"
+            "  # Run integration tests only\n"
+            "  uv run pytest -v -m \"integration\"\n"
+            "\n"
+            "  # Run with coverage report\n"
+            "  uv run pytest --cov=whosampled_connector --cov-report=html -m \"not integration\"\n"
+            "\n"
+            "DOCUMENTATION:\n"
+            "  https://github.com/dj-oyu/whosampled-connector-mcp\n"
+        ),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+
+    parser.add_argument(
+        "--transport",
+        choices=["stdio", "http", "daemon"],
+        default="stdio",
+        help="stdio (default) for one client, streamable HTTP for many clients sharing one browser and cache, or the shared daemon on a Unix socket that --attach connects to",
+    )
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="Address to listen on with --transport http (default: 127.0.0.1)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8000,
+        help="Port to listen on with --transport http (default: 8000)",
+    )
+    parser.add_argument(
+        "--attach",
+        action="store_true",
+        help="Serve stdio through the shared daemon, starting it if it is not running",
+    )
+    parser.add_argument(
+        "--socket",
+        help="Daemon socket path for --attach and --transport daemon (default: $WHOSAMPLED_SOCKET, else per user in $XDG_RUNTIME_DIR or the temp directory)",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=0,
+        help="With --transport daemon, exit after this many seconds without clients (default: never)",
+    )
+
+    args = parser.parse_args()
+
+    level = os.environ.get(LOG_LEVEL_ENV, "WARNING").upper()
+    if not isinstance(logging.getLevelName(level), int):
+        level = "WARNING"
+    logging.basicConfig(
+        stream=sys.stderr,
+        level=level,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+    # Start the MCP server
+    if args.attach:
+        # The forwarder never starts an event loop, keep it light
+        from .daemon import attach
+
+        attach(args.socket)
+    elif args.transport == "daemon":
+        import asyncio
+
+        from .daemon import serve
+
+        asyncio.run(serve(args.socket, args.idle_timeout))
+    elif args.transport == "http":
+        import asyncio
+
+        from .http_server import serve
+
+        asyncio.run(serve(args.host, args.port))
+    else:
+        import asyncio
+
+        from .server import main
+
+        asyncio.run(main())
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,342 @@
+"""
+Shared backend daemon on a Unix socket, and the stdio forwarder attaching to it.
+
+The daemon speaks MCP with newline-delimited JSON-RPC on each socket
+connection, the same framing as the stdio transport, and serves every
+connection from one scraper, so clients share the browser and caches.
+
+``whosampled-connector --attach`` is a thin forwarder: it copies stdin to
+the socket and the socket to stdout, starting the daemon first if none is
+running. It only uses the standard library and does not even import
+asyncio, so it starts quickly.
+"""
+
+import fcntl
+import logging
+import os
+import signal
+import socket
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import BinaryIO, Optional
+
+logger = logging.getLogger(__name__)
+
+SOCKET_ENV = "WHOSAMPLED_SOCKET"
+
+# Seconds an auto-started daemon keeps running without clients
+AUTOSTART_IDLE_TIMEOUT = 900
+
+# Seconds to wait for an auto-started daemon to accept connections
+STARTUP_TIMEOUT = 30
+
+# Longest JSON-RPC line accepted from a client
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+
+def _private_directory(directory: str) -> str:
+    """
+    Create a directory only the current user can use, or check an existing one.
+
+    Raises:
+        PermissionError: If it is a symlink, belongs to another user or is
+            open to others
+    """
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(directory)
+    if (
+        not stat.S_ISDIR(info.st_mode)
+        or info.st_uid != os.getuid()
+        or info.st_mode & 0o077
+    ):
+        raise PermissionError(f"{directory} is not a private directory of this user")
+    return directory
+
+
+def default_socket_path() -> str:
+    """
+    Get the daemon socket path (WHOSAMPLED_SOCKET, else per user).
+
+    Without XDG_RUNTIME_DIR the socket and its lock and log files go to a
+    private directory under the shared temp directory, so other users
+    cannot plant files or a socket there.
+    """
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return path
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, f"whosampled-connector-{os.getuid()}.sock")
+    directory = _private_directory(
+        os.path.join(tempfile.gettempdir(), f"whosampled-connector-{os.getuid()}")
+    )
+    return os.path.join(directory, "daemon.sock")
+
+
+def _open_private(path: str, flags: int) -> int:
+    """Open or create a file of this user without following symlinks."""
+    fd = os.open(path, flags | os.O_CREAT | os.O_NOFOLLOW | os.O_CLOEXEC, 0o600)
+    if os.fstat(fd).st_uid != os.getuid():
+        os.close(fd)
+        raise PermissionError(f"{path} belongs to another user")
+    return fd
+
+
+async def _serve_connection(
+    reader: "asyncio.StreamReader", writer: "asyncio.StreamWriter"
+):
+    """Run one MCP session over a socket connection."""
+    import anyio
+    import mcp.types as types
+    from mcp.shared.message import SessionMessage
+
+    from .server import app
+
+    read_stream_writer, read_stream = anyio.create_memory_object_stream(0)
+    write_stream, write_stream_reader = anyio.create_memory_object_stream(0)
+
+    async def socket_reader():
+        async with read_stream_writer:
+            while line := await reader.readline():
+                try:
+                    message = types.JSONRPCMessage.model_validate_json(line)
+                except Exception as exc:
+                    await read_stream_writer.send(exc)
+                    continue
+                await read_stream_writer.send(SessionMessage(message))
+
+    async def socket_writer():
+        async with write_stream_reader:
+            async for session_message in write_stream_reader:
+                json = session_message.message.model_dump_json(
+                    by_alias=True, exclude_none=True
+                )
+                writer.write(json.encode() + b"\n")
+                await writer.drain()
+
+    try:
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(socket_reader)
+            tg.start_soon(socket_writer)
+            await app.run(read_stream, write_stream, app.create_initialization_options())
+            tg.cancel_scope.cancel()
+    except (ConnectionError, anyio.BrokenResourceError) as e:
+        logger.info("Daemon client disconnected: %s", e)
+    finally:
+        writer.close()
+
+
+def _take_lock(path: str):
+    """
+    Take the daemon lock next to the socket.
+
+    Returns:
+        Open lock file holding the lock, or None if another daemon has it
+    """
+    lock_file = os.fdopen(_open_private(path + ".lock", os.O_RDWR), "r+")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    lock_file.truncate(0)
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    return lock_file
+
+
+async def serve(path: Optional[str] = None, idle_timeout: float = 0):
+    """
+    Run the daemon until stopped, or until idle for idle_timeout seconds.
+
+    Exits at once if another daemon already holds the socket.
+
+    Args:
+        path: Socket path (default: default_socket_path())
+        idle_timeout: Seconds without clients before exiting (0: never)
+    """
+    import asyncio
+
+    path = path or default_socket_path()
+    lock_file = _take_lock(path)
+    if lock_file is None:
+        logger.info("Daemon already running on %s", path)
+        return
+
+    from . import loop_monitor, profiling
+    from .server import close_scraper, get_scraper, start_metrics_exporter
+
+    get_scraper()
+    exporter = await start_metrics_exporter()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    clients = 0
+    idle_timer = None
+
+    def arm_idle_timer():
+        nonlocal idle_timer
+        if idle_timeout > 0:
+            idle_timer = loop.call_later(idle_timeout, stop.set)
+
+    async def handle(reader, writer):
+        nonlocal clients
+        clients += 1
+        if idle_timer is not None:
+            idle_timer.cancel()
+        try:
+            await _serve_connection(reader, writer)
+        finally:
+            clients -= 1
+            if clients == 0:
+                arm_idle_timer()
+
+    try:
+        loop.add_signal_handler(signal.SIGTERM, stop.set)
+    except (NotImplementedError, RuntimeError, ValueError):
+        pass  # Not in the main thread
+    profiling.install_signal_handlers(loop)
+    monitor = loop_monitor.start_monitor()
+
+    try:
+        # We hold the lock, so a leftover socket file is from a dead daemon
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(handle, path, limit=MAX_MESSAGE_SIZE)
+        os.chmod(path, 0o600)
+        arm_idle_timer()
+        async with server:
+            await stop.wait()
+    finally:
+        loop.remove_signal_handler(signal.SIGTERM)
+        profiling.remove_signal_handlers(loop)
+        if monitor is not None:
+            monitor.stop()
+        if exporter is not None:
+            exporter.close()
+        if os.path.exists(path):
+            os.unlink(path)
+        await close_scraper()
+        lock_file.close()
+
+
+def _start_daemon(path: str):
+    """Start a detached daemon process serving the socket."""
+    log = os.fdopen(_open_private(path + ".log", os.O_WRONLY | os.O_APPEND), "ab")
+    subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "whosampled_connector",
+            "--transport",
+            "daemon",
+            "--socket",
+            path,
+            "--idle-timeout",
+            str(AUTOSTART_IDLE_TIMEOUT),
+        ],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=log,
+        start_new_session=True,
+    )
+    log.close()
+
+
+def _check_peer(sock: socket.socket, path: str):
+    """
+    Check that the daemon on the socket runs as the current user.
+
+    Raises:
+        PermissionError: If another user's process serves the socket
+    """
+    if hasattr(socket, "SO_PEERCRED"):
+        credentials = sock.getsockopt(
+            socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+        )
+        _, uid, _ = struct.unpack("3i", credentials)
+    else:
+        uid = os.stat(path).st_uid
+    if uid != os.getuid():
+        sock.close()
+        raise PermissionError(f"{path} is served by another user (uid {uid})")
+
+
+def connect(path: Optional[str] = None, autostart: bool = True) -> socket.socket:
+    """
+    Connect to the daemon, starting it if it is not running.
+
+    Args:
+        path: Socket path (default: default_socket_path())
+        autostart: Start a daemon if none accepts connections
+
+    Returns:
+        Connected socket
+
+    Raises:
+        OSError: If no daemon accepts connections within STARTUP_TIMEOUT
+        PermissionError: If the socket is served by another user
+    """
+    path = path or default_socket_path()
+    started = False
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    delay = 0.05
+    while True:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+            _check_peer(sock, path)
+            return sock
+        except (FileNotFoundError, ConnectionRefusedError):
+            sock.close()
+            if not autostart or time.monotonic() > deadline:
+                raise
+        if not started:
+            _start_daemon(path)
+            started = True
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+
+def forward(sock: socket.socket, stdin: BinaryIO, stdout: BinaryIO):
+    """
+    Copy stdin to the socket and the socket to stdout until either side ends.
+
+    Args:
+        sock: Connected daemon socket
+        stdin: Binary input from the MCP client
+        stdout: Binary output to the MCP client
+    """
+
+    def pump_stdin():
+        try:
+            while line := stdin.readline():
+                sock.sendall(line)
+            sock.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+
+    threading.Thread(target=pump_stdin, daemon=True).start()
+    try:
+        while data := sock.recv(65536):
+            stdout.write(data)
+            stdout.flush()
+    finally:
+        sock.close()
+
+
+def attach(path: Optional[str] = None):
+    """Serve an MCP client on stdio through the shared daemon."""
+    try:
+        sock = connect(path)
+    except OSError as e:
+        logger.error("Error connecting to the WhoSampled daemon: %s", e)
+        sys.exit(1)
+    forward(sock, sys.stdin.buffer, sys.stdout.buffer)
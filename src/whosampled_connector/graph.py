@@ -0,0 +1,291 @@
+"""
+Embedded store of the connection graph between tracks.
+"""
+
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .models import CONNECTION_TYPES, Connection, TrackDetails
+from .normalize import track_key
+
+# Connection type -> (relation, True if the page's track is the edge source).
+# "Was sampled in X" is stored as "X samples page", so both pages of a
+# sample write the same edge.
+_EDGE_DIRECTIONS = {
+    "samples": ("samples", True),
+    "sampled_by": ("samples", False),
+    "covers": ("covers", True),
+    "covered_by": ("covers", False),
+    "remixes": ("remixes", True),
+    "remixed_by": ("remixes", False),
+}
+
+# Bumped when the tables change; older stores are dropped and rebuilt from
+# new crawls, since everything in them came from the site
+_SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artists (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    title TEXT,
+    artist_id INTEGER REFERENCES artists (id),
+    youtube_id TEXT,
+    crawled_at REAL
+);
+CREATE TABLE IF NOT EXISTS edges (
+    page_id INTEGER NOT NULL REFERENCES tracks (id),
+    source_id INTEGER NOT NULL REFERENCES tracks (id),
+    relation TEXT NOT NULL,
+    target_id INTEGER NOT NULL REFERENCES tracks (id),
+    position INTEGER NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (page_id, relation, source_id, target_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS edges_by_source ON edges (source_id, relation);
+CREATE INDEX IF NOT EXISTS edges_by_target ON edges (target_id, relation);
+"""
+
+
+class GraphStore:
+    """
+    SQLite store of tracks, artists and typed edges between tracks.
+
+    Every parsed track page is written through with record_page. Track URLs
+    (by their track_key) and artist names are interned to integer IDs. Each
+    edge is stored per page that showed it, with its position on that page
+    and the time it was last seen, so a re-crawl replaces exactly what the
+    page showed before.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        """
+        Args:
+            path: SQLite database file, or ":memory:" for a store that is
+                dropped on exit
+        """
+        self.path = path
+        self._db = sqlite3.connect(path)
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        (version,) = self._db.execute("PRAGMA user_version").fetchone()
+        if version != _SCHEMA_VERSION:
+            self._db.executescript(
+                "DROP TABLE IF EXISTS edges; DROP TABLE IF EXISTS tracks; "
+                "DROP TABLE IF EXISTS artists;"
+            )
+        self._db.executescript(_SCHEMA)
+        self._db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+        # Interned IDs, so writing a page mostly avoids lookups
+        self._track_ids: Dict[str, int] = {}
+        self._artist_ids: Dict[str, int] = {}
+
+    def _artist_id(self, name: str) -> int:
+        """Get the ID of an artist, adding it if new."""
+        artist_id = self._artist_ids.get(name)
+        if artist_id is None:
+            self._db.execute("INSERT OR IGNORE INTO artists (name) VALUES (?)", (name,))
+            (artist_id,) = self._db.execute(
+                "SELECT id FROM artists WHERE name = ?", (name,)
+            ).fetchone()
+            self._artist_ids[name] = artist_id
+        return artist_id
+
+    def _track_id(
+        self,
+        url: str,
+        title: Optional[str],
+        artist: Optional[str],
+        from_page: bool = False,
+    ) -> int:
+        """
+        Get the ID of a track, adding it or updating its title and artist.
+
+        Args:
+            url: Track URL
+            title: Track title, or None to keep the stored one
+            artist: Artist name, or None to keep the stored one
+            from_page: The track is the crawled page itself. Its URL is the
+                one requested and its artist a guess from the URL, so both
+                only fill in what is not stored yet; links on pages are the
+                site's own form.
+
+        Returns:
+            Track ID
+        """
+        key = track_key(url)
+        artist_id = self._artist_id(artist) if artist else None
+        if from_page:
+            updates = "artist_id = COALESCE(artist_id, excluded.artist_id)"
+        else:
+            updates = (
+                "artist_id = COALESCE(excluded.artist_id, artist_id), "
+                "url = excluded.url"
+            )
+        self._db.execute(
+            "INSERT INTO tracks (key, url, title, artist_id) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET "
+            f"title = COALESCE(excluded.title, title), {updates}",
+            (key, url, title, artist_id),
+        )
+        track_id = self._track_ids.get(key)
+        if track_id is None:
+            (track_id,) = self._db.execute(
+                "SELECT id FROM tracks WHERE key = ?", (key,)
+            ).fetchone()
+            self._track_ids[key] = track_id
+        return track_id
+
+    def record_page(
+        self,
+        details: TrackDetails,
+        artist: Optional[str] = None,
+        youtube_id: Optional[str] = None,
+        complete: bool = True,
+    ):
+        """
+        Write a parsed track page and all of its connections.
+
+        For each parsed connection type, the edges this page showed before
+        are replaced by the ones it shows now; edges learned from other
+        pages are kept.
+
+        Args:
+            details: Parsed track page
+            artist: Artist of the page's track if known; an artist already
+                stored for the track (e.g. from a connection) is kept
+            youtube_id: YouTube video ID of the page ("" if it has no video,
+                None if unknown)
+            complete: False if only some connection types were parsed; the
+                edges are stored, but track_details will not rebuild the page
+        """
+        now = time.time()
+        with self._db:
+            page_id = self._track_id(details.url, details.title, artist, from_page=True)
+            self._db.execute(
+                "UPDATE tracks SET crawled_at = CASE WHEN ? THEN ? ELSE crawled_at END, "
+                "youtube_id = COALESCE(?, youtube_id) WHERE id = ?",
+                (complete, now, youtube_id, page_id),
+            )
+
+            rows = []
+            for connection_type in details.sections:
+                relation, outgoing = _EDGE_DIRECTIONS[connection_type]
+                page_end = "source_id" if outgoing else "target_id"
+                self._db.execute(
+                    f"DELETE FROM edges WHERE page_id = ? AND relation = ? "
+                    f"AND {page_end} = ?",
+                    (page_id, relation, page_id),
+                )
+                for position, connection in enumerate(
+                    details.connections(connection_type)
+                ):
+                    if not connection.url:
+                        continue
+                    other_id = self._track_id(
+                        connection.url, connection.track, connection.artist
+                    )
+                    source, target = (page_id, other_id) if outgoing else (other_id, page_id)
+                    rows.append((page_id, source, relation, target, position, now))
+
+            # A track listed twice keeps its first position
+            self._db.executemany(
+                "INSERT OR IGNORE INTO edges "
+                "(page_id, source_id, relation, target_id, position, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def connections(self, url: str, connection_type: str) -> List[Connection]:
+        """
+        Get all known connections of one type for a track, from any page.
+
+        Args:
+            url: Track URL
+            connection_type: One of CONNECTION_TYPES (e.g. "sampled_by")
+
+        Returns:
+            List of Connection records: those shown on the track's own page
+            first, in page order, then ones only seen on other pages
+        """
+        return self._connections(url, connection_type, own_page=False)
+
+    def _connections(
+        self, url: str, connection_type: str, own_page: bool
+    ) -> List[Connection]:
+        """Get connections of one type, optionally only those its page showed."""
+        relation, outgoing = _EDGE_DIRECTIONS[connection_type]
+        this_end, other_end = ("source_id", "target_id") if outgoing else ("target_id", "source_id")
+        page_filter = "AND e.page_id = p.id " if own_page else ""
+        rows = self._db.execute(
+            f"SELECT t.title, a.name, t.url FROM edges e "
+            f"JOIN tracks p ON p.id = e.{this_end} "
+            f"JOIN tracks t ON t.id = e.{other_end} "
+            f"LEFT JOIN artists a ON a.id = t.artist_id "
+            f"WHERE p.key = ? AND e.relation = ? {page_filter}"
+            f"GROUP BY t.id "
+            f"ORDER BY MAX(e.page_id = p.id) DESC, "
+            f"MIN(CASE WHEN e.page_id = p.id THEN e.position END), "
+            f"MAX(e.last_seen) DESC, MIN(e.position)",
+            (track_key(url), relation),
+        )
+        return [
+            Connection(track=title or "", artist=artist or "Unknown", url=track_url)
+            for title, artist, track_url in rows
+        ]
+
+    def track_details(
+        self, url: str, max_age: Optional[float] = None
+    ) -> Optional[Tuple[TrackDetails, Optional[str]]]:
+        """
+        Rebuild a crawled track page from the edges it showed when last crawled.
+
+        Args:
+            url: Track URL
+            max_age: Ignore pages crawled more than this many seconds ago
+
+        Returns:
+            Tuple of (TrackDetails, YouTube video ID or "" or None as stored
+            by record_page), or None if the page has not been crawled
+        """
+        row = self._db.execute(
+            "SELECT title, youtube_id, crawled_at FROM tracks WHERE key = ?",
+            (track_key(url),),
+        ).fetchone()
+        if row is None or row[2] is None:
+            return None
+        title, youtube_id, crawled_at = row
+        if max_age is not None and time.time() - crawled_at > max_age:
+            return None
+
+        fields = {
+            connection_type: tuple(
+                self._connections(url, connection_type, own_page=True)
+            )
+            for connection_type in CONNECTION_TYPES
+        }
+        return TrackDetails(url=url, title=title, **fields), youtube_id
+
+    def stats(self) -> Dict:
+        """Get the number of tracks, crawled pages, artists and distinct edges."""
+        (tracks, crawled) = self._db.execute(
+            "SELECT COUNT(*), COUNT(crawled_at) FROM tracks"
+        ).fetchone()
+        (artists,) = self._db.execute("SELECT COUNT(*) FROM artists").fetchone()
+        (edges,) = self._db.execute(
+            "SELECT COUNT(*) FROM "
+            "(SELECT DISTINCT source_id, relation, target_id FROM edges)"
+        ).fetchone()
+        return {"tracks": tracks, "crawled": crawled, "artists": artists, "edges": edges}
+
+    def close(self):
+        """Close the database."""
+        self._db.close()
@@ -0,0 +1,110 @@
+"""
+Streamable HTTP transport: one process serving many MCP sessions.
+
+Every session shares the server's scraper, so they share one browser, the
+page caches and the fetch scheduler. Each session is limited to
+SESSION_CONCURRENCY tool calls at a time (see server.call_tool).
+"""
+
+import asyncio
+import contextlib
+
+import uvicorn
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from . import loop_monitor, profiling, server
+from .metrics import METRICS
+
+# Path of the MCP endpoint
+MCP_PATH = "/mcp"
+
+# Path of the Prometheus metrics
+METRICS_PATH = "/metrics"
+
+
+class _MCPEndpoint:
+    """ASGI endpoint handing requests to the session manager."""
+
+    def __init__(self, session_manager: StreamableHTTPSessionManager):
+        self.session_manager = session_manager
+
+    async def __call__(self, scope, receive, send):
+        await self.session_manager.handle_request(scope, receive, send)
+
+
+async def _metrics(_request):
+    return PlainTextResponse(
+        METRICS.render_prometheus(), media_type="text/plain; version=0.0.4"
+    )
+
+
+def create_app(close_scraper: bool = True) -> Starlette:
+    """
+    Create the ASGI application of the HTTP transport.
+
+    Args:
+        close_scraper: Close the shared scraper (and its browser) when the
+            application shuts down
+
+    Returns:
+        Starlette application serving MCP on MCP_PATH and Prometheus
+        metrics on METRICS_PATH
+    """
+    session_manager = StreamableHTTPSessionManager(app=server.app)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(_app):
+        server.get_scraper()
+        async with session_manager.run():
+            try:
+                yield
+            finally:
+                if close_scraper:
+                    await server.close_scraper()
+
+    return Starlette(
+        routes=[
+            Route(MCP_PATH, endpoint=_MCPEndpoint(session_manager)),
+            Route(METRICS_PATH, endpoint=_metrics),
+        ],
+        lifespan=lifespan,
+    )
+
+
+def create_server(host: str, port: int, close_scraper: bool = True) -> uvicorn.Server:
+    """
+    Create an HTTP server for the MCP endpoint.
+
+    Args:
+        host: Address to listen on; keep the loopback address unless the
+            port is protected by other means, there is no authentication
+        port: Port to listen on (0 for any free port)
+        close_scraper: Close the shared scraper when the server stops
+
+    Returns:
+        uvicorn server; run it with ``await server.serve()``
+    """
+    config = uvicorn.Config(
+        create_app(close_scraper),
+        host=host,
+        port=port,
+        log_level="warning",
+        lifespan="on",
+    )
+    return uvicorn.Server(config)
+
+
+async def serve(host: str, port: int):
+    """Serve MCP over streamable HTTP until interrupted."""
+    loop = asyncio.get_running_loop()
+    profiling.install_signal_handlers(loop)
+    monitor = loop_monitor.start_monitor()
+    try:
+        await create_server(host, port).serve()
+    finally:
+        if monitor is not None:
+            monitor.stop()
+        profiling.remove_signal_handlers(loop)
@@ -0,0 +1,276 @@
+"""
+Local fuzzy search index over tracks seen on WhoSampled.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from .models import Track
+from .normalize import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+def _trigrams(text: str) -> Set[str]:
+    """
+    Split normalized text into padded per-word trigrams.
+
+    Trigrams never span two words, so word order does not matter.
+
+    Args:
+        text: Normalized text
+
+    Returns:
+        Set of trigrams
+    """
+    grams = set()
+    for word in text.split():
+        padded = f" {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrackIndex:
+    """
+    Incrementally updated trigram index of tracks (title, artist, URL).
+
+    Tracks are matched on "artist title" with the Jaccard similarity of
+    their trigram sets. The index is persisted as JSON when a path is given;
+    the postings are rebuilt on load. It holds at most MAX_TRACKS tracks;
+    the least recently added or updated ones are evicted first.
+    """
+
+    # Minimum similarity for lookup() to answer without the site
+    CONFIDENT_SCORE = 0.9
+
+    # Minimum lead of the best match over the next one (e.g. several covers
+    # with the same title are ambiguous)
+    CONFIDENT_MARGIN = 0.1
+
+    # Seconds between automatic saves in maybe_save()
+    SAVE_INTERVAL = 30
+
+    # Maximum number of tracks kept (about 1 KB of memory each)
+    MAX_TRACKS = 100000
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: JSON file to load from and save to, or None to keep the
+                index in memory only. An unreadable file is reported and
+                replaced on the next save.
+        """
+        self.path = path
+        # Track ID -> track and its trigrams, oldest first
+        self._tracks: Dict[int, Track] = {}
+        self._grams: Dict[int, Set[str]] = {}
+        self._ids: Dict[str, int] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._next_id = 0
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+        # Background save in maybe_save(), and ordering of file writes
+        self._saving: Optional[asyncio.Future] = None
+        self._write_lock = threading.Lock()
+        self._version = 0
+        self._written_version = 0
+
+        if path and os.path.exists(path):
+            try:
+                self.load()
+            except (OSError, ValueError, TypeError) as e:
+                logger.warning("Ignoring unreadable track index %s: %s", path, e)
+                self._clear()
+
+    def __len__(self) -> int:
+        return len(self._tracks)
+
+    def _clear(self):
+        """Remove all tracks."""
+        self._tracks.clear()
+        self._grams.clear()
+        self._ids.clear()
+        self._postings.clear()
+        self._dirty = False
+
+    def add(self, track: Track) -> bool:
+        """
+        Add a track, or update its title and artist if the URL is known.
+
+        Args:
+            track: Track record
+
+        Returns:
+            True if the index changed
+        """
+        if not track.url or not track.title:
+            return False
+
+        track_id = self._ids.get(track.url)
+        if track_id is not None:
+            if self._tracks[track_id] == track:
+                return False
+            self._remove(track_id)
+        track_id = self._next_id
+        self._next_id += 1
+        self._ids[track.url] = track_id
+        self._tracks[track_id] = track
+
+        grams = _trigrams(normalize_query(f"{track.artist} {track.title}"))
+        self._grams[track_id] = grams
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(track_id)
+
+        while len(self._tracks) > self.MAX_TRACKS:
+            self._remove(next(iter(self._tracks)))
+
+        self._dirty = True
+        self._version += 1
+        return True
+
+    def _remove(self, track_id: int):
+        """Remove a track and its postings."""
+        track = self._tracks.pop(track_id)
+        del self._ids[track.url]
+        for gram in self._grams.pop(track_id):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.discard(track_id)
+                if not postings:
+                    del self._postings[gram]
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[float, Track]]:
+        """
+        Find the tracks most similar to a query.
+
+        Args:
+            query: Search query (artist name, track name, or both)
+            limit: Maximum number of results
+
+        Returns:
+            List of (similarity, Track) tuples, best match first
+        """
+        query_grams = _trigrams(normalize_query(query))
+        if not query_grams:
+            return []
+
+        # Count shared trigrams per candidate via the postings
+        shared: Dict[int, int] = {}
+        for gram in query_grams:
+            for track_id in self._postings.get(gram, ()):
+                shared[track_id] = shared.get(track_id, 0) + 1
+
+        scored = []
+        for track_id, common in shared.items():
+            union = len(query_grams) + len(self._grams[track_id]) - common
+            scored.append((common / union, track_id))
+        scored.sort(key=lambda item: item[0], reverse=True)
+
+        return [(round(score, 3), self._tracks[i]) for score, i in scored[:limit]]
+
+    def lookup(self, query: str) -> Optional[Track]:
+        """
+        Get the track a query refers to if the index is confident about it.
+
+        Args:
+            query: Search query
+
+        Returns:
+            Best matching Track, or None if no match is confident enough
+        """
+        results = self.search(query, limit=2)
+        if not results or results[0][0] < self.CONFIDENT_SCORE:
+            return None
+        if len(results) > 1 and results[0][0] - results[1][0] < self.CONFIDENT_MARGIN:
+            return None
+        return results[0][1]
+
+    def load(self):
+        """
+        Load tracks from the index file.
+
+        Raises:
+            OSError, ValueError or TypeError: If the file cannot be read or
+                is not a track index
+        """
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError("not a track index")
+        for url, title, artist in data.get("tracks", []):
+            self.add(Track(title=title, artist=artist, url=url))
+        self._dirty = False
+        self._written_version = self._version
+
+    def save(self):
+        """Write the index to its file if it changed (atomic replace)."""
+        if not self.path or not self._dirty:
+            return
+        self._write(self._snapshot(), self._version)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def maybe_save(self):
+        """
+        Save if there are changes and SAVE_INTERVAL has passed since the last save.
+
+        Inside an event loop the file is written in a worker thread, so
+        large indexes do not stall other requests.
+        """
+        if not (
+            self.path
+            and self._dirty
+            and time.monotonic() - self._saved_at >= self.SAVE_INTERVAL
+        ):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.save()
+            return
+        if self._saving is not None and not self._saving.done():
+            return
+
+        rows, version = self._snapshot(), self._version
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._saving = loop.run_in_executor(None, self._write, rows, version)
+        self._saving.add_done_callback(self._saved)
+
+    def _saved(self, future: asyncio.Future):
+        """Mark the index dirty again if a background save failed."""
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(
+                "Error saving track index %s: %s", self.path, future.exception()
+            )
+            self._dirty = True
+
+    def _snapshot(self) -> List[List[str]]:
+        """Get the rows of the index file, oldest track first."""
+        return [[t.url, t.title, t.artist] for t in self._tracks.values()]
+
+    def _write(self, rows: List[List[str]], version: int):
+        """Write rows to the index file unless a newer version was written."""
+        with self._write_lock:
+            if version < self._written_version:
+                return
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            data = {"version": 1, "tracks": rows}
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._written_version = version
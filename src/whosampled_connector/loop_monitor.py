@@ -0,0 +1,141 @@
+"""
+Event loop lag monitor and blocking-call detector.
+
+Every session runs on one event loop, so synchronous work in a handler
+(HTML parsing, formatting) stalls all of them. The monitor measures it:
+
+- a heartbeat task sleeps HEARTBEAT_INTERVAL at a time and records how
+  late it wakes up in the whosampled_loop_lag_seconds histogram
+- a watchdog thread notices when the heartbeat is overdue by more than
+  the threshold and logs the loop thread's stack at that moment, i.e.
+  the code that is blocking it
+
+Set WHOSAMPLED_LOOP_LAG_THRESHOLD_MS to change the threshold (default
+100), or to 0 to turn the monitor off.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from .metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+LAG_THRESHOLD_ENV = "WHOSAMPLED_LOOP_LAG_THRESHOLD_MS"
+
+# Milliseconds of lag reported as a blocked loop, unless set in the environment
+DEFAULT_LAG_THRESHOLD_MS = 100
+
+# Seconds between heartbeats
+HEARTBEAT_INTERVAL = 0.05
+
+
+class LoopMonitor:
+    """Measures the lag of one event loop and reports what blocks it."""
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        threshold: float,
+        interval: float = HEARTBEAT_INTERVAL,
+    ):
+        """
+        Args:
+            loop: Loop to monitor; start() must be called from its thread
+            threshold: Seconds of lag after which the stack is logged
+            interval: Seconds between heartbeats
+        """
+        self.loop = loop
+        self.threshold = threshold
+        self.interval = interval
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Start the heartbeat task and the watchdog thread."""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._task = self.loop.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="whosampled-loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    def stop(self):
+        """Stop monitoring."""
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+        if self._watchdog is not None:
+            self._watchdog.join()
+
+    async def _heartbeat(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - started - self.interval, 0.0)
+            METRICS.observe("whosampled_loop_lag_seconds", lag)
+            self._last_beat = now
+            if lag >= self.threshold:
+                # The watchdog logged the stack; this is how long it lasted
+                logger.warning("Event loop was blocked for %.0f ms", lag * 1000)
+
+    def _watch(self):
+        reported = None
+        while not self._stopped.wait(min(self.threshold / 2, self.interval)):
+            beat = self._last_beat
+            lag = time.monotonic() - beat - self.interval
+            if lag >= self.threshold and beat != reported:
+                # One report per stall: the next one needs a new heartbeat
+                reported = beat
+                self._report(lag)
+
+    def _report(self, lag: float):
+        """Log the stack of the loop thread, which has been blocked for lag seconds."""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame else "(no stack)\n"
+        task = asyncio.current_task(self.loop)
+        task_name = task.get_name() if task is not None else "(no task)"
+        logger.warning(
+            "Event loop blocked for %.0f ms so far, in task %s:\n%s",
+            lag * 1000,
+            task_name,
+            stack.rstrip(),
+        )
+        # Counted on the loop thread, once it runs again
+        try:
+            self.loop.call_soon_threadsafe(
+                METRICS.increment, "whosampled_loop_blocked_total"
+            )
+        except RuntimeError:
+            pass  # Loop closed
+
+
+def start_monitor() -> Optional[LoopMonitor]:
+    """
+    Monitor the running loop with the threshold from the environment.
+
+    Returns:
+        Running monitor (stop it when the loop is done), or None if turned
+        off with WHOSAMPLED_LOOP_LAG_THRESHOLD_MS=0
+    """
+    try:
+        threshold_ms = float(os.environ.get(LAG_THRESHOLD_ENV, DEFAULT_LAG_THRESHOLD_MS))
+    except ValueError:
+        logger.warning("Invalid %s, using %s", LAG_THRESHOLD_ENV, DEFAULT_LAG_THRESHOLD_MS)
+        threshold_ms = DEFAULT_LAG_THRESHOLD_MS
+    if threshold_ms <= 0:
+        return None
+    monitor = LoopMonitor(asyncio.get_running_loop(), threshold_ms / 1000)
+    monitor.start()
+    return monitor
@@ -0,0 +1,296 @@
+"""
+Process-wide counters and latency histograms, exported as Prometheus text.
+
+Instrumented code records into the shared registry ``METRICS``:
+
+    with METRICS.timer("whosampled_parse_seconds", kind="track_page"):
+        ...
+    METRICS.increment("whosampled_fetch_blocked_total")
+
+State that already lives elsewhere (cache counters, scheduler queues) is
+read when exported, through collectors registered with add_collector.
+"""
+
+import asyncio
+import bisect
+import functools
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+# Help text of each metric in the Prometheus output
+DESCRIPTIONS = {
+    "whosampled_tool_seconds": "Tool call latency",
+    "whosampled_navigation_seconds": "Browser navigation (page.goto) latency",
+    "whosampled_wait_seconds": "Time waiting for page content after navigation",
+    "whosampled_serialize_seconds": "Page HTML serialization (page.content) latency",
+    "whosampled_parse_seconds": "HTML parsing latency",
+    "whosampled_format_seconds": "Tool response formatting latency",
+    "whosampled_fetches_total": "Browser fetches by outcome",
+    "whosampled_fetch_blocked_total": "Fetches answered with a blocking HTTP status",
+    "whosampled_fetch_challenge_total": "Fetches that returned a bot challenge page",
+    "whosampled_cache_hits_total": "Cache hits by layer",
+    "whosampled_cache_misses_total": "Cache misses by layer",
+    "whosampled_cache_entries": "Cache entries by layer",
+    "whosampled_fetches_in_flight": "Browser fetches running, by priority class",
+    "whosampled_fetches_queued": "Browser fetches waiting for a slot, by priority class",
+    "whosampled_fetch_pool_utilization": "Share of browser fetch slots in use",
+    "whosampled_prefetches_total": "Search hit prefetches by outcome",
+    "whosampled_loop_lag_seconds": "Event loop scheduling lag",
+    "whosampled_loop_blocked_total": "Event loop stalls longer than the lag threshold",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Collector result: (metric name, "counter" or "gauge", labels, value)
+Sample = Tuple[str, str, Dict[str, str], float]
+
+
+class Histogram:
+    """Cumulative latency histogram with fixed buckets."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        # One count per bucket plus the +Inf bucket, not cumulative
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """Record one value."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile from the buckets.
+
+        Returns:
+            Upper bound of the bucket holding the quantile (the largest
+            finite bound for the +Inf bucket), or None without values
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def summary(self) -> Dict:
+        """Get count, sum, mean and estimated p50/p95/p99."""
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metrics:
+    """Registry of counters, histograms and collectors."""
+
+    def __init__(self):
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """Add to a counter."""
+        key = (name, _labels(labels))
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record a value, in seconds for latencies, in a histogram."""
+        key = (name, _labels(labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram()
+        histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """Record the duration of the block in a histogram, even if it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def timed(self, name: str, **labels):
+        """Decorator recording the duration of each call in a histogram."""
+
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def histogram(self, name: str, **labels) -> Optional[Histogram]:
+        """Get a histogram (None if nothing was recorded yet)."""
+        return self._histograms.get((name, _labels(labels)))
+
+    def counter(self, name: str, **labels) -> float:
+        """Get a counter value (0 if never incremented)."""
+        return self._counters.get((name, _labels(labels)), 0)
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]):
+        """Register a function returning samples to read at export time."""
+        self._collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], Iterable[Sample]]):
+        """Unregister a collector (no-op if it is not registered)."""
+        if collector in self._collectors:
+            self._collectors.remove(collector)
+
+    def reset(self):
+        """Drop all recorded values (collectors stay registered)."""
+        self._counters.clear()
+        self._histograms.clear()
+
+    def _collected(self) -> List[Tuple[str, str, Labels, float]]:
+        samples = []
+        for collector in self._collectors:
+            for name, kind, labels, value in collector():
+                samples.append((name, kind, _labels(labels), value))
+        return samples
+
+    def snapshot(self) -> Dict:
+        """
+        Get every metric as plain data (for the server_stats tool).
+
+        Returns:
+            Dictionary with "counters" and "gauges" ({name: [{labels, value}]})
+            and "histograms" ({name: [{labels, count, sum, mean, p50, p95, p99}]})
+        """
+        result = {"counters": {}, "gauges": {}, "histograms": {}}
+        for (name, labels), value in sorted(self._counters.items()):
+            result["counters"].setdefault(name, []).append(
+                {"labels": dict(labels), "value": value}
+            )
+        for name, kind, labels, value in self._collected():
+            section = "counters" if kind == "counter" else "gauges"
+            result[section].setdefault(name, []).append(
+                {"labels": dict(labels), "value": value}
+            )
+        for (name, labels), histogram in sorted(self._histograms.items()):
+            result["histograms"].setdefault(name, []).append(
+                {"labels": dict(labels), **histogram.summary()}
+            )
+        return result
+
+    def render_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        families: Dict[str, Tuple[str, List[str]]] = {}
+
+        def family(name, kind):
+            if name not in families:
+                families[name] = (kind, [])
+            return families[name][1]
+
+        for (name, labels), value in sorted(self._counters.items()):
+            family(name, "counter").append(
+                f"{name}{_format_labels(labels)} {_format_value(value)}"
+            )
+        for name, kind, labels, value in self._collected():
+            family(name, kind).append(
+                f"{name}{_format_labels(labels)} {_format_value(value)}"
+            )
+        for (name, labels), histogram in sorted(self._histograms.items()):
+            lines = family(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                bucket_labels = labels + (("le", repr(bound)),)
+                lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            inf_labels = labels + (("le", "+Inf"),)
+            lines.append(f"{name}_bucket{_format_labels(inf_labels)} {histogram.count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum!r}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+        output = []
+        for name, (kind, lines) in families.items():
+            if name in DESCRIPTIONS:
+                output.append(f"# HELP {name} {DESCRIPTIONS[name]}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(lines)
+        return "\n".join(output) + "\n"
+
+
+# Registry shared by the whole process
+METRICS = Metrics()
+
+
+async def start_exporter(port: int, host: str = "127.0.0.1") -> asyncio.AbstractServer:
+    """
+    Serve METRICS in the Prometheus text format over HTTP.
+
+    Every GET request, whatever its path, gets the current metrics.
+
+    Args:
+        port: Port to listen on (0 for any free port)
+        host: Address to listen on
+
+    Returns:
+        Running server; close it to stop exporting
+    """
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()).strip():
+                pass  # Skip the headers
+            if request_line.startswith(b"GET "):
+                status = "200 OK"
+                body = METRICS.render_prometheus().encode()
+            else:
+                status = "405 Method Not Allowed"
+                body = b""
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
@@ -0,0 +1,156 @@
+"""
+Compact record types for WhoSampled tracks and connections.
+"""
+
+import sys
+from dataclasses import dataclass, replace
+from typing import Dict, Iterable, Optional, Tuple
+
+# Connection lists on a track page, in display order
+CONNECTION_TYPES = (
+    "samples",
+    "sampled_by",
+    "covers",
+    "covered_by",
+    "remixes",
+    "remixed_by",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Track:
+    """A track found in search results."""
+
+    title: str
+    artist: str
+    url: str
+
+    def __post_init__(self):
+        # The same artists show up over and over, share one string object
+        object.__setattr__(self, "artist", sys.intern(self.artist))
+
+    def to_dict(self) -> Dict:
+        """Convert to the dictionary shape returned by the scraper."""
+        return {"title": self.title, "artist": self.artist, "url": self.url}
+
+
+@dataclass(frozen=True, slots=True)
+class Connection:
+    """A track connected to another one (sample, cover or remix)."""
+
+    track: str
+    artist: str
+    url: str
+    youtube_url: Optional[str] = None
+
+    def __post_init__(self):
+        object.__setattr__(self, "artist", sys.intern(self.artist))
+
+    def to_dict(self, keep_missing_youtube: bool = False) -> Dict:
+        """
+        Convert to the dictionary shape returned by the scraper.
+
+        Args:
+            keep_missing_youtube: If True, always include the "youtube_url" key
+                (None when no link is known). Otherwise the key is only present
+                when a link was found.
+
+        Returns:
+            Dictionary with track, artist, url and optional youtube_url keys
+        """
+        result = {"track": self.track, "artist": self.artist, "url": self.url}
+        if self.youtube_url or keep_missing_youtube:
+            result["youtube_url"] = self.youtube_url
+        return result
+
+
+@dataclass(frozen=True, slots=True)
+class TrackDetails:
+    """Details of a track page with all of its connections."""
+
+    url: str
+    title: Optional[str] = None
+    youtube_url: Optional[str] = None
+    samples: Tuple[Connection, ...] = ()
+    sampled_by: Tuple[Connection, ...] = ()
+    covers: Tuple[Connection, ...] = ()
+    covered_by: Tuple[Connection, ...] = ()
+    remixes: Tuple[Connection, ...] = ()
+    remixed_by: Tuple[Connection, ...] = ()
+
+    # Connection types parsed from the page; the others were skipped
+    sections: Tuple[str, ...] = CONNECTION_TYPES
+
+    # Offset of the next window if select() left connections out
+    next_offset: Optional[int] = None
+
+    def connections(self, connection_type: str) -> Tuple[Connection, ...]:
+        """Get the connections of one type (e.g. "samples")."""
+        return getattr(self, connection_type)
+
+    def has_sections(self, sections: Iterable[str]) -> bool:
+        """Check whether all of the given connection types were parsed."""
+        return set(sections) <= set(self.sections)
+
+    def select(
+        self,
+        sections: Optional[Iterable[str]] = None,
+        max_items: Optional[int] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> "TrackDetails":
+        """
+        Keep only some connection types and a window of each.
+
+        Args:
+            sections: Connection types to keep (None for all parsed ones)
+            max_items: Maximum connections visible per type, across all
+                windows (None for all)
+            offset: Number of connections skipped per type
+            limit: Maximum connections kept per type in this window; sets
+                next_offset if any type has more (None for all)
+
+        Returns:
+            New TrackDetails record
+        """
+        if sections is None and max_items is None and not offset and limit is None:
+            return self
+        wanted = set(self.sections if sections is None else sections)
+        end = None if limit is None else offset + limit
+        if max_items is not None:
+            end = max_items if end is None else min(end, max_items)
+
+        fields = {}
+        next_offset = None
+        for connection_type in CONNECTION_TYPES:
+            connections = getattr(self, connection_type)
+            if connection_type not in wanted:
+                fields[connection_type] = ()
+                continue
+            fields[connection_type] = connections[offset:end]
+            visible = len(connections[:max_items])
+            if limit is not None and visible > offset + limit:
+                next_offset = offset + limit
+        fields["sections"] = tuple(t for t in self.sections if t in wanted)
+        fields["next_offset"] = next_offset
+        return replace(self, **fields)
+
+    def to_dict(self) -> Dict:
+        """
+        Convert to the dictionary shape returned by get_track_details.
+
+        Only parsed connection types are included, so a missing key means
+        "not requested" and an empty list means "none on the page".
+        """
+        result = {"url": self.url}
+        for connection_type in self.sections:
+            result[connection_type] = [
+                c.to_dict() for c in getattr(self, connection_type)
+            ]
+        if self.title is not None:
+            result["title"] = self.title
+        if self.youtube_url is not None:
+            result["youtube_url"] = self.youtube_url
+        if self.next_offset is not None:
+            result["next_offset"] = self.next_offset
+        return result
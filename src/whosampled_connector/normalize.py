@@ -0,0 +1,149 @@
+"""
+Query and URL normalization for cache and coalescing keys.
+"""
+
+import re
+import unicodedata
+import urllib.parse
+
+# Hiragana -> romaji (Hepburn). Katakana is mapped onto hiragana first.
+_KANA = {
+    "あ": "a", "い": "i", "う": "u", "え": "e", "お": "o",
+    "か": "ka", "き": "ki", "く": "ku", "け": "ke", "こ": "ko",
+    "さ": "sa", "し": "shi", "す": "su", "せ": "se", "そ": "so",
+    "た": "ta", "ち": "chi", "つ": "tsu", "て": "te", "と": "to",
+    "な": "na", "に": "ni", "ぬ": "nu", "ね": "ne", "の": "no",
+    "は": "ha", "ひ": "hi", "ふ": "fu", "へ": "he", "ほ": "ho",
+    "ま": "ma", "み": "mi", "む": "mu", "め": "me", "も": "mo",
+    "や": "ya", "ゆ": "yu", "よ": "yo",
+    "ら": "ra", "り": "ri", "る": "ru", "れ": "re", "ろ": "ro",
+    "わ": "wa", "ゐ": "i", "ゑ": "e", "を": "o", "ん": "n",
+    "が": "ga", "ぎ": "gi", "ぐ": "gu", "げ": "ge", "ご": "go",
+    "ざ": "za", "じ": "ji", "ず": "zu", "ぜ": "ze", "ぞ": "zo",
+    "だ": "da", "ぢ": "ji", "づ": "zu", "で": "de", "ど": "do",
+    "ば": "ba", "び": "bi", "ぶ": "bu", "べ": "be", "ぼ": "bo",
+    "ぱ": "pa", "ぴ": "pi", "ぷ": "pu", "ぺ": "pe", "ぽ": "po",
+    "ぁ": "a", "ぃ": "i", "ぅ": "u", "ぇ": "e", "ぉ": "o",
+    "ゃ": "ya", "ゅ": "yu", "ょ": "yo", "ゎ": "wa", "ゔ": "vu",
+}
+
+# Two-kana combinations (e.g. きゃ -> kya, ふぁ -> fa)
+_KANA_DIGRAPHS = {
+    base + small: romaji
+    for base, prefix in (
+        ("き", "ky"), ("ぎ", "gy"), ("に", "ny"), ("ひ", "hy"), ("び", "by"),
+        ("ぴ", "py"), ("み", "my"), ("り", "ry"),
+    )
+    for small, romaji in (("ゃ", prefix + "a"), ("ゅ", prefix + "u"), ("ょ", prefix + "o"))
+}
+_KANA_DIGRAPHS.update(
+    {
+        "しゃ": "sha", "しゅ": "shu", "しょ": "sho", "しぇ": "she",
+        "じゃ": "ja", "じゅ": "ju", "じょ": "jo", "じぇ": "je",
+        "ちゃ": "cha", "ちゅ": "chu", "ちょ": "cho", "ちぇ": "che",
+        "ぢゃ": "ja", "ぢゅ": "ju", "ぢょ": "jo",
+        "ふぁ": "fa", "ふぃ": "fi", "ふぇ": "fe", "ふぉ": "fo",
+        "てぃ": "ti", "でぃ": "di", "でゅ": "dyu", "とぅ": "tu",
+        "うぃ": "wi", "うぇ": "we", "うぉ": "wo",
+        "ゔぁ": "va", "ゔぃ": "vi", "ゔぇ": "ve", "ゔぉ": "vo",
+    }
+)
+
+_KATAKANA_START = 0x30A1
+_KATAKANA_END = 0x30F6
+_KATAKANA_TO_HIRAGANA = 0x60
+
+_SMALL_TSU = "っ"
+_LONG_VOWEL = "ー"
+
+# Anything that is not a letter, digit or whitespace
+_PUNCTUATION_RE = re.compile(r"[^\w\s]|_")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def kana_to_romaji(text: str) -> str:
+    """
+    Transliterate hiragana and katakana to Hepburn romaji.
+
+    Other characters are left unchanged. Long vowel marks are dropped, so
+    "ラーメン" becomes "ramen".
+
+    Args:
+        text: Text possibly containing kana
+
+    Returns:
+        Text with kana replaced by romaji
+    """
+    # Katakana -> hiragana
+    text = "".join(
+        chr(ord(char) - _KATAKANA_TO_HIRAGANA)
+        if _KATAKANA_START <= ord(char) <= _KATAKANA_END
+        else char
+        for char in text
+    )
+
+    result = []
+    double_next = False
+    i = 0
+    while i < len(text):
+        pair = text[i : i + 2]
+        if pair in _KANA_DIGRAPHS:
+            romaji = _KANA_DIGRAPHS[pair]
+            i += 2
+        elif text[i] == _SMALL_TSU:
+            double_next = True
+            i += 1
+            continue
+        elif text[i] == _LONG_VOWEL:
+            i += 1
+            continue
+        else:
+            romaji = _KANA.get(text[i], text[i])
+            i += 1
+
+        if double_next:
+            # っ doubles the next consonant (ch is written tch)
+            result.append("t" if romaji.startswith("ch") else romaji[0])
+            double_next = False
+        result.append(romaji)
+
+    return "".join(result)
+
+
+def normalize_query(
+    query: str, transliterate_kana: bool = True, sort_tokens: bool = True
+) -> str:
+    """
+    Normalize a search query so trivial variants share one key.
+
+    Applies Unicode NFKC, case folding, optional kana to romaji
+    transliteration, punctuation removal, whitespace collapsing and optional
+    word sorting. "Chiba Yuki", "chiba  yuki " and "yuki chiba" all become
+    "chiba yuki".
+
+    Args:
+        query: Raw search query
+        transliterate_kana: Whether to transliterate hiragana and katakana
+        sort_tokens: Whether to sort words so word order does not matter
+
+    Returns:
+        Normalized query
+    """
+    text = unicodedata.normalize("NFKC", query).casefold()
+    if transliterate_kana:
+        text = kana_to_romaji(text)
+    text = _PUNCTUATION_RE.sub(" ", text)
+    tokens = _WHITESPACE_RE.split(text.strip())
+    if sort_tokens:
+        tokens.sort()
+    return " ".join(token for token in tokens if token)
+
+
+def track_key(track_url: str) -> str:
+    """
+    Canonical form of a track URL, used as cache, index and graph key.
+
+    Drops the fragment and trailing slashes, so ".../Daft-Punk/HBFS" and
+    ".../Daft-Punk/HBFS/" are the same track.
+    """
+    return urllib.parse.urldefrag(track_url)[0].rstrip("/")
@@ -0,0 +1,199 @@
+"""
+On-demand CPU profiling and memory snapshots of the running server.
+
+Both write their raw data to PROFILE_DIR for offline analysis and return
+a short summary:
+
+- profile(seconds): cProfile of the event loop thread for a while, saved
+  as .pstats (open with ``python -m pstats`` or snakeviz)
+- memory_snapshot(): tracemalloc snapshot, saved with Snapshot.dump and
+  compared with the previous one to show where memory grew
+
+They are reachable through the admin tools (WHOSAMPLED_ADMIN=1) and the
+SIGUSR1 / SIGUSR2 handlers from install_signal_handlers.
+"""
+
+import asyncio
+import cProfile
+import io
+import itertools
+import logging
+import os
+import pstats
+import signal
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR_ENV = "WHOSAMPLED_PROFILE_DIR"
+
+# Seconds profiled on SIGUSR1
+SIGNAL_PROFILE_SECONDS = 30
+
+# Stack frames kept per tracemalloc allocation
+TRACEMALLOC_FRAMES = 10
+
+_profiling = False
+_sequence = itertools.count(1)
+_last_snapshot: Optional[tracemalloc.Snapshot] = None
+
+
+def profile_dir() -> str:
+    """Get the output directory (WHOSAMPLED_PROFILE_DIR, else the temp directory)."""
+    directory = os.environ.get(PROFILE_DIR_ENV) or tempfile.gettempdir()
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _output_path(kind: str, extension: str) -> str:
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    name = f"whosampled-{kind}-{stamp}-{os.getpid()}-{next(_sequence)}.{extension}"
+    return os.path.join(profile_dir(), name)
+
+
+async def profile(seconds: float, top: int = 25) -> Dict:
+    """
+    Profile the event loop thread for some time.
+
+    Everything running on the loop meanwhile (every session's tool calls,
+    parsing, formatting) is profiled; browser work in other processes is
+    not.
+
+    Args:
+        seconds: How long to profile
+        top: Number of functions in the summary
+
+    Returns:
+        Dictionary with path (the .pstats file), seconds and summary (top
+        functions by cumulative time)
+
+    Raises:
+        RuntimeError: If a profile is already running
+    """
+    global _profiling
+    if _profiling:
+        raise RuntimeError("A profile is already running")
+    _profiling = True
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+    finally:
+        _profiling = False
+
+    path = _output_path("profile", "pstats")
+    profiler.dump_stats(path)
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+    logger.info("Wrote profile to %s", path)
+    return {"path": path, "seconds": seconds, "summary": output.getvalue().strip()}
+
+
+def memory_snapshot(top: int = 15) -> Dict:
+    """
+    Take a tracemalloc snapshot and compare it with the previous one.
+
+    The first call starts tracemalloc, so only allocations made after it
+    are seen; call again later to see what grew.
+
+    Args:
+        top: Number of allocation sites in the summary
+
+    Returns:
+        Dictionary with path (the dumped snapshot), traced (current and peak
+        bytes), started (True if this call started tracing), top (largest
+        allocation sites) and growth (sites that grew most since the last
+        snapshot, empty on the first one)
+    """
+    global _last_snapshot
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        _last_snapshot = None
+
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__),)
+    )
+    path = _output_path("memory", "snapshot")
+    snapshot.dump(path)
+    current, peak = tracemalloc.get_traced_memory()
+
+    result = {
+        "path": path,
+        "started": started,
+        "traced": {"current": current, "peak": peak},
+        "top": [
+            {"site": str(stat.traceback[0]), "size": stat.size, "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:top]
+        ],
+        "growth": [],
+    }
+    if _last_snapshot is not None:
+        result["growth"] = [
+            {
+                "site": str(stat.traceback[0]),
+                "size_diff": stat.size_diff,
+                "count_diff": stat.count_diff,
+            }
+            for stat in snapshot.compare_to(_last_snapshot, "lineno")[:top]
+            if stat.size_diff
+        ]
+    _last_snapshot = snapshot
+    logger.info("Wrote memory snapshot to %s", path)
+    return result
+
+
+def stop_memory_tracing():
+    """Stop tracemalloc and forget the last snapshot."""
+    global _last_snapshot
+    _last_snapshot = None
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def install_signal_handlers(loop: asyncio.AbstractEventLoop):
+    """
+    Profile on SIGUSR1 and take a memory snapshot on SIGUSR2.
+
+    Results are written to PROFILE_DIR and logged. Does nothing where these
+    signals do not exist or outside the main thread.
+    """
+
+    async def run_profile():
+        try:
+            result = await profile(SIGNAL_PROFILE_SECONDS)
+        except RuntimeError as e:
+            logger.warning("Profile not started: %s", e)
+            return
+        logger.warning("Profile written to %s", result["path"])
+
+    def on_profile_signal():
+        logger.warning("Profiling for %s seconds", SIGNAL_PROFILE_SECONDS)
+        loop.create_task(run_profile())
+
+    def on_memory_signal():
+        result = memory_snapshot()
+        logger.warning("Memory snapshot written to %s", result["path"])
+
+    try:
+        loop.add_signal_handler(signal.SIGUSR1, on_profile_signal)
+        loop.add_signal_handler(signal.SIGUSR2, on_memory_signal)
+    except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+        pass  # No such signals, or not in the main thread
+
+
+def remove_signal_handlers(loop: asyncio.AbstractEventLoop):
+    """Undo install_signal_handlers."""
+    for name in ("SIGUSR1", "SIGUSR2"):
+        if hasattr(signal, name):
+            try:
+                loop.remove_signal_handler(getattr(signal, name))
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass
@@ -0,0 +1,47 @@
+"""
+Progress reporting from long-running scraper calls.
+"""
+
+import contextvars
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Optional
+
+# (progress, total, message) -> awaitable
+ProgressCallback = Callable[[float, Optional[float], Optional[str]], Awaitable[None]]
+
+# Callback of the current task (see progress_callback)
+_current_callback: contextvars.ContextVar = contextvars.ContextVar(
+    "progress_callback", default=None
+)
+
+
+@contextmanager
+def progress_callback(callback: Optional[ProgressCallback]):
+    """
+    Send progress reported inside this block (and tasks created in it) to a callback.
+
+    Args:
+        callback: Async function called with (progress, total, message), or
+            None to drop progress reports
+    """
+    token = _current_callback.set(callback)
+    try:
+        yield
+    finally:
+        _current_callback.reset(token)
+
+
+async def report_progress(
+    progress: float, total: Optional[float] = None, message: Optional[str] = None
+):
+    """
+    Report progress to the current task's callback, if any.
+
+    Args:
+        progress: Work done so far
+        total: Total amount of work, if known
+        message: Short description of the current step
+    """
+    callback = _current_callback.get()
+    if callback is not None:
+        await callback(progress, total, message)
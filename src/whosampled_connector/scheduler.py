@@ -0,0 +1,204 @@
+"""
+Priority-aware scheduling of browser fetches.
+"""
+
+import asyncio
+import contextvars
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+
+# Fetch classes, highest priority first
+INTERACTIVE = "interactive"
+PREFETCH = "prefetch"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, PREFETCH, BULK)
+
+# Priority of fetches started from the current task (see fetch_priority)
+_current_priority: contextvars.ContextVar = contextvars.ContextVar(
+    "fetch_priority", default=INTERACTIVE
+)
+
+
+@contextmanager
+def fetch_priority(priority: str):
+    """
+    Run fetches started inside this block (and tasks created in it) at a priority.
+
+    Args:
+        priority: One of INTERACTIVE, PREFETCH or BULK
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown fetch priority: {priority}")
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> str:
+    """Get the fetch priority of the current task."""
+    return _current_priority.get()
+
+
+class FetchScheduler:
+    """
+    Limits concurrent browser fetches and orders them by priority class.
+
+    Each class has its own concurrency share. When a slot frees up, waiting
+    interactive fetches are started before prefetch and bulk ones (a class
+    waiting only for its own share does not hold back lower ones), and
+    background classes never take the last RESERVED_INTERACTIVE free slots,
+    so an interactive fetch never waits behind a warming cache.
+    """
+
+    # Slots only interactive fetches may use
+    RESERVED_INTERACTIVE = 1
+
+    # Number of recent wait times kept per class for percentiles
+    WAIT_SAMPLES = 1000
+
+    def __init__(self, capacity: int = 4, shares: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            capacity: Maximum number of fetches running at once
+            shares: Maximum concurrent fetches per class. Defaults to the
+                whole capacity for interactive, one for prefetch and half
+                for bulk.
+        """
+        self.capacity = capacity
+        self.shares = {
+            INTERACTIVE: capacity,
+            PREFETCH: 1,
+            BULK: max(1, capacity // 2),
+        }
+        if shares:
+            self.shares.update(shares)
+
+        self._in_flight = {priority: 0 for priority in PRIORITIES}
+        self._waiters = {priority: deque() for priority in PRIORITIES}
+        self._completed = {priority: 0 for priority in PRIORITIES}
+        self._wait_total = {priority: 0.0 for priority in PRIORITIES}
+        self._wait_max = {priority: 0.0 for priority in PRIORITIES}
+        self._wait_samples = {
+            priority: deque(maxlen=self.WAIT_SAMPLES) for priority in PRIORITIES
+        }
+
+        # Task -> number of slots it holds
+        self._holders: Dict[asyncio.Task, int] = {}
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[str] = None):
+        """
+        Hold a fetch slot for the duration of the block.
+
+        Args:
+            priority: Fetch class; defaults to the current task's priority
+                (see fetch_priority)
+        """
+        priority = priority or current_priority()
+        await self._acquire(priority)
+        task = asyncio.current_task()
+        self._holders[task] = self._holders.get(task, 0) + 1
+        try:
+            yield
+        finally:
+            self._holders[task] -= 1
+            if not self._holders[task]:
+                del self._holders[task]
+            self._release(priority)
+
+    def holds_slot(self, task: asyncio.Task) -> bool:
+        """Check whether a task is running a fetch (rather than queued or idle)."""
+        return task in self._holders
+
+    async def _acquire(self, priority: str):
+        """Wait until a slot for the given class is free, then take it."""
+        started = time.monotonic()
+
+        if self._can_start(priority) and not self._has_waiters_up_to(priority):
+            self._in_flight[priority] += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters[priority].append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # The slot was handed over just before cancellation
+                    self._release(priority)
+                elif waiter in self._waiters[priority]:
+                    # Otherwise _wake may already have dropped it
+                    self._waiters[priority].remove(waiter)
+                raise
+
+        waited = time.monotonic() - started
+        self._wait_total[priority] += waited
+        self._wait_max[priority] = max(self._wait_max[priority], waited)
+        self._wait_samples[priority].append(waited)
+
+    def _release(self, priority: str):
+        """Give back a slot and start the next waiting fetches."""
+        self._in_flight[priority] -= 1
+        self._completed[priority] += 1
+        self._wake()
+
+    def _wake(self):
+        """Hand free slots to waiters, highest priority class first."""
+        for priority in PRIORITIES:
+            waiters = self._waiters[priority]
+            while waiters and self._can_start(priority):
+                waiter = waiters.popleft()
+                if waiter.cancelled():
+                    continue
+                self._in_flight[priority] += 1
+                waiter.set_result(None)
+            # Waiters left here are held back by their own share or a full
+            # pool, so lower classes may still use the slots their share allows
+
+    def _can_start(self, priority: str) -> bool:
+        """Check whether a fetch of the given class may start now."""
+        total = sum(self._in_flight.values())
+        limit = self.capacity
+        if priority != INTERACTIVE:
+            limit -= self.RESERVED_INTERACTIVE
+        return total < limit and self._in_flight[priority] < self.shares[priority]
+
+    def _has_waiters_up_to(self, priority: str) -> bool:
+        """
+        Check whether queued fetches should start before one of this class.
+
+        True if this class has queued fetches, or a higher class has queued
+        fetches that could start now; a higher class held back by its own
+        share does not block this one.
+        """
+        for other in PRIORITIES:
+            if other == priority:
+                return bool(self._waiters[other])
+            if self._waiters[other] and self._can_start(other):
+                return True
+        return False
+
+    def stats(self) -> Dict:
+        """
+        Get per-class queue depths, fetches in flight and wait times.
+
+        Returns:
+            Dictionary keyed by class with queued, in_flight, completed,
+            wait_avg, wait_p95 and wait_max (seconds)
+        """
+        stats = {}
+        for priority in PRIORITIES:
+            samples = sorted(self._wait_samples[priority])
+            started = self._completed[priority] + self._in_flight[priority]
+            stats[priority] = {
+                "queued": len(self._waiters[priority]),
+                "in_flight": self._in_flight[priority],
+                "completed": self._completed[priority],
+                "wait_avg": self._wait_total[priority] / started if started else 0.0,
+                "wait_p95": samples[int(0.95 * (len(samples) - 1))] if samples else 0.0,
+                "wait_max": self._wait_max[priority],
+            }
+        return stats
@@ -2,11 +2,176 @@
 WhoSampled scraper module using Playwright for anti-bot bypass.
 """
 
-from playwright.async_api import async_playwright, Browser, Page
 from bs4 import BeautifulSoup
-from typing import List, Dict, Optional
+from collections import OrderedDict
+from contextlib import aclosing
+from dataclasses import replace
+from typing import AsyncIterator, List, Dict, Optional
 import urllib.parse
+import asyncio
+import functools
+import logging
 import os
+import re
+import time
+import uuid
+
+import soupsieve
+
+from .cache import InFlight, TTLCache, caches_bypassed
+from .graph import GraphStore
+from .index import TrackIndex
+from .metrics import METRICS
+from .scheduler import BULK, PREFETCH, FetchScheduler, fetch_priority
+from .models import CONNECTION_TYPES, Connection, Track, TrackDetails
+from .normalize import normalize_query, track_key
+from .progress import progress_callback, report_progress
+from .tracing import span, traced
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses meaning the site refused to serve us
+_BLOCKED_STATUSES = (403, 429)
+
+# Markers of a bot challenge page served instead of the real one
+_CHALLENGE_MARKERS = ("challenge-platform", "cf-challenge", "<title>Just a moment")
+
+
+class PageStatusError(Exception):
+    """A page was answered with an HTTP status other than 2xx."""
+
+    def __init__(self, url: str, status: int):
+        super().__init__(f"HTTP {status} for {url}")
+        self.url = url
+        self.status = status
+
+
+def _soup(html: str) -> BeautifulSoup:
+    """Parse page HTML with lxml, recording the parse time."""
+    with METRICS.timer("whosampled_parse_seconds", kind="html"), span("parse_html"):
+        return BeautifulSoup(html, "lxml")
+
+
+# Subsection header keyword -> connection type, checked in order.
+# "sampled in" comes before the bare "sampled" so "Was sampled in" is not a sample.
+_HEADER_KEYWORDS = (
+    ("contains sample", "samples"),
+    ("sampled in", "sampled_by"),
+    ("sampled", "samples"),
+    ("cover of", "covers"),
+    ("covered in", "covered_by"),
+    ("covered by", "covered_by"),
+    ("remix of", "remixes"),
+    ("remixed in", "remixed_by"),
+    ("remixed by", "remixed_by"),
+)
+
+# Connection type -> path of its "see all" pages under the track URL
+_SEE_ALL_PATHS = {
+    "samples": "samples",
+    "sampled_by": "sampled",
+    "covers": "covers",
+    "covered_by": "covered",
+    "remixes": "remixes",
+    "remixed_by": "remixed",
+}
+
+# Year suffix after artist names, e.g. "Daft Punk (2001)"
+_YEAR_SUFFIX_RE = re.compile(r"\s*\(\d{4}\)$")
+
+# Words used for relevance scoring
+_WORD_RE = re.compile(r"\w+")
+
+# Precompiled CSS selectors
+_SEARCH_TITLE = soupsieve.compile("a.trackTitle")
+_SEARCH_NAME = soupsieve.compile("a.trackName")
+_SEARCH_HIT = soupsieve.compile("a.trackTitle, a.trackName")
+_TOP_HIT_SECTION = soupsieve.compile("div.topResult, div.top-result, section.topResult")
+_TRACK_TITLE = soupsieve.compile("h1.trackName, h1")
+_TRACK_PAGE_TITLE = soupsieve.compile("h1.trackName")
+_SUBSECTION = soupsieve.compile("section.subsection")
+_YOUTUBE_EMBED_SELECTOR = (
+    "div.embed-placeholder[data-id], div.youtube-placeholder[data-id]"
+)
+_YOUTUBE_EMBED = soupsieve.compile(_YOUTUBE_EMBED_SELECTOR)
+
+# Runs in the page: resolves with {value} as soon as the selector matches, or
+# with {value: null} once the DOM has been parsed for graceMs without a match
+_WAIT_FOR_ATTRIBUTE_JS = """
+([selector, attribute, graceMs]) => {
+    const element = document.querySelector(selector);
+    if (element) {
+        return {value: element.getAttribute(attribute)};
+    }
+    if (document.readyState === "loading") {
+        return false;
+    }
+    window.__domReadyAt = window.__domReadyAt || performance.now();
+    if (performance.now() - window.__domReadyAt >= graceMs) {
+        return {value: null};
+    }
+    return false;
+}
+"""
+
+
+# Headers repeat across pages ("Was sampled in 23 songs"), so results are
+# memoized. An uncached lookup is slower than the old if/elif chain, and a
+# single alternation regex slower still (see benchmarks/bench_parse.py).
+@functools.lru_cache(maxsize=1024)
+def _classify_header(header_text: str) -> Optional[str]:
+    """
+    Map a subsection header to its connection type.
+
+    Args:
+        header_text: Header text, e.g. "Was sampled in 23 songs"
+
+    Returns:
+        Connection type (e.g. "sampled_by"), or None if the header is unknown
+    """
+    header_text = header_text.lower()
+    for keyword, connection_type in _HEADER_KEYWORDS:
+        if keyword in header_text:
+            return connection_type
+    return None
+
+
+def _tokens(text: str) -> List[str]:
+    """Split text into lowercase word tokens."""
+    return _WORD_RE.findall(text.lower())
+
+
+def _relevance(query: str, title: str, artist: str) -> float:
+    """
+    Score how well a search result matches the query, from 0.0 to 1.0.
+
+    The score weighs how many query words appear in the result (recall)
+    more than how many result words appear in the query (precision), so
+    "daft punk" still scores well against "One More Time by Daft Punk".
+
+    Args:
+        query: Search query
+        title: Track title of the result
+        artist: Artist name of the result
+
+    Returns:
+        Relevance score
+    """
+    query_tokens = set(_tokens(query))
+    result_tokens = set(_tokens(f"{artist} {title}"))
+    if not query_tokens or not result_tokens:
+        return 0.0
+    common = len(query_tokens & result_tokens)
+    recall = common / len(query_tokens)
+    precision = common / len(result_tokens)
+    return round(0.7 * recall + 0.3 * precision, 3)
+
+
+def _select_track_links(section) -> List:
+    """Find the a.trackName links in a section."""
+    # find_all with a class filter matches the same elements as the CSS
+    # selector "a.trackName" but is several times faster on large sections
+    return section.find_all("a", class_="trackName")
 
 
 class WhoSampledScraper:
@@ -15,47 +180,152 @@ class WhoSampledScraper:
     BASE_URL = "https://www.whosampled.com"
     SEARCH_URL = f"{BASE_URL}/search/"
 
+    # Maximum number of track URLs remembered in the YouTube ID index
+    YOUTUBE_INDEX_SIZE = 10000
+
+    # A track found without a video is looked up again after this many
+    # seconds, since a challenge page or a slow embed also looks like that
+    YOUTUBE_MISSING_TTL = 3600
+
+    # Maximum number of direct track URLs probed alongside a search
+    MAX_URL_PROBES = 2
+
+    # Parsed track pages kept in memory
+    DETAILS_CACHE_SIZE = 1000
+    DETAILS_CACHE_TTL = 3600
+
+    # A prefetched page not requested within this many seconds is wasted
+    PREFETCH_WINDOW = 300
+
+    # Query results kept in memory, keyed by normalized query
+    QUERY_CACHE_SIZE = 1000
+    QUERY_CACHE_TTL = 3600
+
+    # Browser fetches running at once, across all priority classes
+    MAX_CONCURRENT_FETCHES = 4
+
+    # Deferred YouTube lookups kept for follow-up calls (see
+    # start_youtube_lookups)
+    YOUTUBE_JOBS_SIZE = 100
+    YOUTUBE_JOBS_TTL = 900
+
+    # Directory for data kept across restarts (track index and connection
+    # graph); unset keeps everything in memory
+    DATA_DIR_ENV = "WHOSAMPLED_DATA_DIR"
+
+    # Track pages stored in the connection graph are served from it for this
+    # many seconds after they were crawled. This is longer than
+    # DETAILS_CACHE_TTL on purpose: the graph only exists with a data
+    # directory, where it is what spares the site after a restart.
+    GRAPH_MAX_AGE = 86400
+
+    # First URL path parts that are not artist pages (/Artist/Track/)
+    _NON_TRACK_PATHS = ("sample", "cover", "remix", "search", "artist", "album")
+
     def __init__(self):
         self.playwright = None
         self.browser = None
         self._initialized = False
+        self._browser_lock = asyncio.Lock()
+
+        # Orders fetches so interactive calls go before prefetch and bulk work
+        self.scheduler = FetchScheduler(self.MAX_CONCURRENT_FETCHES)
+
+        # Track URL -> TrackDetails without YouTube links of connections
+        self._details_cache = TTLCache(self.DETAILS_CACHE_SIZE, self.DETAILS_CACHE_TTL)
+
+        # Normalized query -> Track it resolved to (learned from searches and
+        # direct URL probes), and -> get_youtube_links_from_search results
+        self._resolved_queries = TTLCache(self.QUERY_CACHE_SIZE, self.QUERY_CACHE_TTL)
+        self._youtube_links_cache = TTLCache(
+            self.QUERY_CACHE_SIZE, self.QUERY_CACHE_TTL
+        )
+
+        # Every track seen in search results, track pages and connections, so
+        # confident queries are answered without the site
+        data_dir = os.environ.get(self.DATA_DIR_ENV)
+        self.track_index = TrackIndex(
+            os.path.join(data_dir, "tracks.json") if data_dir else None
+        )
+
+        # Every parsed track page and its connections, written through. Only
+        # kept with a data directory: in memory it would grow for the life of
+        # the process and duplicate the details cache.
+        self.graph = (
+            GraphStore(os.path.join(data_dir, "graph.db")) if data_dir else None
+        )
+
+        # Concurrent searches for the same normalized query share one fetch
+        self._search_pages = InFlight()
+
+        # Background prefetches of search hits: in flight, and done but unused
+        self._prefetches: Dict[str, asyncio.Task] = {}
+        self._prefetched: Dict[str, float] = {}
+        self._prefetch_stats = {
+            "started": 0,
+            "completed": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "hits": 0,
+            "wasted": 0,
+        }
+
+        # Track URL -> YouTube video ID, and track URLs whose page showed no
+        # video. Filled from every track page we parse and checked before any
+        # fetch.
+        self._youtube_ids: "OrderedDict[str, str]" = OrderedDict()
+        self._missing_youtube = TTLCache(
+            self.YOUTUBE_INDEX_SIZE, self.YOUTUBE_MISSING_TTL
+        )
+        self._youtube_lookups: Dict[str, asyncio.Future] = {}
+
+        # Cursor -> deferred YouTube lookup job; a job dropped from the cache
+        # can no longer be collected, so its lookups are cancelled
+        self._youtube_jobs = TTLCache(
+            self.YOUTUBE_JOBS_SIZE,
+            self.YOUTUBE_JOBS_TTL,
+            on_evict=lambda _cursor, job: job["task"].cancel(),
+        )
+        self._youtube_job_tasks: set = set()
 
     async def _ensure_browser(self):
         """Ensure browser is initialized."""
-        if not self._initialized:
-            self.playwright = await async_playwright().start()
-
-            # Get proxy from environment variables if available
-            proxy_config = None
-            https_proxy = os.environ.get("HTTPS_PROXY") or os.environ.get("https_proxy")
-            if https_proxy:
-                proxy_config = {"server": https_proxy}
-
-            self.browser = await self.playwright.chromium.launch(
-                headless=True,
-                proxy=proxy_config,
-                args=[
-                    "--disable-blink-features=AutomationControlled",
-                    "--disable-features=IsolateOrigins,site-per-process",
-                    "--disable-site-isolation-trials",
-                    "--no-sandbox",
-                    "--disable-setuid-sandbox",
-                    "--disable-dev-shm-usage",
-                    "--disable-web-security",
-                    "--disable-features=VizDisplayCompositor",
-                ],
-            )
-            self._initialized = True
+        async with self._browser_lock:
+            # Concurrent fetches must not launch the browser twice
+            if not self._initialized:
+                # Imported on first use, it takes longer than starting the server
+                from playwright.async_api import async_playwright
+
+                self.playwright = await async_playwright().start()
+
+                # Get proxy from environment variables if available
+                proxy_config = None
+                https_proxy = os.environ.get("HTTPS_PROXY") or os.environ.get("https_proxy")
+                if https_proxy:
+                    proxy_config = {"server": https_proxy}
+
+                self.browser = await self.playwright.chromium.launch(
+                    headless=True,
+                    proxy=proxy_config,
+                    args=[
+                        "--disable-blink-features=AutomationControlled",
+                        "--disable-features=IsolateOrigins,site-per-process",
+                        "--disable-site-isolation-trials",
+                        "--no-sandbox",
+                        "--disable-setuid-sandbox",
+                        "--disable-dev-shm-usage",
+                        "--disable-web-security",
+                        "--disable-features=VizDisplayCompositor",
+                    ],
+                )
+                self._initialized = True
 
-    async def _fetch_page(self, url: str) -> str:
+    async def _new_page(self):
         """
-        Fetch a page using headless browser.
-
-        Args:
-            url: URL to fetch
+        Open a fresh browser context and page with stealth settings.
 
         Returns:
-            Page HTML content
+            Tuple of (context, page); the caller must close both
         """
         await self._ensure_browser()
 
@@ -99,68 +369,551 @@ class WhoSampledScraper:
             );
         """)
 
-        try:
-            # Navigate to page with more lenient wait condition
-            await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+        return context, page
 
-            # Wait for page to be ready
-            await page.wait_for_load_state("domcontentloaded")
+    async def _fetch_page(self, url: str, require_ok: bool = False) -> str:
+        """
+        Fetch a page using headless browser.
 
-            # Wait a bit longer for dynamic content
-            await page.wait_for_timeout(2000)
+        The fetch waits for a scheduler slot at the current task's priority
+        (see scheduler.fetch_priority).
 
-            # Get page content
-            content = await page.content()
+        Args:
+            url: URL to fetch
+            require_ok: Raise instead of returning the page if the site
+                answers with a status other than 2xx (e.g. a 404 page)
 
-            return content
+        Returns:
+            Page HTML content
 
-        except Exception as e:
-            print(f"Error fetching page {url}: {e}")
-            raise
+        Raises:
+            PageStatusError: If require_ok is set and the status is not 2xx
+        """
+        with span("fetch_page", url=url):
+            async with self.scheduler.slot():
+                with span("new_page"):
+                    context, page = await self._new_page()
 
-        finally:
-            await page.close()
-            await context.close()
+                try:
+                    # Navigate to page with more lenient wait condition
+                    with METRICS.timer("whosampled_navigation_seconds"), span("navigate"):
+                        response = await page.goto(
+                            url, wait_until="domcontentloaded", timeout=60000
+                        )
+                    self._count_response(response)
+                    status = getattr(response, "status", None)
+                    if require_ok and isinstance(status, int) and status // 100 != 2:
+                        METRICS.increment("whosampled_fetches_total", outcome="status")
+                        raise PageStatusError(url, status)
+
+                    with METRICS.timer("whosampled_wait_seconds"), span("wait"):
+                        # Wait for page to be ready
+                        await page.wait_for_load_state("domcontentloaded")
+
+                        # Wait a bit longer for dynamic content
+                        await page.wait_for_timeout(2000)
+
+                    # Get page content
+                    with METRICS.timer("whosampled_serialize_seconds"), span("serialize"):
+                        content = await page.content()
+
+                    self._count_fetch(content)
+                    return content
+
+                except PageStatusError:
+                    raise
 
-    async def search_track(self, query: str) -> Optional[Dict]:
+                except Exception as e:
+                    METRICS.increment("whosampled_fetches_total", outcome="error")
+                    logger.warning("Error fetching page %s: %s", url, e)
+                    raise
+
+                finally:
+                    await page.close()
+                    await context.close()
+
+    def _count_response(self, response):
+        """Count a navigation answered with a blocking HTTP status."""
+        status = getattr(response, "status", None)
+        if isinstance(status, int) and status in _BLOCKED_STATUSES:
+            METRICS.increment("whosampled_fetch_blocked_total", status=status)
+
+    def _count_fetch(self, content: Optional[str] = None):
+        """Count a finished fetch, noting bot challenge pages."""
+        if content is not None and any(m in content for m in _CHALLENGE_MARKERS):
+            METRICS.increment("whosampled_fetch_challenge_total")
+        METRICS.increment("whosampled_fetches_total", outcome="ok")
+
+    @traced("fetch_attribute", ("url",))
+    async def _fetch_attribute(
+        self, url: str, selector: str, attribute: str, grace_ms: int = 2000
+    ) -> Optional[str]:
+        """
+        Fetch a single attribute from a page without loading all of it.
+
+        Waits only until the selector matches, reads the attribute in the
+        browser, then stops loading the page and releases it. The page HTML
+        is never serialized or parsed.
+
+        Args:
+            url: URL to fetch
+            selector: CSS selector of the element to read
+            attribute: Attribute name to read from the element
+            grace_ms: How long to wait for the element after the DOM has been
+                parsed before deciding it is not there (dynamic content)
+
+        Returns:
+            Attribute value, or None if the element is not on the page
+        """
+        async with self.scheduler.slot():
+            context, page = await self._new_page()
+
+            try:
+                with METRICS.timer("whosampled_navigation_seconds"), span("navigate"):
+                    response = await page.goto(url, wait_until="commit", timeout=60000)
+                self._count_response(response)
+
+                with METRICS.timer("whosampled_wait_seconds"), span("wait"):
+                    handle = await page.wait_for_function(
+                        _WAIT_FOR_ATTRIBUTE_JS,
+                        arg=[selector, attribute, grace_ms],
+                        timeout=60000,
+                    )
+                    result = await handle.json_value()
+
+                # We have what we came for, stop loading the rest of the page
+                await page.evaluate("window.stop()")
+
+                self._count_fetch()
+                return result["value"]
+
+            except Exception as e:
+                METRICS.increment("whosampled_fetches_total", outcome="error")
+                logger.warning("Error fetching %s from %s: %s", selector, url, e)
+                raise
+
+            finally:
+                await page.close()
+                await context.close()
+
+    @traced("search_track", ("query",))
+    async def search_track(self, query: str, prefetch: bool = False) -> Optional[Dict]:
         """
         Search for a track on WhoSampled.
 
         Args:
             query: Search query (artist name, track name, or both)
+            prefetch: If True, fetch and cache the top hit's track page in the
+                background, since it is usually requested next
 
         Returns:
             Dictionary with track information and URL, or None if not found
         """
-        params = urllib.parse.urlencode({"q": query})
-        search_url = f"{self.SEARCH_URL}?{params}"
+        key = self._query_key(query)
+        track = self._lookup_query(key, query)
+        if track is not None:
+            if prefetch:
+                self.prefetch_track_details(track.url)
+            return track.to_dict()
 
         try:
-            html = await self._fetch_page(search_url)
-            soup = BeautifulSoup(html, "lxml")
+            soup = await self._fetch_search_page(query)
 
             # Find the first track result
             # Try both trackTitle and trackName classes
-            track_result = soup.select_one("a.trackTitle") or soup.select_one(
-                "a.trackName"
+            track_result = _SEARCH_TITLE.select_one(soup) or _SEARCH_NAME.select_one(
+                soup
             )
             if not track_result:
                 return None
 
-            track_url = self.BASE_URL + track_result.get("href", "")
-            track_title = track_result.get_text(strip=True)
+            track = Track(
+                title=track_result.get_text(strip=True),
+                artist=self._extract_artist_name(track_result),
+                url=self.BASE_URL + track_result.get("href", ""),
+            )
+            self._resolved_queries.put(key, track)
+            self._index_track(track)
 
-            # Extract artist name from the result
-            artist_name = self._extract_artist_name(track_result)
+            if prefetch:
+                self.prefetch_track_details(track.url)
 
-            return {"title": track_title, "artist": artist_name, "url": track_url}
+            return track.to_dict()
 
         except Exception as e:
-            print(f"Error searching track: {e}")
+            logger.warning("Error searching track: %s", e)
             return None
 
+    @traced("search_tracks", ("query",))
+    async def search_tracks(self, query: str, limit: int = 5) -> List[Dict]:
+        """
+        Search for a track and return the best candidates from one search page.
+
+        Every track result on the page is scored against the query locally,
+        so clients can pick the right one without issuing more searches.
+
+        Args:
+            query: Search query (artist name, track name, or both)
+            limit: Maximum number of candidates to return
+
+        Returns:
+            List of dictionaries with title, artist, url, section ("top_hit",
+            "connections" or "tracks") and score, best match first. Empty
+            if nothing was found or the search failed.
+        """
+        try:
+            soup = await self._fetch_search_page(query)
+        except Exception as e:
+            logger.warning("Error searching tracks: %s", e)
+            return []
+
+        candidates = []
+        seen_urls = set()
+        for track_link in _SEARCH_HIT.select(soup):
+            track_href = track_link.get("href", "")
+            if not track_href or track_href in seen_urls:
+                continue
+            seen_urls.add(track_href)
+
+            track = Track(
+                title=track_link.get_text(strip=True),
+                artist=self._extract_artist_name(track_link),
+                url=self.BASE_URL + track_href,
+            )
+            self._index_track(track)
+            candidate = track.to_dict()
+            candidate["section"] = self._search_section(track_link)
+            candidate["score"] = _relevance(query, track.title, track.artist)
+            candidates.append(candidate)
+
+        self.track_index.maybe_save()
+
+        # Stable sort keeps the site's order for equal scores
+        candidates.sort(key=lambda candidate: candidate["score"], reverse=True)
+        return candidates[:limit]
+
+    async def _fetch_search_page(self, query: str):
+        """
+        Fetch and parse the search results page for a query.
+
+        Concurrent calls whose queries normalize to the same key share a
+        single fetch.
+
+        Args:
+            query: Search query
+
+        Returns:
+            BeautifulSoup document of the search results
+        """
+        params = urllib.parse.urlencode({"q": query})
+        search_url = f"{self.SEARCH_URL}?{params}"
+        html = await self._search_pages.run(
+            self._query_key(query), lambda: self._fetch_page(search_url)
+        )
+        return _soup(html)
+
+    def _query_key(self, query: str) -> str:
+        """Normalized form of a query used for cache and coalescing keys."""
+        return normalize_query(query)
+
+    def _lookup_query(self, key: str, query: str) -> Optional[Track]:
+        """
+        Resolve a query without the site.
+
+        Checks the queries resolved before, then the local track index
+        (neither inside cache.bypass_caches()).
+
+        Args:
+            key: Normalized query (see _query_key)
+            query: Search query
+
+        Returns:
+            Track the query refers to, or None if it is not known confidently
+        """
+        if caches_bypassed():
+            return None
+        track = self._resolved_queries.get(key)
+        if track is None:
+            track = self.track_index.lookup(query)
+            if track is not None:
+                self._resolved_queries.put(key, track)
+        return track
+
+    def _index_track(self, track: Track):
+        """Add a track to the local index if its URL is a track page."""
+        path = urllib.parse.urlparse(track.url).path
+        parts = path.strip("/").split("/")
+        if len(parts) == 2 and parts[0].lower() not in self._NON_TRACK_PATHS:
+            self.track_index.add(track)
+
+    def _search_section(self, track_link) -> str:
+        """
+        Determine which search results section a track link belongs to.
+
+        Args:
+            track_link: BeautifulSoup track link element
+
+        Returns:
+            "top_hit", "connections" or "tracks"
+        """
+        for parent in track_link.parents:
+            classes = " ".join(parent.get("class", [])).lower()
+            if "topresult" in classes or "top-result" in classes:
+                return "top_hit"
+            if parent.name == "section":
+                header = parent.find(["h2", "h3", "h4"])
+                header_text = header.get_text(strip=True).lower() if header else ""
+                if "connection" in classes or "connection" in header_text:
+                    return "connections"
+        return "tracks"
+
+    @traced("find_track_details", ("query",))
+    async def find_track_details(
+        self,
+        query: str,
+        include_youtube: bool = False,
+        sections: Optional[List[str]] = None,
+        max_items: Optional[int] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Optional[Dict]:
+        """
+        Search for a track and get its details in as few round trips as possible.
+
+        For "artist title" queries the likely track page URLs are fetched
+        alongside the search request. If one of them is a valid track page
+        before the search finishes, its details are used and the search is
+        cancelled; otherwise the probes are cancelled and the top search hit
+        is fetched as usual.
+
+        Args:
+            query: Search query (artist name, track name, or both)
+            include_youtube: Whether to include YouTube links
+            sections: Connection types to return (None for all)
+            max_items: Maximum number of connections returned per type
+            offset: Number of connections skipped per type
+            limit: Page size per type (see get_track_details)
+
+        Returns:
+            Dictionary with track details (see get_track_details), or None if
+            no track was found
+        """
+        # Queries resolved before go straight to the track page
+        track = self._lookup_query(self._query_key(query), query)
+        if track is not None:
+            return await self.get_track_details(
+                track.url, include_youtube, sections, max_items, offset, limit
+            )
+
+        search_task = asyncio.create_task(self.search_track(query))
+        probe_task = asyncio.create_task(self._probe_track_urls(query))
+
+        try:
+            await asyncio.wait(
+                {search_task, probe_task}, return_when=asyncio.FIRST_COMPLETED
+            )
+
+            if probe_task.done() and probe_task.result() is not None:
+                search_task.cancel()
+                track_url, soup = probe_task.result()
+                try:
+                    details = self._parse_track_page(track_url, soup, sections)
+                    track_path = urllib.parse.urlparse(track_url).path
+                    self._resolved_queries.put(
+                        self._query_key(query),
+                        Track(
+                            title=details.title or "",
+                            artist=self._extract_artist_from_url(track_path),
+                            url=track_url,
+                        ),
+                    )
+                    # Served from the page just parsed into the cache
+                    details = await self.fetch_track_details(
+                        track_url, include_youtube, sections, max_items, offset, limit
+                    )
+                    return details.to_dict()
+                except Exception as e:
+                    logger.warning("Error getting track details: %s", e)
+                    return {"error": str(e), "url": track_url}
+
+            probe_task.cancel()
+            search_result = await search_task
+            if search_result is None:
+                return None
+
+            return await self.get_track_details(
+                search_result["url"], include_youtube, sections, max_items, offset, limit
+            )
+
+        finally:
+            for task in (search_task, probe_task):
+                if not task.done():
+                    task.cancel()
+
+    async def find_track_details_batch(
+        self,
+        items: List[str],
+        include_youtube: bool = False,
+        sections: Optional[List[str]] = None,
+        max_items: Optional[int] = None,
+        deadline: Optional[float] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> List[Dict]:
+        """
+        Get the details of many tracks, given as search queries or track URLs.
+
+        Duplicate items (same normalized query or same URL) are resolved
+        once. All items run concurrently through the shared caches and fetch
+        scheduler at BULK priority, so other tools' fetches go first, and a
+        failing item does not affect the others.
+
+        Args:
+            items: Search queries and/or WhoSampled track URLs
+            include_youtube: Whether to include YouTube links
+            sections: Connection types to return (None for all)
+            max_items: Maximum number of connections returned per type
+            deadline: Seconds after which unfinished items are cancelled
+                (None to wait for all)
+            offset: Number of connections skipped per type
+            limit: Page size per type (see get_track_details)
+
+        Returns:
+            One dictionary per item, in input order, with item, status ("ok",
+            "not_found", "error" or "timeout") and either details (see
+            get_track_details) or error
+        """
+        keys = []
+        unique: Dict[str, str] = {}
+        for item in items:
+            if item.startswith(("http://", "https://")):
+                key = "url:" + self._track_key(item)
+            else:
+                key = "query:" + self._query_key(item)
+            keys.append(key)
+            unique.setdefault(key, item)
+
+        async def resolve(item):
+            if item.startswith(("http://", "https://")):
+                return await self.get_track_details(
+                    item, include_youtube, sections, max_items, offset, limit
+                )
+            return await self.find_track_details(
+                item, include_youtube, sections, max_items, offset, limit
+            )
+
+        # Items may number in the hundreds of fetches, so they run as bulk
+        # work behind interactive calls. Only the batch reports progress: the
+        # items' own counters would make the call's progress go back and forth.
+        with fetch_priority(BULK), progress_callback(None):
+            tasks = {
+                key: asyncio.create_task(resolve(item)) for key, item in unique.items()
+            }
+        done_count = 0
+
+        def count_done(_task):
+            nonlocal done_count
+            done_count += 1
+
+        for task in tasks.values():
+            task.add_done_callback(count_done)
+
+        pending = set(tasks.values())
+        try:
+            loop = asyncio.get_running_loop()
+            stop_at = loop.time() + deadline if deadline is not None else None
+            while pending:
+                timeout = None if stop_at is None else max(0, stop_at - loop.time())
+                finished, pending = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not finished:
+                    break
+                await report_progress(done_count, len(tasks), "Resolving tracks")
+        finally:
+            for task in pending:
+                task.cancel()
+
+        outcomes = {}
+        for key, task in tasks.items():
+            if not task.done() or task.cancelled():
+                outcomes[key] = {"status": "timeout", "error": "Deadline exceeded"}
+            elif task.exception() is not None:
+                outcomes[key] = {"status": "error", "error": str(task.exception())}
+            elif task.result() is None:
+                outcomes[key] = {"status": "not_found"}
+            elif "error" in task.result():
+                outcomes[key] = {"status": "error", "error": task.result()["error"]}
+            else:
+                outcomes[key] = {"status": "ok", "details": task.result()}
+
+        return [{"item": item, **outcomes[key]} for item, key in zip(items, keys)]
+
+    def _candidate_track_urls(self, query: str) -> List[str]:
+        """
+        Build likely track page URLs for an "artist title" query.
+
+        WhoSampled track pages live at /Artist-Name/Track-Name/. Every split of
+        the query words into artist and title gives a candidate; two-word
+        artists are tried first, then one-word, then longer ones.
+
+        Args:
+            query: Search query, e.g. "daft punk one more time"
+
+        Returns:
+            Candidate track URLs, at most MAX_URL_PROBES of them
+        """
+        words = [word[:1].upper() + word[1:] for word in query.split()]
+        if len(words) < 2:
+            return []
+
+        splits = sorted(range(1, len(words)), key=lambda i: (i != 2, i))
+        urls = []
+        for split in splits[: self.MAX_URL_PROBES]:
+            artist = urllib.parse.quote("-".join(words[:split]), safe=",'!-()&")
+            title = urllib.parse.quote("-".join(words[split:]), safe=",'!-()&")
+            urls.append(f"{self.BASE_URL}/{artist}/{title}/")
+        return urls
+
+    async def _probe_track_urls(self, query: str):
+        """
+        Fetch candidate track URLs concurrently and keep the first valid page.
+
+        Args:
+            query: Search query
+
+        Returns:
+            Tuple of (track URL, BeautifulSoup document), or None if no
+            candidate is a track page
+        """
+
+        async def probe(url):
+            html = await self._fetch_page(url)
+            soup = _soup(html)
+            # Missing pages and redirects to search have no track title
+            if _TRACK_PAGE_TITLE.select_one(soup) is None:
+                return None
+            return url, soup
+
+        tasks = [
+            asyncio.create_task(probe(url)) for url in self._candidate_track_urls(query)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    result = await next_done
+                except Exception:
+                    continue
+                if result is not None:
+                    return result
+            return None
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @traced("get_youtube_links_from_search", ("query",))
     async def get_youtube_links_from_search(
-        self, query: str, max_per_section: int = 3
+        self, query: str, max_per_section: int = 3, offset: int = 0
     ) -> Dict:
         """
         Get YouTube links from search results with priority: Top Hit > Connections > Tracks.
@@ -168,40 +921,47 @@ class WhoSampledScraper:
         Args:
             query: Search query (artist name, track name, or both)
             max_per_section: Maximum number of tracks to get from each section (default: 3)
+            offset: Number of tracks skipped in each section (for paging)
 
         Returns:
-            Dictionary with YouTube links organized by section priority
+            Dictionary with YouTube links organized by section priority, and
+            has_more (True if a section has tracks after this page)
         """
-        params = urllib.parse.urlencode({"q": query})
-        search_url = f"{self.SEARCH_URL}?{params}"
+        cache_key = (self._query_key(query), max_per_section, offset)
+        cached = None if caches_bypassed() else self._youtube_links_cache.get(cache_key)
+        if cached is not None:
+            return {**cached, "query": query}
 
         result = {"query": query, "top_hit": [], "connections": [], "tracks": []}
+        end = offset + max_per_section
+        has_more = False
 
         try:
-            html = await self._fetch_page(search_url)
-            soup = BeautifulSoup(html, "lxml")
+            soup = await self._fetch_search_page(query)
 
             # Find sections in the search results
             # WhoSampled typically has: top result, connections, and tracks sections
 
             # Try to identify Top Hit (usually the first prominent result)
-            top_hit_section = soup.select_one(
-                "div.topResult, div.top-result, section.topResult"
-            )
+            # Tracks on this and earlier pages, left out of the Tracks section
+            existing_urls = set()
+            top_hit_section = _TOP_HIT_SECTION.select_one(soup)
             if top_hit_section:
-                tracks = await self._extract_tracks_with_youtube(
-                    top_hit_section, max_per_section
+                track_links = _SEARCH_HIT.select(top_hit_section)
+                result["top_hit"] = await self._extract_tracks_with_youtube(
+                    track_links[offset:end]
                 )
-                result["top_hit"] = tracks
-            elif not top_hit_section:
+                existing_urls.update(self._link_urls(track_links[:end]))
+                has_more = has_more or len(track_links) > end
+            else:
                 # If no specific top hit section, treat first track as top hit
-                first_track = soup.select_one("a.trackTitle, a.trackName")
+                first_track = _SEARCH_HIT.select_one(soup)
                 if first_track:
-                    tracks = await self._extract_tracks_with_youtube(
-                        soup, 1, start_from_first=True
-                    )
-                    if tracks:
-                        result["top_hit"] = tracks
+                    existing_urls.update(self._link_urls([first_track]))
+                    if offset == 0:
+                        result["top_hit"] = await self._extract_tracks_with_youtube(
+                            [first_track]
+                        )
 
             # Find Connections section
             connections_section = soup.find(
@@ -218,63 +978,51 @@ class WhoSampledScraper:
                         break
 
             if connections_section:
-                tracks = await self._extract_tracks_with_youtube(
-                    connections_section, max_per_section
+                track_links = _SEARCH_HIT.select(connections_section)
+                result["connections"] = await self._extract_tracks_with_youtube(
+                    track_links[offset:end]
                 )
-                result["connections"] = tracks
+                existing_urls.update(self._link_urls(track_links[:end]))
+                has_more = has_more or len(track_links) > end
 
             # Find Tracks section (general results)
             # Usually all track results not in top hit or connections
-            all_track_links = soup.select("a.trackTitle, a.trackName")
-
-            # Filter out tracks already in top_hit or connections
-            existing_urls = set()
-            for section_tracks in [result["top_hit"], result["connections"]]:
-                for t in section_tracks:
-                    existing_urls.add(t["url"])
-
-            tracks_to_process = []
-            for track_link in all_track_links:
-                track_url = self.BASE_URL + track_link.get("href", "")
-                if (
-                    track_url not in existing_urls
-                    and len(tracks_to_process) < max_per_section
-                ):
-                    tracks_to_process.append(track_link)
+            other_track_links = [
+                track_link
+                for track_link in _SEARCH_HIT.select(soup)
+                if self.BASE_URL + track_link.get("href", "") not in existing_urls
+            ]
 
             # Extract YouTube links for remaining tracks
-            for track_link in tracks_to_process:
-                track_info = await self._extract_single_track_with_youtube(track_link)
-                if track_info:
-                    result["tracks"].append(track_info)
+            result["tracks"] = await self._extract_tracks_with_youtube(
+                other_track_links[offset:end]
+            )
+            has_more = has_more or len(other_track_links) > end
 
+            result["has_more"] = has_more
+            self._youtube_links_cache.put(cache_key, result)
             return result
 
         except Exception as e:
-            print(f"Error getting YouTube links from search: {e}")
+            logger.warning("Error getting YouTube links from search: %s", e)
             return {"error": str(e), "query": query}
 
-    async def _extract_tracks_with_youtube(
-        self, section, max_count: int, start_from_first: bool = False
-    ) -> List[Dict]:
+    def _link_urls(self, track_links) -> List[str]:
+        """Get the full URLs of search result links."""
+        return [self.BASE_URL + track_link.get("href", "") for track_link in track_links]
+
+    async def _extract_tracks_with_youtube(self, track_links) -> List[Dict]:
         """
-        Extract tracks with YouTube links from a section.
+        Extract tracks with YouTube links from search result links.
 
         Args:
-            section: BeautifulSoup section element
-            max_count: Maximum number of tracks to extract
-            start_from_first: If True, start from the first track in the section
+            track_links: BeautifulSoup track link elements
 
         Returns:
             List of dictionaries with track information and YouTube links
         """
         tracks = []
-        track_links = section.select("a.trackTitle, a.trackName")
-
-        for i, track_link in enumerate(track_links):
-            if i >= max_count:
-                break
-
+        for track_link in track_links:
             track_info = await self._extract_single_track_with_youtube(track_link)
             if track_info:
                 tracks.append(track_info)
@@ -292,43 +1040,31 @@ class WhoSampledScraper:
             Dictionary with track information and YouTube link, or None
         """
         try:
-            track_name = track_link.get_text(strip=True)
-            track_href = track_link.get("href", "")
-            track_url = self.BASE_URL + track_href if track_href else ""
-            artist_name = self._extract_artist_name(track_link)
-
-            track_info = {
-                "track": track_name,
-                "artist": artist_name,
-                "url": track_url,
-                "youtube_url": None,
-            }
+            connection = self._parse_connection(track_link)
+            self._index_connection(connection)
+            youtube_url = None
 
             # Get YouTube link from track page
-            if track_url:
-                try:
-                    html = await self._fetch_page(track_url)
-                    soup = BeautifulSoup(html, "lxml")
+            if connection.url:
+                youtube_url = await self._get_youtube_url(connection.url)
 
-                    # WhoSampled uses data-id attribute for YouTube video IDs
-                    youtube_embed = soup.select_one(
-                        "div.embed-placeholder[data-id], div.youtube-placeholder[data-id]"
-                    )
-                    if youtube_embed:
-                        video_id = youtube_embed.get("data-id", "")
-                        if video_id:
-                            track_info["youtube_url"] = f"https://youtu.be/{video_id}"
-                except Exception as e:
-                    print(f"Error fetching YouTube link for {track_url}: {e}")
-
-            return track_info
+            return replace(connection, youtube_url=youtube_url).to_dict(
+                keep_missing_youtube=True
+            )
 
         except Exception as e:
-            print(f"Error extracting track with YouTube: {e}")
+            logger.warning("Error extracting track with YouTube: %s", e)
             return None
 
+    @traced("get_track_details", ("track_url",))
     async def get_track_details(
-        self, track_url: str, include_youtube: bool = False
+        self,
+        track_url: str,
+        include_youtube: bool = False,
+        sections: Optional[List[str]] = None,
+        max_items: Optional[int] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
     ) -> Dict:
         """
         Get detailed information about a track.
@@ -336,85 +1072,771 @@ class WhoSampledScraper:
         Args:
             track_url: URL of the track page
             include_youtube: Whether to include YouTube links
+            sections: Connection types to return (e.g. ["samples",
+                "sampled_by"]); None for all. Other subsections are not
+                parsed and get no YouTube lookups.
+            max_items: Maximum number of connections returned per type
+            offset: Number of connections skipped per type (for paging)
+            limit: Maximum number of connections returned per type in this
+                page; sets next_offset if there are more (None for all)
 
         Returns:
             Dictionary with track details including samples, covers, remixes
         """
         try:
+            details = await self.fetch_track_details(
+                track_url, include_youtube, sections, max_items, offset, limit
+            )
+            return details.to_dict()
+
+        except Exception as e:
+            logger.warning("Error getting track details: %s", e)
+            return {"error": str(e), "url": track_url}
+
+    @traced("fetch_track_details", ("track_url",))
+    async def fetch_track_details(
+        self,
+        track_url: str,
+        include_youtube: bool = False,
+        sections: Optional[List[str]] = None,
+        max_items: Optional[int] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> TrackDetails:
+        """
+        Fetch a track page and parse it into a TrackDetails record.
+
+        Parsed pages are cached, and a prefetch of the same page that is
+        already fetching is awaited instead of fetching again; one still
+        queued for a slot is cancelled. Unlike get_track_details, errors are
+        raised to the caller.
+
+        Args:
+            track_url: URL of the track page
+            include_youtube: Whether to include YouTube links
+            sections: Connection types to parse and return (None for all)
+            max_items: Maximum number of connections returned per type; only
+                those get YouTube lookups
+            offset: Number of connections skipped per type
+            limit: Page size per type (see TrackDetails.select); only the
+                page gets YouTube lookups
+
+        Returns:
+            TrackDetails record with samples, covers and remixes
+        """
+        if sections is not None:
+            for connection_type in sections:
+                if connection_type not in CONNECTION_TYPES:
+                    raise ValueError(f"Unknown connection type: {connection_type}")
+        wanted = CONNECTION_TYPES if sections is None else sections
+
+        key = self._track_key(track_url)
+
+        # Inside cache.bypass_caches() only a prefetch already running counts
+        fresh = caches_bypassed()
+        details = None if fresh else self._details_cache.get(key)
+        parse_sections = wanted
+        if details is not None and not details.has_sections(wanted):
+            # Cached from a narrower request; parse what both asked for
+            parse_sections = set(wanted) | set(details.sections)
+            details = None
+        prefetch = self._prefetches.get(key) if details is None else None
+        if prefetch is not None and not (
+            prefetch.done() or self.scheduler.holds_slot(prefetch)
+        ):
+            # Still waiting for a prefetch slot; waiting on it would put this
+            # request behind the prefetch queue, so fetch at our own priority
+            prefetch.cancel()
+            prefetch = None
+        if prefetch is not None:
+            try:
+                details = await asyncio.shield(prefetch)
+            except Exception:
+                details = None
+        if details is not None:
+            self._record_prefetch_use(key)
+        elif not fresh:
+            details = self._stored_track_details(track_url)
+        if details is None:
             html = await self._fetch_page(track_url)
-            soup = BeautifulSoup(html, "lxml")
+            soup = _soup(html)
+            details = self._parse_track_page(track_url, soup, parse_sections)
+
+        details = details.select(sections, max_items, offset, limit)
+        if include_youtube:
+            details = await self._add_youtube_links(details)
+        return details
+
+    def _stored_track_details(self, track_url: str) -> Optional[TrackDetails]:
+        """
+        Get a track page crawled within GRAPH_MAX_AGE from the connection graph.
+
+        The page is put back into the details cache and its YouTube video into
+        the index, as if it had just been parsed.
+
+        Args:
+            track_url: URL of the track page
+
+        Returns:
+            TrackDetails record, or None if the page is not stored or too old
+            (always None without a data directory)
+        """
+        if self.graph is None:
+            return None
+        stored = self.graph.track_details(track_url, max_age=self.GRAPH_MAX_AGE)
+        if stored is None:
+            return None
+
+        details, video_id = stored
+        if video_id is not None:
+            self._remember_youtube_id(track_url, video_id or None)
+        self._details_cache.put(self._track_key(track_url), details)
+        return details
+
+    @METRICS.timed("whosampled_parse_seconds", kind="track_page")
+    @traced("parse_track_page", ("track_url",))
+    def _parse_track_page(self, track_url: str, soup, sections=None) -> TrackDetails:
+        """
+        Parse a fetched track page into a TrackDetails record and cache it.
+
+        The record has no YouTube links; see _add_youtube_links.
+
+        Args:
+            track_url: URL of the track page
+            soup: BeautifulSoup document of the track page
+            sections: Connection types to parse (None for all); the other
+                subsections are skipped
+
+        Returns:
+            TrackDetails record with samples, covers and remixes
+        """
+        wanted = CONNECTION_TYPES if sections is None else set(sections)
+        fields = {
+            "sections": tuple(t for t in CONNECTION_TYPES if t in wanted)
+        }
+
+        # Get track title and artist
+        title_elem = _TRACK_TITLE.select_one(soup)
+        if title_elem:
+            fields["title"] = title_elem.get_text(strip=True)
+
+        # Remember the page's own YouTube video for _add_youtube_links
+        video_id = self._extract_youtube_id(soup)
+        self._remember_youtube_id(track_url, video_id)
+
+        # Find all subsections (WhoSampled uses section.subsection with headers)
+        subsections = _SUBSECTION.select(soup)
+
+        for subsection in subsections:
+            # Get the header to determine the type of connection
+            header = subsection.find(["h2", "h3", "h4"])
+            if not header:
+                continue
+
+            # Determine connection type based on header text
+            connection_type = _classify_header(header.get_text(strip=True))
+            if connection_type not in wanted:
+                continue
+
+            fields[connection_type] = tuple(
+                self._parse_connection(track_link)
+                for track_link in _select_track_links(subsection)
+            )
+
+        details = TrackDetails(url=track_url, **fields)
+        self._details_cache.put(self._track_key(track_url), details)
+
+        artist = self._extract_artist_from_url(urllib.parse.urlparse(track_url).path)
+        if self.graph is not None:
+            self.graph.record_page(
+                details,
+                artist=artist if artist != "Unknown" else None,
+                youtube_id=video_id or "",
+                complete=details.sections == CONNECTION_TYPES,
+            )
+
+        if details.title:
+            self._index_track(Track(title=details.title, artist=artist, url=track_url))
+        for connection_type in CONNECTION_TYPES:
+            for connection in details.connections(connection_type):
+                self._index_connection(connection)
+        self.track_index.maybe_save()
+
+        return details
+
+    @traced("youtube_links")
+    async def _add_youtube_links(self, details: TrackDetails) -> TrackDetails:
+        """
+        Add YouTube links to a track and all of its connections.
+
+        Lookups run concurrently (bounded by the fetch scheduler), and each
+        finished lookup is reported through progress.report_progress.
+
+        Args:
+            details: TrackDetails record without YouTube links
+
+        Returns:
+            New TrackDetails record with YouTube links where available
+        """
+        connections = [
+            connection
+            for connection_type in CONNECTION_TYPES
+            for connection in details.connections(connection_type)
+        ]
+        total = len(connections) + 1
+        done = 0
+
+        async def tracked(lookup):
+            nonlocal done
+            result = await lookup
+            done += 1
+            await report_progress(done, total, "Fetching YouTube links")
+            return result
+
+        youtube_url, *enriched = await asyncio.gather(
+            tracked(self._get_youtube_url(details.url)),
+            *(tracked(self._add_youtube_link(c)) for c in connections),
+        )
+
+        fields = {"youtube_url": youtube_url}
+        position = 0
+        for connection_type in CONNECTION_TYPES:
+            count = len(details.connections(connection_type))
+            fields[connection_type] = tuple(enriched[position : position + count])
+            position += count
+        return replace(details, **fields)
+
+    async def _add_youtube_link(self, connection: Connection) -> Connection:
+        """Add the YouTube link to a connection, if it has one."""
+        if not connection.url:
+            return connection
+        youtube_url = await self._get_youtube_url(connection.url)
+        if youtube_url:
+            return replace(connection, youtube_url=youtube_url)
+        return connection
+
+    def start_youtube_lookups(self, track_urls: List[str]) -> str:
+        """
+        Look up the YouTube links of tracks in the background.
+
+        Lets a caller return a track's connections at once and collect the
+        slower YouTube links later with youtube_lookup_results. The lookups
+        run at BULK priority, so they do not hold up interactive fetches,
+        and are cancelled if the job expires or is evicted before finishing.
+
+        Args:
+            track_urls: Track URLs to look up (duplicates are looked up once)
+
+        Returns:
+            Cursor for youtube_lookup_results
+        """
+        urls = list(dict.fromkeys(url for url in track_urls if url))
+        links: Dict[str, Optional[str]] = {}
 
-            result = {
+        async def lookup(url):
+            links[url] = await self._get_youtube_url(url)
+
+        async def run():
+            with fetch_priority(BULK):
+                await asyncio.gather(*(lookup(url) for url in urls))
+
+        task = asyncio.create_task(run())
+        self._youtube_job_tasks.add(task)
+        task.add_done_callback(self._youtube_job_tasks.discard)
+
+        cursor = uuid.uuid4().hex[:16]
+        self._youtube_jobs.put(cursor, {"urls": urls, "links": links, "task": task})
+        return cursor
+
+    async def youtube_lookup_results(
+        self, cursor: str, wait: float = 0
+    ) -> Optional[Dict]:
+        """
+        Get the YouTube links found so far by start_youtube_lookups.
+
+        Args:
+            cursor: Cursor returned by start_youtube_lookups
+            wait: Seconds to wait for the remaining lookups to finish
+
+        Returns:
+            Dictionary with links (track URL -> YouTube URL or None), pending
+            (number of lookups still running) and done, or None if the cursor
+            is unknown or expired
+        """
+        job = self._youtube_jobs.get(cursor)
+        if job is None:
+            return None
+
+        if wait > 0 and not job["task"].done():
+            await asyncio.wait({job["task"]}, timeout=wait)
+
+        links = dict(job["links"])
+        return {
+            "links": links,
+            "pending": len(job["urls"]) - len(links),
+            "done": job["task"].done(),
+        }
+
+    @traced("trace_sample_lineage")
+    async def trace_sample_lineage(
+        self,
+        track_url: str,
+        depth: int = 3,
+        max_nodes: int = 50,
+        connection_types=("samples",),
+    ) -> Dict:
+        """
+        Follow connections from a track breadth-first, several levels deep.
+
+        Each level's pages are fetched concurrently at BULK priority, so the
+        scheduler bounds the load and interactive calls go first. Cached pages
+        are reused and every track is visited once.
+
+        Args:
+            track_url: URL of the starting track page
+            depth: Number of levels to follow
+            max_nodes: Maximum number of tracks in the result, including the
+                starting one
+            connection_types: Connection types to follow (see CONNECTION_TYPES)
+
+        Returns:
+            Dictionary with url, nodes (url, title, artist, depth, parent and
+            the connection type leading to it, in BFS order), edges (source,
+            type, target), errors (url, error) and truncated (True if
+            max_nodes cut the crawl short)
+        """
+        for connection_type in connection_types:
+            if connection_type not in CONNECTION_TYPES:
+                raise ValueError(f"Unknown connection type: {connection_type}")
+
+        track_path = urllib.parse.urlparse(track_url).path
+        nodes = {
+            self._track_key(track_url): {
                 "url": track_url,
-                "samples": [],
-                "sampled_by": [],
-                "covers": [],
-                "covered_by": [],
-                "remixes": [],
-                "remixed_by": [],
+                "title": None,
+                "artist": self._extract_artist_from_url(track_path),
+                "depth": 0,
+                "parent": None,
+                "type": None,
             }
+        }
+        edges = []
+        errors = []
+        truncated = False
+
+        frontier = [track_url]
+        with fetch_priority(BULK):
+            for level in range(1, depth + 1):
+                if not frontier:
+                    break
+
+                results = await asyncio.gather(
+                    *(
+                        self.fetch_track_details(url, sections=connection_types)
+                        for url in frontier
+                    ),
+                    return_exceptions=True,
+                )
 
-            # Get track title and artist
-            title_elem = soup.select_one("h1.trackName, h1")
-            if title_elem:
-                result["title"] = title_elem.get_text(strip=True)
-
-            # Get YouTube link if requested
-            if include_youtube:
-                # WhoSampled uses data-id attribute for YouTube video IDs
-                youtube_embed = soup.select_one(
-                    "div.embed-placeholder[data-id], div.youtube-placeholder[data-id]"
+                next_frontier = []
+                for url, details in zip(frontier, results):
+                    if isinstance(details, Exception):
+                        errors.append({"url": url, "error": str(details)})
+                        continue
+                    if details.title:
+                        nodes[self._track_key(url)]["title"] = details.title
+
+                    for connection_type in connection_types:
+                        for connection in details.connections(connection_type):
+                            if not connection.url:
+                                continue
+                            key = self._track_key(connection.url)
+                            if key not in nodes:
+                                if len(nodes) >= max_nodes:
+                                    truncated = True
+                                    continue
+                                nodes[key] = {
+                                    "url": connection.url,
+                                    "title": connection.track,
+                                    "artist": connection.artist,
+                                    "depth": level,
+                                    "parent": url,
+                                    "type": connection_type,
+                                }
+                                next_frontier.append(connection.url)
+                            edges.append(
+                                {
+                                    "source": url,
+                                    "type": connection_type,
+                                    "target": connection.url,
+                                }
+                            )
+                frontier = next_frontier
+                await report_progress(
+                    len(nodes), max_nodes, f"Traced {level} of {depth} levels"
                 )
-                if youtube_embed:
-                    video_id = youtube_embed.get("data-id", "")
-                    if video_id:
-                        result["youtube_url"] = f"https://youtu.be/{video_id}"
-
-            # Find all subsections (WhoSampled uses section.subsection with headers)
-            subsections = soup.select("section.subsection")
-
-            for subsection in subsections:
-                # Get the header to determine the type of connection
-                header = subsection.find(["h2", "h3", "h4"])
-                if not header:
-                    continue
 
-                header_text = header.get_text(strip=True).lower()
+        return {
+            "url": track_url,
+            "nodes": list(nodes.values()),
+            "edges": edges,
+            "errors": errors,
+            "truncated": truncated,
+        }
+
+    async def iter_connections(
+        self, track_url: str, connection_type: str, max_pages: Optional[int] = None
+    ) -> AsyncIterator[Connection]:
+        """
+        Stream every connection of one type from a track's "see all" pages.
+
+        Track pages only preview each subsection; the full lists are on
+        paginated pages such as /Artist/Track/sampled/?cp=2. Pages are parsed
+        one at a time, and the next page is fetched while the current one is
+        parsed and consumed. If the track has no "see all" pages (the first
+        one fails, is answered with a non-2xx status or lists nothing of this
+        type), the preview from the track page is used.
 
-                # Determine connection type based on header text
-                if "contains sample" in header_text or (
-                    "sampled" in header_text and "sampled in" not in header_text
+        Args:
+            track_url: URL of the track page
+            connection_type: Connection type (see CONNECTION_TYPES)
+            max_pages: Maximum number of pages to fetch (None for all)
+
+        Yields:
+            Connection records without YouTube links, in site order
+        """
+        if connection_type not in CONNECTION_TYPES:
+            raise ValueError(f"Unknown connection type: {connection_type}")
+
+        base_url = f"{self._track_key(track_url)}/{_SEE_ALL_PATHS[connection_type]}/"
+        seen_urls = set()
+        page_number = 1
+        pending = asyncio.ensure_future(self._fetch_page(base_url, require_ok=True))
+
+        try:
+            while pending is not None:
+                try:
+                    html = await pending
+                except Exception:
+                    if page_number > 1:
+                        raise
+                    html = None
+                pending = None
+
+                if html is None:
+                    # No "see all" pages for this track, use the preview
+                    details = await self.fetch_track_details(track_url)
+                    for connection in details.connections(connection_type):
+                        yield connection
+                    return
+
+                # Start on the next page before parsing this one
+                next_page = page_number + 1
+                if f"cp={next_page}" in html and (
+                    max_pages is None or next_page <= max_pages
                 ):
-                    result["samples"] = await self._extract_connections_with_youtube(
-                        subsection, include_youtube
-                    )
-                elif "sampled in" in header_text:
-                    result["sampled_by"] = await self._extract_connections_with_youtube(
-                        subsection, include_youtube
-                    )
-                elif "cover of" in header_text:
-                    result["covers"] = await self._extract_connections_with_youtube(
-                        subsection, include_youtube
-                    )
-                elif "covered in" in header_text or "covered by" in header_text:
-                    result["covered_by"] = await self._extract_connections_with_youtube(
-                        subsection, include_youtube
-                    )
-                elif "remix of" in header_text:
-                    result["remixes"] = await self._extract_connections_with_youtube(
-                        subsection, include_youtube
-                    )
-                elif "remixed in" in header_text or "remixed by" in header_text:
-                    result["remixed_by"] = await self._extract_connections_with_youtube(
-                        subsection, include_youtube
+                    pending = asyncio.ensure_future(
+                        self._fetch_page(f"{base_url}?cp={next_page}", require_ok=True)
                     )
 
-            return result
+                connections = self._parse_see_all_page(_soup(html), connection_type)
+                del html
+
+                new_connections = [c for c in connections if c.url not in seen_urls]
+                if not new_connections:
+                    if page_number == 1:
+                        details = await self.fetch_track_details(track_url)
+                        for connection in details.connections(connection_type):
+                            yield connection
+                    return
+
+                for connection in new_connections:
+                    seen_urls.add(connection.url)
+                    self._index_connection(connection)
+                    yield connection
+                page_number = next_page
+
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    @METRICS.timed("whosampled_parse_seconds", kind="see_all_page")
+    @traced("parse_see_all_page")
+    def _parse_see_all_page(self, soup, connection_type: str) -> List[Connection]:
+        """
+        Parse the connections listed on a "see all" page.
+
+        Only subsections whose header names the connection type are read,
+        so a redirect to another page lists nothing instead of unrelated
+        tracks.
+
+        Args:
+            soup: BeautifulSoup document of the page
+            connection_type: Connection type the page should list
+
+        Returns:
+            List of Connection records
+        """
+        connections = []
+        for subsection in _SUBSECTION.select(soup):
+            header = subsection.find(["h2", "h3", "h4"])
+            if not header or _classify_header(header.get_text(strip=True)) != connection_type:
+                continue
+            connections.extend(
+                self._parse_connection(track_link)
+                for track_link in _select_track_links(subsection)
+            )
+        return connections
+
+    @traced("get_track_connections", ("track_url",))
+    async def get_track_connections(
+        self, track_url: str, connection_type: str, limit: int = 50, offset: int = 0
+    ) -> Dict:
+        """
+        Get a window of the full list of one connection type for a track.
+
+        Only the "see all" pages needed to fill the window are fetched.
+
+        Args:
+            track_url: URL of the track page
+            connection_type: Connection type (see CONNECTION_TYPES)
+            limit: Maximum number of connections to return
+            offset: Number of connections to skip
+
+        Returns:
+            Dictionary with url, type, offset, connections and has_more, or
+            with error and url on failure
+        """
+        connections = []
+        has_more = False
+        try:
+            async with aclosing(
+                self.iter_connections(track_url, connection_type)
+            ) as stream:
+                index = 0
+                async for connection in stream:
+                    if index >= offset + limit:
+                        has_more = True
+                        break
+                    if index >= offset:
+                        connections.append(connection.to_dict())
+                    index += 1
 
         except Exception as e:
-            print(f"Error getting track details: {e}")
+            logger.warning("Error getting track connections: %s", e)
             return {"error": str(e), "url": track_url}
 
+        return {
+            "url": track_url,
+            "type": connection_type,
+            "offset": offset,
+            "connections": connections,
+            "has_more": has_more,
+        }
+
+    def prefetch_track_details(self, track_url: str) -> Optional[asyncio.Task]:
+        """
+        Start fetching and caching a track page in the background.
+
+        Args:
+            track_url: URL of the track page
+
+        Returns:
+            The background task, or None if the page is already cached or
+            being fetched
+        """
+        key = self._track_key(track_url)
+        if key in self._details_cache or key in self._prefetches:
+            return None
+
+        self._sweep_prefetched()
+        self._prefetch_stats["started"] += 1
+
+        async def prefetch():
+            with fetch_priority(PREFETCH):
+                html = await self._fetch_page(track_url)
+            return self._parse_track_page(track_url, _soup(html))
+
+        task = asyncio.create_task(prefetch())
+        self._prefetches[key] = task
+
+        def done(task):
+            self._prefetches.pop(key, None)
+            if task.cancelled():
+                self._prefetch_stats["cancelled"] += 1
+            elif task.exception() is not None:
+                self._prefetch_stats["failed"] += 1
+            else:
+                self._prefetch_stats["completed"] += 1
+                self._prefetched[key] = time.monotonic()
+
+        task.add_done_callback(done)
+        return task
+
+    def cancel_prefetches(self):
+        """Cancel all background prefetches that are still running."""
+        for task in list(self._prefetches.values()):
+            task.cancel()
+
+    def metric_samples(self):
+        """
+        Yield gauges and counters kept by the scraper, for METRICS collectors.
+
+        Covers the cache layers, the fetch queue per priority class, fetch
+        slot utilization and prefetch outcomes.
+        """
+        caches = {
+            "details": self._details_cache,
+            "query": self._resolved_queries,
+            "youtube_links": self._youtube_links_cache,
+            "youtube_missing": self._missing_youtube,
+        }
+        for layer, cache in caches.items():
+            stats = cache.stats()
+            labels = {"layer": layer}
+            yield "whosampled_cache_hits_total", "counter", labels, stats["hits"]
+            yield "whosampled_cache_misses_total", "counter", labels, stats["misses"]
+            yield "whosampled_cache_entries", "gauge", labels, stats["entries"]
+
+        in_flight = 0
+        for priority, stats in self.scheduler.stats().items():
+            labels = {"priority": priority}
+            in_flight += stats["in_flight"]
+            yield "whosampled_fetches_in_flight", "gauge", labels, stats["in_flight"]
+            yield "whosampled_fetches_queued", "gauge", labels, stats["queued"]
+        yield (
+            "whosampled_fetch_pool_utilization",
+            "gauge",
+            {},
+            in_flight / self.scheduler.capacity,
+        )
+
+        for outcome in ("started", "completed", "failed", "cancelled", "hits", "wasted"):
+            yield (
+                "whosampled_prefetches_total",
+                "counter",
+                {"outcome": outcome},
+                self._prefetch_stats[outcome],
+            )
+
+    def prefetch_stats(self) -> Dict:
+        """
+        Get prefetch counters for tuning the prefetch heuristic.
+
+        Returns:
+            Dictionary with started, completed, failed, cancelled, hits and
+            wasted counts, the number of prefetches in flight, and hit_ratio
+            (hits per completed prefetch that has been used or wasted)
+        """
+        self._sweep_prefetched()
+        stats = dict(self._prefetch_stats)
+        stats["in_flight"] = len(self._prefetches)
+        resolved = stats["hits"] + stats["wasted"]
+        stats["hit_ratio"] = stats["hits"] / resolved if resolved else None
+        return stats
+
+    def _record_prefetch_use(self, key: str):
+        """Count a request served by a prefetch (in flight or cached)."""
+        if self._prefetched.pop(key, None) is not None or key in self._prefetches:
+            self._prefetch_stats["hits"] += 1
+
+    def _sweep_prefetched(self):
+        """Count prefetched pages not requested within PREFETCH_WINDOW as wasted."""
+        deadline = time.monotonic() - self.PREFETCH_WINDOW
+        for key, completed_at in list(self._prefetched.items()):
+            if completed_at < deadline:
+                del self._prefetched[key]
+                self._prefetch_stats["wasted"] += 1
+
+    def _extract_youtube_url(self, soup) -> Optional[str]:
+        """
+        Extract the YouTube link embedded in a track page.
+
+        Args:
+            soup: BeautifulSoup document of a track page
+
+        Returns:
+            YouTube URL, or None if the page has no video
+        """
+        return self._youtube_url(self._extract_youtube_id(soup))
+
+    def _extract_youtube_id(self, soup) -> Optional[str]:
+        """Extract the YouTube video ID embedded in a track page, if any."""
+        # WhoSampled uses data-id attribute for YouTube video IDs
+        youtube_embed = _YOUTUBE_EMBED.select_one(soup)
+        if youtube_embed:
+            return youtube_embed.get("data-id", "") or None
+        return None
+
+    @staticmethod
+    def _youtube_url(video_id: Optional[str]) -> Optional[str]:
+        """Build a YouTube link from a video ID."""
+        return f"https://youtu.be/{video_id}" if video_id else None
+
+    def _remember_youtube_id(self, track_url: str, video_id: Optional[str]):
+        """
+        Store a track's YouTube video ID (None if it has no video).
+
+        A missing video is only remembered for YOUTUBE_MISSING_TTL seconds
+        and does not replace a known video ID.
+        """
+        key = self._track_key(track_url)
+        if video_id is None:
+            if key not in self._youtube_ids:
+                self._missing_youtube.put(key, True)
+            return
+        self._missing_youtube.pop(key)
+        self._youtube_ids[key] = video_id
+        self._youtube_ids.move_to_end(key)
+        while len(self._youtube_ids) > self.YOUTUBE_INDEX_SIZE:
+            self._youtube_ids.popitem(last=False)
+
+    @staticmethod
+    def _track_key(track_url: str) -> str:
+        """Canonical form of a track URL used as index key."""
+        return track_key(track_url)
+
+    async def _get_youtube_url(self, track_url: str) -> Optional[str]:
+        """
+        Get the YouTube link of a track, fetching its page only if not indexed.
+
+        The lookup uses a minimal fetch that only waits for the video embed.
+        Concurrent lookups of the same URL share a single fetch. Fetch errors
+        are not remembered, so the next lookup tries again.
+
+        Args:
+            track_url: URL of the track page
+
+        Returns:
+            YouTube URL, or None if the track has no video or the fetch failed
+        """
+        key = self._track_key(track_url)
+        if key in self._youtube_ids:
+            return self._youtube_url(self._youtube_ids[key])
+        if key in self._missing_youtube:
+            return None
+
+        pending = self._youtube_lookups.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._youtube_lookups[key] = future
+        youtube_url = None
+        try:
+            video_id = await self._fetch_attribute(
+                track_url, _YOUTUBE_EMBED_SELECTOR, "data-id"
+            )
+            video_id = video_id or None
+            self._remember_youtube_id(track_url, video_id)
+            youtube_url = self._youtube_url(video_id)
+        except Exception as e:
+            logger.warning("Error fetching YouTube link for %s: %s", track_url, e)
+        finally:
+            del self._youtube_lookups[key]
+            future.set_result(youtube_url)
+        return youtube_url
+
     def _extract_artist_name(self, track_link) -> str:
         """
         Extract artist name from a track link element.
@@ -444,8 +1866,7 @@ class WhoSampledScraper:
             if text.startswith("by "):
                 text = text[3:].strip()
             # Remove year suffix like " (2024)"
-            import re
-            text = re.sub(r'\s*\(\d{4}\)$', '', text)
+            text = _YEAR_SUFFIX_RE.sub("", text)
             if text:
                 return text
 
@@ -521,10 +1942,34 @@ class WhoSampledScraper:
                     return artist_name
 
         except Exception as e:
-            print(f"Error extracting artist from URL {url}: {e}")
+            logger.warning("Error extracting artist from URL %s: %s", url, e)
 
         return "Unknown"
 
+    def _parse_connection(self, track_link) -> Connection:
+        """
+        Parse a track link element into a Connection record.
+
+        Args:
+            track_link: BeautifulSoup track link element
+
+        Returns:
+            Connection record without YouTube link
+        """
+        track_href = track_link.get("href", "")
+        return Connection(
+            track=track_link.get_text(strip=True),
+            artist=self._extract_artist_name(track_link),
+            url=self.BASE_URL + track_href if track_href else "",
+        )
+
+    def _index_connection(self, connection: Connection):
+        """Add the track of a connection to the local index."""
+        if connection.url and connection.track:
+            self._index_track(
+                Track(title=connection.track, artist=connection.artist, url=connection.url)
+            )
+
     def _extract_connections(self, section) -> List[Dict]:
         """
         Extract track connections (samples, covers, remixes) from a section.
@@ -535,21 +1980,11 @@ class WhoSampledScraper:
         Returns:
             List of dictionaries with track information
         """
-        connections = []
-
         # Find all track links (a.trackName elements)
-        track_links = section.select("a.trackName")
-
-        for track_link in track_links:
-            track_name = track_link.get_text(strip=True)
-            track_href = track_link.get("href", "")
-            track_url = self.BASE_URL + track_href if track_href else ""
-            artist_name = self._extract_artist_name(track_link)
-
-            connection = {"track": track_name, "artist": artist_name, "url": track_url}
-            connections.append(connection)
-
-        return connections
+        return [
+            self._parse_connection(track_link).to_dict()
+            for track_link in _select_track_links(section)
+        ]
 
     async def _extract_connections_with_youtube(
         self, section, include_youtube: bool = False
@@ -564,39 +1999,35 @@ class WhoSampledScraper:
         Returns:
             List of dictionaries with track information and YouTube links
         """
+        connections = await self._parse_connections_with_youtube(
+            section, include_youtube
+        )
+        return [connection.to_dict() for connection in connections]
+
+    async def _parse_connections_with_youtube(
+        self, section, include_youtube: bool = False
+    ) -> List[Connection]:
+        """
+        Parse track connections with optional YouTube links from a section.
+
+        Args:
+            section: BeautifulSoup section element
+            include_youtube: Whether to fetch YouTube links for each track
+
+        Returns:
+            List of Connection records
+        """
         connections = []
 
         # Find all track links (a.trackName elements)
-        track_links = section.select("a.trackName")
+        track_links = _select_track_links(section)
 
         for track_link in track_links:
-            track_name = track_link.get_text(strip=True)
-            track_href = track_link.get("href", "")
-            track_url = self.BASE_URL + track_href if track_href else ""
-            artist_name = self._extract_artist_name(track_link)
-
-            connection = {
-                "track": track_name,
-                "artist": artist_name,
-                "url": track_url,
-            }
+            connection = self._parse_connection(track_link)
 
             # Fetch YouTube link if requested
-            if include_youtube and track_url:
-                try:
-                    html = await self._fetch_page(track_url)
-                    soup = BeautifulSoup(html, "lxml")
-
-                    # WhoSampled uses data-id attribute for YouTube video IDs
-                    youtube_embed = soup.select_one(
-                        "div.embed-placeholder[data-id], div.youtube-placeholder[data-id]"
-                    )
-                    if youtube_embed:
-                        video_id = youtube_embed.get("data-id", "")
-                        if video_id:
-                            connection["youtube_url"] = f"https://youtu.be/{video_id}"
-                except Exception as e:
-                    print(f"Error fetching YouTube link for {track_url}: {e}")
+            if include_youtube:
+                connection = await self._add_youtube_link(connection)
 
             connections.append(connection)
 
@@ -604,6 +2035,10 @@ class WhoSampledScraper:
 
     async def aclose(self):
         """Close the browser and playwright."""
+        self.cancel_prefetches()
+        for task in list(self._youtube_job_tasks):
+            task.cancel()
+        self.track_index.save()
         if self.browser:
             await self.browser.close()
         if self.playwright:
@@ -3,22 +3,188 @@ WhoSampled MCP Server
 An MCP server for searching WhoSampled and discovering sampling sources, covers, and remixes.
 """
 
-import argparse
 import asyncio
-import sys
-from typing import Any
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import time
+import weakref
+from typing import TYPE_CHECKING, Any, Optional
 from mcp.server import Server
 from mcp.types import Tool, TextContent, ImageContent, EmbeddedResource
-import mcp.server.stdio
 
-from .scraper import WhoSampledScraper
+from .cache import ResponseCache, bypass_caches
+from .metrics import METRICS
+from .models import CONNECTION_TYPES
+from .progress import progress_callback
+from . import loop_monitor, profiling, tracing
 
+if TYPE_CHECKING:
+    from .scraper import WhoSampledScraper
+
+
+logger = logging.getLogger(__name__)
 
 # Create server instance
 app = Server("whosampled-connector")
 
-# Create scraper instance
-scraper = WhoSampledScraper()
+# Shared scraper, created by main() or on first use (see get_scraper)
+_scraper: Optional["WhoSampledScraper"] = None
+
+
+def get_scraper() -> "WhoSampledScraper":
+    """
+    Get the scraper shared by all sessions, creating it on first use.
+
+    Creating it opens the data directory (track index and graph database),
+    so it is deferred until the server actually runs.
+    """
+    global _scraper
+    if _scraper is None:
+        from .scraper import WhoSampledScraper
+
+        _scraper = WhoSampledScraper()
+        METRICS.add_collector(_scraper.metric_samples)
+    return _scraper
+
+
+async def close_scraper():
+    """Close the shared scraper and its browser, if it was created."""
+    if _scraper is not None:
+        await _scraper.aclose()
+
+
+# Serve Prometheus metrics on this local port (e.g. WHOSAMPLED_METRICS_PORT=9464).
+# Unset: metrics are only available through the server_stats tool.
+METRICS_PORT_ENV = "WHOSAMPLED_METRICS_PORT"
+
+
+async def start_metrics_exporter():
+    """
+    Start the Prometheus exporter if WHOSAMPLED_METRICS_PORT is set.
+
+    Returns:
+        Running exporter server, or None if not configured or the port is
+        not available
+    """
+    port = os.environ.get(METRICS_PORT_ENV)
+    if not port:
+        return None
+    from .metrics import start_exporter
+
+    try:
+        exporter = await start_exporter(int(port))
+    except (OSError, ValueError) as e:
+        logger.warning("Error starting the metrics exporter on port %s: %s", port, e)
+        return None
+    logger.info("Serving Prometheus metrics on 127.0.0.1:%s", port)
+    return exporter
+
+
+def __getattr__(name: str):
+    # server.scraper is the shared scraper, created when first accessed
+    if name == "scraper":
+        return get_scraper()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Fetch the top search hit's page in the background after search_track,
+# since get_track_samples / get_track_details_by_url usually follow.
+# Set WHOSAMPLED_PREFETCH=0 to disable.
+PREFETCH_SEARCH_HITS = os.environ.get("WHOSAMPLED_PREFETCH", "1") != "0"
+
+# Seconds a formatted tool response is reused for an identical call. Tools
+# not listed here are never cached: get_deferred_youtube_links changes as
+# the background lookups finish.
+RESPONSE_CACHE_TTLS = {
+    "search_track": 900,
+    "search_tracks": 900,
+    "get_track_samples": 1800,
+    "get_track_samples_batch": 900,
+    "get_track_details_by_url": 1800,
+    "get_youtube_links": 1800,
+    "get_track_connections": 1800,
+    "trace_sample_lineage": 1800,
+}
+
+# Total size of the cached responses, in megabytes of text.
+# Set WHOSAMPLED_RESPONSE_CACHE_MB=0 to disable the response cache.
+RESPONSE_CACHE_BYTES = int(
+    float(os.environ.get("WHOSAMPLED_RESPONSE_CACHE_MB", "32")) * 1024 * 1024
+)
+response_cache = ResponseCache(RESPONSE_CACHE_BYTES)
+
+# Tool calls one client session may run at once. Over HTTP many sessions
+# share one scraper, so a single client cannot take every fetch slot.
+SESSION_CONCURRENCY = int(os.environ.get("WHOSAMPLED_SESSION_CONCURRENCY", "4"))
+_session_limits: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+# List the admin tools (profile_server, memory_snapshot). They write files
+# on the server's disk and slow it down while running, so they are off
+# unless WHOSAMPLED_ADMIN=1.
+ADMIN_TOOLS = os.environ.get("WHOSAMPLED_ADMIN", "0") == "1"
+
+
+def _response_cache_samples():
+    """Yield the response cache counters for METRICS."""
+    stats = response_cache.stats()
+    labels = {"layer": "response"}
+    yield "whosampled_cache_hits_total", "counter", labels, stats["hits"]
+    yield "whosampled_cache_misses_total", "counter", labels, stats["misses"]
+    yield "whosampled_cache_entries", "gauge", labels, stats["entries"]
+
+
+METRICS.add_collector(_response_cache_samples)
+
+# Outcome of the current tool call: _respond sets "cacheable" from the
+# result data, so errors and misses, which may be transient, are not kept
+_response_outcome: contextvars.ContextVar = contextvars.ContextVar(
+    "response_outcome", default=None
+)
+
+
+# Shared input schema of the section filters on track detail tools
+SECTIONS_SCHEMA = {
+    "type": "array",
+    "items": {"type": "string", "enum": list(CONNECTION_TYPES)},
+    "description": "Only return these connection types, e.g. [\"samples\"] for 'what did X sample?' (default: all). Skipping sections also skips their YouTube lookups.",
+}
+MAX_ITEMS_SCHEMA = {
+    "type": "integer",
+    "description": "Maximum number of tracks per connection type, across all pages (default: all)",
+    "minimum": 1,
+}
+PAGE_LIMIT_SCHEMA = {
+    "type": "integer",
+    "description": "Page size: maximum number of tracks per connection type in this response. If there are more, the response includes a cursor for the next page.",
+    "minimum": 1,
+}
+CURSOR_SCHEMA = {
+    "type": "string",
+    "description": "Cursor from a previous response to get the next page",
+}
+OUTPUT_FORMAT_SCHEMA = {
+    "type": "string",
+    "enum": ["text", "json"],
+    "description": "Response format: readable text, or compact JSON for programmatic use (default: text)",
+    "default": "text",
+}
+NO_CACHE_SCHEMA = {
+    "type": "boolean",
+    "description": "Fetch fresh data: skip the response cache and the server's cached pages and search results (default: false)",
+    "default": False,
+}
+DEBUG_TIMING_SCHEMA = {
+    "type": "boolean",
+    "description": "Append a timing waterfall of this call (search, fetches, parsing, formatting) to the response. Skips the response cache. (default: false)",
+    "default": False,
+}
+DEFER_YOUTUBE_SCHEMA = {
+    "type": "boolean",
+    "description": "With include_youtube, return the connections at once and fetch YouTube links in the background; collect them with get_deferred_youtube_links",
+    "default": False,
+}
 
 
 @app.list_tools()
@@ -32,6 +198,31 @@ async def list_tools() -> list[Tool]:
                 "type": "object",
                 "properties": {
                     "query": {"type": "string", "description": "Search query: artist name, track name, or both (use romaji for Japanese)"},
+                    "output_format": OUTPUT_FORMAT_SCHEMA,
+                    "debug_timing": DEBUG_TIMING_SCHEMA,
+                    "no_cache": NO_CACHE_SCHEMA,
+                },
+                "required": ["query"],
+            },
+        ),
+        Tool(
+            name="search_tracks",
+            description="List the top candidate tracks on WhoSampled for a query, with a relevance score. Use when a query is ambiguous (e.g. a title with many covers) to pick the right track. Use romaji for Japanese.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "Search query: artist name, track name, or both (use romaji for Japanese)"},
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of candidates to return (default: 5)",
+                        "default": 5,
+                        "minimum": 1,
+                        "maximum": 20,
+                    },
+                    "cursor": CURSOR_SCHEMA,
+                    "output_format": OUTPUT_FORMAT_SCHEMA,
+                    "debug_timing": DEBUG_TIMING_SCHEMA,
+                    "no_cache": NO_CACHE_SCHEMA,
                 },
                 "required": ["query"],
             },
@@ -48,10 +239,54 @@ async def list_tools() -> list[Tool]:
                         "description": "Whether to include YouTube links in the response",
                         "default": False,
                     },
+                    "sections": SECTIONS_SCHEMA,
+                    "max_items": MAX_ITEMS_SCHEMA,
+                    "limit": PAGE_LIMIT_SCHEMA,
+                    "cursor": CURSOR_SCHEMA,
+                    "defer_youtube": DEFER_YOUTUBE_SCHEMA,
+                    "output_format": OUTPUT_FORMAT_SCHEMA,
+                    "debug_timing": DEBUG_TIMING_SCHEMA,
+                    "no_cache": NO_CACHE_SCHEMA,
                 },
                 "required": ["query"],
             },
         ),
+        Tool(
+            name="get_track_samples_batch",
+            description="Get samples, covers, and remixes for many tracks in one call (e.g. a playlist). Each item is a search query or a WhoSampled URL; duplicates are looked up once and each item gets its own result or error. Use romaji for Japanese.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "items": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Search queries (artist and/or track name) or WhoSampled track URLs",
+                        "minItems": 1,
+                        "maxItems": 100,
+                    },
+                    "include_youtube": {
+                        "type": "boolean",
+                        "description": "Whether to include YouTube links in the response",
+                        "default": False,
+                    },
+                    "sections": SECTIONS_SCHEMA,
+                    "max_items": MAX_ITEMS_SCHEMA,
+                    "limit": PAGE_LIMIT_SCHEMA,
+                    "cursor": CURSOR_SCHEMA,
+                    "deadline": {
+                        "type": "number",
+                        "description": "Seconds to wait for the whole batch; unfinished items are reported as timed out (default: 120)",
+                        "default": 120,
+                        "minimum": 1,
+                        "maximum": 600,
+                    },
+                    "output_format": OUTPUT_FORMAT_SCHEMA,
+                    "debug_timing": DEBUG_TIMING_SCHEMA,
+                    "no_cache": NO_CACHE_SCHEMA,
+                },
+                "required": ["items"],
+            },
+        ),
         Tool(
             name="get_track_details_by_url",
             description="Get samples, covers, and remixes from a WhoSampled URL directly. Use when you already have the track's URL.",
@@ -64,6 +299,14 @@ async def list_tools() -> list[Tool]:
                         "description": "Whether to include YouTube links in the response",
                         "default": False,
                     },
+                    "sections": SECTIONS_SCHEMA,
+                    "max_items": MAX_ITEMS_SCHEMA,
+                    "limit": PAGE_LIMIT_SCHEMA,
+                    "cursor": CURSOR_SCHEMA,
+                    "defer_youtube": DEFER_YOUTUBE_SCHEMA,
+                    "output_format": OUTPUT_FORMAT_SCHEMA,
+                    "debug_timing": DEBUG_TIMING_SCHEMA,
+                    "no_cache": NO_CACHE_SCHEMA,
                 },
                 "required": ["url"],
             },
@@ -82,16 +325,337 @@ async def list_tools() -> list[Tool]:
                         "minimum": 1,
                         "maximum": 10,
                     },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Page size per section; same as max_per_section",
+                        "minimum": 1,
+                        "maximum": 10,
+                    },
+                    "cursor": CURSOR_SCHEMA,
+                    "output_format": OUTPUT_FORMAT_SCHEMA,
+                    "debug_timing": DEBUG_TIMING_SCHEMA,
+                    "no_cache": NO_CACHE_SCHEMA,
                 },
                 "required": ["query"],
             },
         ),
+        Tool(
+            name="get_deferred_youtube_links",
+            description="Collect the YouTube links of a get_track_samples or get_track_details_by_url call made with defer_youtube. Returns the links found so far; call again while some are pending.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "cursor": {"type": "string", "description": "Cursor returned by the earlier call"},
+                    "wait": {
+                        "type": "number",
+                        "description": "Seconds to wait for pending links before answering (default: 20)",
+                        "default": 20,
+                        "minimum": 0,
+                        "maximum": 60,
+                    },
+                    "output_format": OUTPUT_FORMAT_SCHEMA,
+                    "debug_timing": DEBUG_TIMING_SCHEMA,
+                },
+                "required": ["cursor"],
+            },
+        ),
+        Tool(
+            name="get_track_connections",
+            description="Get the full list of one connection type for a track (e.g. every song that sampled it), beyond the preview shown by get_track_details_by_url. Paginate with limit and offset.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "url": {"type": "string", "description": "WhoSampled track URL"},
+                    "connection_type": {
+                        "type": "string",
+                        "enum": list(CONNECTION_TYPES),
+                        "description": "Connection type to list",
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of connections to return (default: 50)",
+                        "default": 50,
+                        "minimum": 1,
+                        "maximum": 500,
+                    },
+                    "offset": {
+                        "type": "integer",
+                        "description": "Number of connections to skip (default: 0)",
+                        "default": 0,
+                        "minimum": 0,
+                    },
+                    "cursor": CURSOR_SCHEMA,
+                    "output_format": OUTPUT_FORMAT_SCHEMA,
+                    "debug_timing": DEBUG_TIMING_SCHEMA,
+                    "no_cache": NO_CACHE_SCHEMA,
+                },
+                "required": ["url", "connection_type"],
+            },
+        ),
+        Tool(
+            name="trace_sample_lineage",
+            description="Trace a track's sample chain several levels deep (what it sampled, what those sampled, ...) in one call. Give a WhoSampled URL or a search query. Use for: 'trace the sample chain of X three levels deep'.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "url": {"type": "string", "description": "WhoSampled track URL to start from"},
+                    "query": {"type": "string", "description": "Search query for the starting track, if no URL is given (use romaji for Japanese)"},
+                    "depth": {
+                        "type": "integer",
+                        "description": "Number of levels to follow (default: 3)",
+                        "default": 3,
+                        "minimum": 1,
+                        "maximum": 5,
+                    },
+                    "max_nodes": {
+                        "type": "integer",
+                        "description": "Maximum number of tracks to visit (default: 50)",
+                        "default": 50,
+                        "minimum": 1,
+                        "maximum": 200,
+                    },
+                    "connection_types": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": list(CONNECTION_TYPES)},
+                        "description": "Connections to follow (default: [\"samples\"]; e.g. [\"sampled_by\"] to trace who sampled it)",
+                        "default": ["samples"],
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Page size: maximum number of tracks after the starting one in this response (default: all)",
+                        "minimum": 1,
+                    },
+                    "cursor": CURSOR_SCHEMA,
+                    "output_format": OUTPUT_FORMAT_SCHEMA,
+                    "debug_timing": DEBUG_TIMING_SCHEMA,
+                    "no_cache": NO_CACHE_SCHEMA,
+                },
+            },
+        ),
+        Tool(
+            name="server_stats",
+            description="Show the server's own metrics: tool, fetch, parse and format latency percentiles, cache hit rates per layer, fetch queue depth and blocked or challenged fetches. For operators diagnosing slow calls.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "output_format": OUTPUT_FORMAT_SCHEMA,
+                },
+            },
+        ),
+    ] + (_admin_tools() if ADMIN_TOOLS else [])
+
+
+def _admin_tools() -> list[Tool]:
+    """Tools listed when ADMIN_TOOLS is on."""
+    return [
+        Tool(
+            name="profile_server",
+            description="Profile the running server (cProfile) for some seconds while other calls run, save the profile to disk and show the functions taking the most time. For operators diagnosing slow calls.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "seconds": {
+                        "type": "number",
+                        "description": "How long to profile (default: 10)",
+                        "default": 10,
+                        "minimum": 1,
+                        "maximum": 300,
+                    },
+                    "output_format": OUTPUT_FORMAT_SCHEMA,
+                },
+            },
+        ),
+        Tool(
+            name="memory_snapshot",
+            description="Take a memory snapshot (tracemalloc), save it to disk and show the largest allocation sites and what grew since the previous snapshot. The first call starts memory tracing; call again later to find growth.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "top": {
+                        "type": "integer",
+                        "description": "Number of allocation sites to show (default: 15)",
+                        "default": 15,
+                        "minimum": 1,
+                        "maximum": 100,
+                    },
+                    "output_format": OUTPUT_FORMAT_SCHEMA,
+                },
+            },
+        ),
     ]
 
 
 @app.call_tool()
 async def call_tool(name: str, arguments: Any) -> list[TextContent]:
-    """Handle tool calls."""
+    """
+    Handle tool calls, sending progress notifications if the client asked.
+
+    Responses are cached by tool name and normalized arguments, so a
+    repeated call returns without touching the scraper. Pass no_cache to
+    fetch fresh data, bypassing the scraper's caches too (see
+    cache.bypass_caches); the fresh response replaces the cached one.
+
+    The call runs in a trace (see tracing) when traces are exported or
+    debug_timing asks for a waterfall in the response.
+    """
+    started = time.perf_counter()
+    arguments = arguments or {}
+    if not _tool_defaults:
+        await _load_tool_defaults()
+    tool = name if name in _tool_defaults else "unknown"
+    debug_timing = bool(arguments.get("debug_timing"))
+    # A waterfall describes one run, never serve or keep it from the cache
+    key = None if debug_timing else _response_cache_key(name, arguments)
+    if key is not None and not arguments.get("no_cache"):
+        cached = response_cache.get(key)
+        if cached is not None:
+            METRICS.observe(
+                "whosampled_tool_seconds",
+                time.perf_counter() - started,
+                tool=tool,
+                cache="hit",
+            )
+            return list(cached)
+
+    trace = None
+    outcome = {"cacheable": False}
+    token = _response_outcome.set(outcome)
+    try:
+        with bypass_caches() if arguments.get("no_cache") else contextlib.nullcontext():
+            if debug_timing or tracing.enabled():
+                with tracing.start_trace("call_tool", tool=tool) as trace:
+                    result = await _run_tool(name, arguments)
+            else:
+                result = await _run_tool(name, arguments)
+    finally:
+        _response_outcome.reset(token)
+        METRICS.observe(
+            "whosampled_tool_seconds",
+            time.perf_counter() - started,
+            tool=tool,
+            cache="miss",
+        )
+
+    if debug_timing:
+        return result + [TextContent(type="text", text=tracing.waterfall(trace))]
+    if key is not None and outcome["cacheable"]:
+        size = sum(len(content.text) for content in result)
+        response_cache.put(key, tuple(result), size, RESPONSE_CACHE_TTLS[name])
+    return result
+
+
+async def _run_tool(name: str, arguments: dict) -> list[TextContent]:
+    """Run a tool within the session's concurrency limit, reporting progress."""
+    async with _session_limit():
+        with progress_callback(_progress_sender()):
+            return await _call_tool(name, arguments)
+
+
+def _response_cache_key(name: str, arguments: dict):
+    """
+    Build the response cache key of a tool call.
+
+    Arguments left at their default are dropped and whitespace in strings
+    is collapsed, so equivalent calls share one entry.
+
+    Returns:
+        Hashable key, or None if the call must not be cached
+    """
+    if name not in RESPONSE_CACHE_TTLS or not response_cache.max_bytes:
+        return None
+    if arguments.get("defer_youtube") and arguments.get("include_youtube"):
+        # The response points at a background job of its own
+        return None
+    defaults = _tool_defaults.get(name, {})
+    normalized = {}
+    for key, value in arguments.items():
+        if key in ("no_cache", "debug_timing") or defaults.get(key, object()) == value:
+            continue
+        if isinstance(value, str):
+            value = " ".join(value.split())
+        normalized[key] = value
+    try:
+        return name, json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    except (TypeError, ValueError):
+        return None
+
+
+def _cacheable_data(data: Any) -> bool:
+    """Check that tool result data is a success worth reusing."""
+    if not isinstance(data, dict):
+        return True
+    if "error" in data or data.get("found") is False:
+        return False
+    # A batch is only reused if every item succeeded
+    results = data.get("results")
+    return not isinstance(results, list) or all(
+        item.get("status") == "ok" for item in results
+    )
+
+
+# Tool name -> {argument: default value}, filled from the input schemas
+_tool_defaults: dict = {}
+
+
+async def _load_tool_defaults():
+    """Read the default argument values of each tool from its input schema."""
+    for tool in await list_tools():
+        properties = tool.inputSchema.get("properties", {})
+        _tool_defaults[tool.name] = {
+            key: schema["default"]
+            for key, schema in properties.items()
+            if "default" in schema
+        }
+
+
+def _session_limit():
+    """
+    Get the semaphore limiting the tool calls of the current session.
+
+    Returns:
+        Async context manager; a no-op outside a request
+    """
+    try:
+        session = app.request_context.session
+    except LookupError:
+        return contextlib.nullcontext()
+    limit = _session_limits.get(session)
+    if limit is None:
+        limit = _session_limits[session] = asyncio.Semaphore(SESSION_CONCURRENCY)
+    return limit
+
+
+def _progress_sender():
+    """
+    Get a callback that sends MCP progress notifications for the current request.
+
+    Returns:
+        Progress callback, or None outside a request or if the request has
+        no progress token
+    """
+    try:
+        ctx = app.request_context
+    except LookupError:
+        return None
+    token = ctx.meta.progressToken if ctx.meta else None
+    if token is None:
+        return None
+
+    async def send(progress, total, message):
+        try:
+            await ctx.session.send_progress_notification(
+                token, progress, total, message=message
+            )
+        except Exception as e:
+            # Progress is best effort, never fail the tool call over it
+            logger.warning("Error sending progress notification: %s", e)
+
+    return send
+
+
+async def _call_tool(name: str, arguments: Any) -> list[TextContent]:
+    """Run a tool."""
+    scraper = get_scraper()
 
     if name == "search_track":
         query = arguments.get("query", "")
@@ -99,27 +663,44 @@ async def call_tool(name: str, arguments: Any) -> list[TextContent]:
         if not query:
             return [TextContent(type="text", text="Error: Query is required")]
 
-        result = await scraper.search_track(query)
+        result = await scraper.search_track(query, prefetch=PREFETCH_SEARCH_HITS)
 
         if result is None:
-            return [
-                TextContent(type="text", text=f"No results found for '{query}'")
-            ]
+            return _not_found(arguments, query)
 
-        response = f"""Track found on WhoSampled:
+        return _respond(arguments, result, _format_search_result)
 
-Title: {result["title"]}
-Artist: {result["artist"]}
-URL: {result["url"]}
+    elif name == "search_tracks":
+        query = arguments.get("query", "")
+        limit = arguments.get("limit", 5)
 
-Use get_track_samples or get_track_details_by_url to get detailed information about samples, covers, and remixes.
-"""
+        if not query:
+            return [TextContent(type="text", text="Error: Query is required")]
+
+        try:
+            offset = _cursor_offset(arguments.get("cursor"))
+        except ValueError:
+            return _invalid_cursor(arguments)
 
-        return [TextContent(type="text", text=response)]
+        # One more than the page tells whether there is a next page
+        candidates = await scraper.search_tracks(query, offset + limit + 1)
+        page = candidates[offset : offset + limit]
+
+        if not page:
+            return _not_found(arguments, query)
+
+        result = {"query": query, "candidates": page}
+        if len(candidates) > offset + limit:
+            result["next_cursor"] = str(offset + limit)
+
+        return _respond(arguments, result, _format_search_candidates)
 
     elif name == "get_track_samples":
         query = arguments.get("query", "")
         include_youtube = arguments.get("include_youtube", False)
+        sections = arguments.get("sections")
+        max_items = arguments.get("max_items")
+        defer_youtube = include_youtube and arguments.get("defer_youtube", False)
 
         if not query:
             return [
@@ -128,35 +709,123 @@ Use get_track_samples or get_track_details_by_url to get detailed information ab
                 )
             ]
 
-        # First search for the track
-        search_result = await scraper.search_track(query)
+        try:
+            offset = _cursor_offset(arguments.get("cursor"))
+        except ValueError:
+            return _invalid_cursor(arguments)
+
+        # Search for the track and get detailed information
+        details = await scraper.find_track_details(
+            query,
+            include_youtube and not defer_youtube,
+            sections,
+            max_items,
+            offset=offset,
+            limit=arguments.get("limit"),
+        )
 
-        if search_result is None:
-            return [
-                TextContent(
-                    type="text", text=f"No results found for '{query}'"
-                )
-            ]
+        if details is None:
+            return _not_found(arguments, query)
+
+        _set_next_cursor(details)
+        if defer_youtube:
+            _defer_youtube_links(details)
+
+        return _respond(arguments, details, _format_track_details)
+
+    elif name == "get_track_samples_batch":
+        items = arguments.get("items") or []
+        include_youtube = arguments.get("include_youtube", False)
+        sections = arguments.get("sections")
+        max_items = arguments.get("max_items")
+        deadline = arguments.get("deadline", 120)
+
+        if not items:
+            return [TextContent(type="text", text="Error: Items are required")]
+
+        try:
+            offset = _cursor_offset(arguments.get("cursor"))
+        except ValueError:
+            return _invalid_cursor(arguments)
+
+        results = await scraper.find_track_details_batch(
+            items,
+            include_youtube,
+            sections,
+            max_items,
+            deadline,
+            offset=offset,
+            limit=arguments.get("limit"),
+        )
 
-        # Get detailed information
-        details = await scraper.get_track_details(search_result["url"], include_youtube)
+        # Items share one cursor; items without more connections get an
+        # empty page for it
+        next_cursors = [
+            _set_next_cursor(result["details"])
+            for result in results
+            if result["status"] == "ok"
+        ]
+        next_cursors = [cursor for cursor in next_cursors if cursor]
+        result = {"results": results}
+        if next_cursors:
+            result["next_cursor"] = max(next_cursors, key=int)
 
-        return [TextContent(type="text", text=_format_track_details(details))]
+        return _respond(arguments, result, _format_batch_results)
 
     elif name == "get_track_details_by_url":
         url = arguments.get("url", "")
         include_youtube = arguments.get("include_youtube", False)
+        sections = arguments.get("sections")
+        max_items = arguments.get("max_items")
+        defer_youtube = include_youtube and arguments.get("defer_youtube", False)
 
         if not url:
             return [TextContent(type="text", text="Error: URL is required")]
 
-        details = await scraper.get_track_details(url, include_youtube)
+        try:
+            offset = _cursor_offset(arguments.get("cursor"))
+        except ValueError:
+            return _invalid_cursor(arguments)
+
+        details = await scraper.get_track_details(
+            url,
+            include_youtube and not defer_youtube,
+            sections,
+            max_items,
+            offset=offset,
+            limit=arguments.get("limit"),
+        )
+
+        _set_next_cursor(details)
+        if defer_youtube:
+            _defer_youtube_links(details)
+
+        return _respond(arguments, details, _format_track_details)
+
+    elif name == "get_deferred_youtube_links":
+        cursor = arguments.get("cursor", "")
+        wait = arguments.get("wait", 20)
+
+        if not cursor:
+            return [TextContent(type="text", text="Error: Cursor is required")]
+
+        result = await scraper.youtube_lookup_results(cursor, wait)
+
+        if result is None:
+            return [
+                TextContent(
+                    type="text", text=f"Error: Unknown or expired cursor '{cursor}'"
+                )
+            ]
 
-        return [TextContent(type="text", text=_format_track_details(details))]
+        return _respond(
+            arguments, {"cursor": cursor, **result}, _format_deferred_youtube_links
+        )
 
     elif name == "get_youtube_links":
         query = arguments.get("query", "")
-        max_per_section = arguments.get("max_per_section", 3)
+        # limit is the newer name of max_per_section
+        max_per_section = arguments.get("limit") or arguments.get("max_per_section", 3)
 
         if not query:
             return [
@@ -165,16 +834,433 @@ Use get_track_samples or get_track_details_by_url to get detailed information ab
                 )
             ]
 
+        try:
+            offset = _cursor_offset(arguments.get("cursor"))
+        except ValueError:
+            return _invalid_cursor(arguments)
+
         result = await scraper.get_youtube_links_from_search(
-            query, max_per_section
+            query, max_per_section, offset
         )
+        if result.pop("has_more", False):
+            result["next_cursor"] = str(offset + max_per_section)
+
+        return _respond(arguments, result, _format_youtube_links)
+
+    elif name == "get_track_connections":
+        url = arguments.get("url", "")
+        connection_type = arguments.get("connection_type", "")
+        limit = arguments.get("limit", 50)
 
-        return [TextContent(type="text", text=_format_youtube_links(result))]
+        if not url or not connection_type:
+            return [
+                TextContent(
+                    type="text", text="Error: URL and connection_type are required"
+                )
+            ]
+
+        try:
+            offset = (
+                _cursor_offset(arguments["cursor"])
+                if arguments.get("cursor")
+                else arguments.get("offset", 0)
+            )
+        except ValueError:
+            return _invalid_cursor(arguments)
+
+        result = await scraper.get_track_connections(url, connection_type, limit, offset)
+        if result.get("has_more"):
+            result["next_cursor"] = str(offset + len(result["connections"]))
+
+        return _respond(arguments, result, _format_connections)
+
+    elif name == "trace_sample_lineage":
+        url = arguments.get("url", "")
+        query = arguments.get("query", "")
+        depth = arguments.get("depth", 3)
+        max_nodes = arguments.get("max_nodes", 50)
+        connection_types = arguments.get("connection_types") or ["samples"]
+
+        if not url and not query:
+            return [TextContent(type="text", text="Error: URL or query is required")]
+
+        try:
+            offset = _cursor_offset(arguments.get("cursor"))
+        except ValueError:
+            return _invalid_cursor(arguments)
+
+        if not url:
+            track = await scraper.search_track(query)
+            if track is None:
+                return _not_found(arguments, query)
+            url = track["url"]
+
+        try:
+            result = await scraper.trace_sample_lineage(
+                url, depth, max_nodes, tuple(connection_types)
+            )
+        except ValueError as e:
+            return [TextContent(type="text", text=f"Error: {e}")]
+
+        result = _paginate_lineage(result, offset, arguments.get("limit"))
+        return _respond(arguments, result, _format_lineage)
+
+    elif name == "server_stats":
+        stats = {
+            "metrics": METRICS.snapshot(),
+            "prefetch": scraper.prefetch_stats(),
+            "response_cache": response_cache.stats(),
+        }
+        return _respond(arguments, stats, _format_server_stats)
+
+    elif name == "profile_server" and ADMIN_TOOLS:
+        seconds = min(max(float(arguments.get("seconds", 10)), 1), 300)
+        try:
+            result = await profiling.profile(seconds)
+        except RuntimeError as e:
+            return [TextContent(type="text", text=f"Error: {e}")]
+        return _respond(arguments, result, _format_profile)
+
+    elif name == "memory_snapshot" and ADMIN_TOOLS:
+        top = min(max(int(arguments.get("top", 15)), 1), 100)
+        result = profiling.memory_snapshot(top)
+        return _respond(arguments, result, _format_memory_snapshot)
 
     else:
         return [TextContent(type="text", text=f"Unknown tool: {name}")]
 
 
+def _respond(arguments: dict, data: Any, formatter) -> list[TextContent]:
+    """
+    Render a tool result in the requested output format.
+
+    Args:
+        arguments: Tool arguments ("output_format" is "text" or "json")
+        data: Result data, serializable as JSON
+        formatter: Function turning the data into readable text
+
+    Returns:
+        Tool response content
+    """
+    outcome = _response_outcome.get()
+    if outcome is not None:
+        outcome["cacheable"] = _cacheable_data(data)
+    if arguments.get("output_format") == "json":
+        with METRICS.timer("whosampled_format_seconds", format="json"), tracing.span(
+            "format", format="json"
+        ):
+            text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    else:
+        with METRICS.timer("whosampled_format_seconds", format="text"), tracing.span(
+            "format", format="text"
+        ):
+            text = formatter(data)
+    return [TextContent(type="text", text=text)]
+
+
+def _not_found(arguments: dict, query: str) -> list[TextContent]:
+    """Respond that a query matched no track."""
+    return _respond(
+        arguments,
+        {"query": query, "found": False},
+        lambda _: f"No results found for '{query}'",
+    )
+
+
+def _invalid_cursor(arguments: dict) -> list[TextContent]:
+    """Respond that the given pagination cursor is not valid."""
+    return [
+        TextContent(
+            type="text", text=f"Error: Invalid cursor '{arguments.get('cursor')}'"
+        )
+    ]
+
+
+def _cursor_offset(cursor: Any) -> int:
+    """
+    Decode a pagination cursor into an offset.
+
+    Raises:
+        ValueError: If the cursor was not produced by this server
+    """
+    if not cursor:
+        return 0
+    offset = int(cursor)
+    if offset < 0:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return offset
+
+
+def _set_next_cursor(details: dict):
+    """
+    Turn the next_offset of paged track details into a cursor.
+
+    Returns:
+        The cursor, or None if this was the last page
+    """
+    next_offset = details.pop("next_offset", None)
+    if next_offset is None:
+        return None
+    details["next_cursor"] = str(next_offset)
+    return details["next_cursor"]
+
+
+def _paginate_lineage(result: dict, offset: int, limit) -> dict:
+    """
+    Cut a lineage crawl to a page of tracks.
+
+    Every page keeps the starting track first, followed by a window of the
+    other tracks in BFS order and the connections leading to them.
+    """
+    if not offset and limit is None:
+        return result
+
+    root, others = result["nodes"][0], result["nodes"][1:]
+    end = None if limit is None else offset + limit
+    page = others[offset:end]
+    targets = {node["url"] for node in page}
+    result = {
+        **result,
+        "nodes": [root, *page],
+        "edges": [edge for edge in result["edges"] if edge["target"] in targets],
+    }
+    if end is not None and len(others) > end:
+        result["next_cursor"] = str(end)
+    return result
+
+
+def _defer_youtube_links(details: dict):
+    """Start background YouTube lookups for track details and add their cursor."""
+    if "error" in details:
+        return
+
+    urls = [details["url"]]
+    for connection_type in CONNECTION_TYPES:
+        urls.extend(c["url"] for c in details.get(connection_type, []))
+    details["youtube_cursor"] = get_scraper().start_youtube_lookups(urls)
+
+
+# Connection type -> section heading in text output
+_TRACK_DETAIL_SECTIONS = (
+    ("samples", "=== SAMPLES (Tracks sampled by this song) ==="),
+    ("sampled_by", "=== SAMPLED BY (Tracks that sampled this song) ==="),
+    ("covers", "=== COVERS (Cover versions by this artist) ==="),
+    ("covered_by", "=== COVERED BY (Artists who covered this song) ==="),
+    ("remixes", "=== REMIXES (Remixes by this artist) ==="),
+    ("remixed_by", "=== REMIXED BY (Artists who remixed this song) ==="),
+)
+
+# Search results section -> section heading in text output
+_YOUTUBE_LINK_SECTIONS = (
+    ("top_hit", "=== TOP HIT ==="),
+    ("connections", "=== CONNECTIONS ==="),
+    ("tracks", "=== TRACKS ==="),
+)
+
+
+def _append_tracks(
+    lines: list,
+    heading: str,
+    tracks: list,
+    url_label: str = "",
+    missing_youtube: str = None,
+):
+    """
+    Append a section of tracks to text output.
+
+    Args:
+        lines: Output lines to append to
+        heading: Section heading
+        tracks: Track dictionaries with track, artist, url and youtube_url
+        url_label: Text shown before each WhoSampled URL
+        missing_youtube: Shown when a track has no YouTube link (None to
+            leave the line out)
+    """
+    lines.append(heading)
+    for track in tracks:
+        lines.append(f"  • {track['track']} by {track['artist']}")
+        lines.append(f"    {url_label}{track['url']}")
+        youtube_url = track.get("youtube_url") or missing_youtube
+        if youtube_url:
+            lines.append(f"    YouTube: {youtube_url}")
+    lines.append("")
+
+
+def _format_search_result(result: dict) -> str:
+    """Format a single search hit into a readable string."""
+
+    return f"""Track found on WhoSampled:
+
+Title: {result["title"]}
+Artist: {result["artist"]}
+URL: {result["url"]}
+
+Use get_track_samples or get_track_details_by_url to get detailed information about samples, covers, and remixes.
+"""
+
+
+def _format_search_candidates(result: dict) -> str:
+    """Format search candidates into a readable string."""
+
+    lines = [f"Tracks found on WhoSampled for '{result['query']}':", ""]
+
+    for i, candidate in enumerate(result["candidates"], 1):
+        lines.append(f"{i}. {candidate['title']} by {candidate['artist']}")
+        lines.append(f"   URL: {candidate['url']}")
+        lines.append(
+            f"   Section: {candidate['section']}, relevance: {candidate['score']:.2f}"
+        )
+    lines.append("")
+    lines.append(
+        "Use get_track_details_by_url with the URL of the right track to get samples, covers, and remixes."
+    )
+    if "next_cursor" in result:
+        lines.append(
+            f"More candidates available: call again with cursor \"{result['next_cursor']}\"."
+        )
+
+    return "\n".join(lines)
+
+
+def _format_batch_results(batch: dict) -> str:
+    """Format per-item batch results into a readable string."""
+
+    results = batch["results"]
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    summary = ", ".join(f"{count} {status}" for status, count in counts.items())
+    lines = [f"Batch results for {len(results)} items: {summary}", ""]
+
+    for i, result in enumerate(results, 1):
+        lines.append(f"##### {i}. {result['item']}")
+        if result["status"] == "ok":
+            lines.append(_format_track_details(result["details"]))
+        elif result["status"] == "not_found":
+            lines.append(f"No results found for '{result['item']}'")
+        else:
+            lines.append(f"Error ({result['status']}): {result['error']}")
+        lines.append("")
+
+    if "next_cursor" in batch:
+        lines.append(
+            f"More connections available: call again with cursor \"{batch['next_cursor']}\"."
+        )
+
+    return "\n".join(lines)
+
+
+def _format_deferred_youtube_links(result: dict) -> str:
+    """Format the YouTube links found so far by a deferred lookup."""
+
+    links = result["links"]
+    found = sum(1 for youtube_url in links.values() if youtube_url)
+    lines = [f"YouTube links: {found} found, {result['pending']} pending", ""]
+
+    for url, youtube_url in links.items():
+        lines.append(f"  • {url}")
+        lines.append(f"    YouTube: {youtube_url or 'Not found'}")
+
+    if not result["done"]:
+        lines.append("")
+        lines.append(
+            f"Some links are still being fetched. Call get_deferred_youtube_links "
+            f"with cursor \"{result['cursor']}\" again to get the rest."
+        )
+
+    return "\n".join(lines)
+
+
+def _format_connections(result: dict) -> str:
+    """Format a window of a full connection list into a readable string."""
+
+    if "error" in result:
+        return f"Error retrieving connections: {result['error']}"
+
+    connections = result["connections"]
+    lines = [f"URL: {result['url']}", ""]
+
+    if not connections:
+        lines.append(f"No {result['type']} connections found for this track.")
+        return "\n".join(lines)
+
+    first = result["offset"] + 1
+    _append_tracks(
+        lines,
+        f"=== {result['type'].upper()} ({first}-{first + len(connections) - 1}) ===",
+        connections,
+    )
+
+    if result["has_more"]:
+        lines.append(
+            f"More available: call again with cursor \"{result['next_cursor']}\" "
+            f"(offset={first - 1 + len(connections)})."
+        )
+
+    return "\n".join(lines).rstrip("\n")
+
+
+def _format_lineage(result: dict) -> str:
+    """Format a lineage crawl into an indented tree."""
+
+    nodes = result["nodes"]
+    root = nodes[0]
+    children = {}
+    for node in nodes[1:]:
+        children.setdefault(node["parent"], []).append(node)
+
+    lines = [
+        f"Lineage of: {root['title'] or root['url']} by {root['artist']}",
+        f"URL: {root['url']}",
+        f"Tracks: {len(nodes)}, connections: {len(result['edges'])}",
+        "",
+    ]
+
+    def add_children(url, indent):
+        for child in children.get(url, []):
+            lines.append(
+                f"{indent}• [{child['type']}] {child['title']} by {child['artist']}"
+            )
+            lines.append(f"{indent}  {child['url']}")
+            add_children(child["url"], indent + "    ")
+
+    add_children(root["url"], "  ")
+
+    # On later pages, tracks whose parent is on an earlier page are shown
+    # at their depth
+    on_page = {node["url"] for node in nodes}
+    for parent, orphans in children.items():
+        if parent not in on_page:
+            for orphan in orphans:
+                indent = "  " + "    " * (orphan["depth"] - 1)
+                lines.append(
+                    f"{indent}• [{orphan['type']}] {orphan['title']} by {orphan['artist']} (via {parent})"
+                )
+                lines.append(f"{indent}  {orphan['url']}")
+                add_children(orphan["url"], indent + "    ")
+
+    if len(nodes) == 1:
+        lines.append("No connections found for this track.")
+
+    if result["truncated"]:
+        lines.append("")
+        lines.append("(Stopped at the track limit; raise max_nodes to see more.)")
+
+    if "next_cursor" in result:
+        lines.append("")
+        lines.append(
+            f"More tracks available: call again with cursor \"{result['next_cursor']}\"."
+        )
+
+    if result["errors"]:
+        lines.append("")
+        lines.append("=== ERRORS ===")
+        for error in result["errors"]:
+            lines.append(f"  • {error['url']}: {error['error']}")
+
+    return "\n".join(lines)
+
+
 def _format_youtube_links(result: dict) -> str:
     """Format YouTube links result into a readable string."""
 
@@ -185,49 +1271,27 @@ def _format_youtube_links(result: dict) -> str:
     lines.append(f"Search query: {result.get('query', 'N/A')}")
     lines.append("")
 
-    # Top Hit section (highest priority)
-    if result.get("top_hit"):
-        lines.append("=== TOP HIT ===")
-        for track in result["top_hit"]:
-            lines.append(f"  • {track['track']} by {track['artist']}")
-            lines.append(f"    WhoSampled: {track['url']}")
-            if track.get("youtube_url"):
-                lines.append(f"    YouTube: {track['youtube_url']}")
-            else:
-                lines.append("    YouTube: Not found")
-        lines.append("")
-
-    # Connections section
-    if result.get("connections"):
-        lines.append("=== CONNECTIONS ===")
-        for track in result["connections"]:
-            lines.append(f"  • {track['track']} by {track['artist']}")
-            lines.append(f"    WhoSampled: {track['url']}")
-            if track.get("youtube_url"):
-                lines.append(f"    YouTube: {track['youtube_url']}")
-            else:
-                lines.append("    YouTube: Not found")
-        lines.append("")
-
-    # Tracks section
-    if result.get("tracks"):
-        lines.append("=== TRACKS ===")
-        for track in result["tracks"]:
-            lines.append(f"  • {track['track']} by {track['artist']}")
-            lines.append(f"    WhoSampled: {track['url']}")
-            if track.get("youtube_url"):
-                lines.append(f"    YouTube: {track['youtube_url']}")
-            else:
-                lines.append("    YouTube: Not found")
-        lines.append("")
+    # Sections in priority order: Top Hit > Connections > Tracks
+    has_content = False
+    for section, heading in _YOUTUBE_LINK_SECTIONS:
+        if result.get(section):
+            _append_tracks(
+                lines,
+                heading,
+                result[section],
+                url_label="WhoSampled: ",
+                missing_youtube="Not found",
+            )
+            has_content = True
 
-    # Check if we have any content
-    has_content = (
-        result.get("top_hit") or result.get("connections") or result.get("tracks")
-    )
     if not has_content:
         lines.append("No tracks found with YouTube links.")
 
+    if "next_cursor" in result:
+        lines.append(
+            f"More tracks available: call again with cursor \"{result['next_cursor']}\"."
+        )
+
     return "\n".join(lines)
 
 
@@ -253,170 +1317,133 @@ def _format_track_details(details: dict) -> str:
         lines.append(f"YouTube: {details['youtube_url']}")
         lines.append("")
 
-    # Samples (tracks this song sampled)
-    if details.get("samples"):
-        lines.append("=== SAMPLES (Tracks sampled by this song) ===")
-        for sample in details["samples"]:
-            lines.append(f"  • {sample['track']} by {sample['artist']}")
-            lines.append(f"    {sample['url']}")
-            if sample.get("youtube_url"):
-                lines.append(f"    YouTube: {sample['youtube_url']}")
-        lines.append("")
+    has_content = False
+    for connection_type, heading in _TRACK_DETAIL_SECTIONS:
+        if details.get(connection_type):
+            _append_tracks(lines, heading, details[connection_type])
+            has_content = True
 
-    # Sampled by (tracks that sampled this song)
-    if details.get("sampled_by"):
-        lines.append("=== SAMPLED BY (Tracks that sampled this song) ===")
-        for track in details["sampled_by"]:
-            lines.append(f"  • {track['track']} by {track['artist']}")
-            lines.append(f"    {track['url']}")
-            if track.get("youtube_url"):
-                lines.append(f"    YouTube: {track['youtube_url']}")
-        lines.append("")
+    if not has_content:
+        lines.append("No samples, covers, or remixes found for this track.")
 
-    # Covers
-    if details.get("covers"):
-        lines.append("=== COVERS (Cover versions by this artist) ===")
-        for cover in details["covers"]:
-            lines.append(f"  • {cover['track']} by {cover['artist']}")
-            lines.append(f"    {cover['url']}")
-            if cover.get("youtube_url"):
-                lines.append(f"    YouTube: {cover['youtube_url']}")
-        lines.append("")
+    if "next_cursor" in details:
+        lines.append(
+            f"More connections available: call again with cursor \"{details['next_cursor']}\"."
+        )
 
-    # Covered by
-    if details.get("covered_by"):
-        lines.append("=== COVERED BY (Artists who covered this song) ===")
-        for cover in details["covered_by"]:
-            lines.append(f"  • {cover['track']} by {cover['artist']}")
-            lines.append(f"    {cover['url']}")
-            if cover.get("youtube_url"):
-                lines.append(f"    YouTube: {cover['youtube_url']}")
+    if "youtube_cursor" in details:
         lines.append("")
+        lines.append(
+            "YouTube links are being fetched in the background. "
+            f"Call get_deferred_youtube_links with cursor \"{details['youtube_cursor']}\" to get them."
+        )
 
-    # Remixes
-    if details.get("remixes"):
-        lines.append("=== REMIXES (Remixes by this artist) ===")
-        for remix in details["remixes"]:
-            lines.append(f"  • {remix['track']} by {remix['artist']}")
-            lines.append(f"    {remix['url']}")
-            if remix.get("youtube_url"):
-                lines.append(f"    YouTube: {remix['youtube_url']}")
-        lines.append("")
+    return "\n".join(lines)
 
-    # Remixed by
-    if details.get("remixed_by"):
-        lines.append("=== REMIXED BY (Artists who remixed this song) ===")
-        for remix in details["remixed_by"]:
-            lines.append(f"  • {remix['track']} by {remix['artist']}")
-            lines.append(f"    {remix['url']}")
-            if remix.get("youtube_url"):
-                lines.append(f"    YouTube: {remix['youtube_url']}")
-        lines.append("")
 
-    # Check if we have any content beyond URL and title
-    has_content = (
-        details.get("samples")
-        or details.get("sampled_by")
-        or details.get("covers")
-        or details.get("covered_by")
-        or details.get("remixes")
-        or details.get("remixed_by")
-    )
+def _format_labels(labels: dict) -> str:
+    """Format metric labels as {key=value, ...} (empty without labels)."""
+    if not labels:
+        return ""
+    return "{" + ", ".join(f"{k}={v}" for k, v in sorted(labels.items())) + "}"
+
+
+def _format_seconds(seconds) -> str:
+    """Format a latency in milliseconds (or "-" if unknown)."""
+    return "-" if seconds is None else f"{seconds * 1000:.1f}ms"
 
-    if not has_content:
-        lines.append("No samples, covers, or remixes found for this track.")
 
+def _format_server_stats(stats: dict) -> str:
+    """Format server_stats output."""
+    metrics = stats["metrics"]
+    lines = ["=== LATENCY (count, p50 / p95 / p99) ==="]
+    for name, series in metrics["histograms"].items():
+        for item in series:
+            lines.append(
+                f"{name}{_format_labels(item['labels'])}: {item['count']}, "
+                f"{_format_seconds(item['p50'])} / {_format_seconds(item['p95'])} / "
+                f"{_format_seconds(item['p99'])}"
+            )
+
+    for section, title in (("counters", "COUNTERS"), ("gauges", "GAUGES")):
+        lines.append("")
+        lines.append(f"=== {title} ===")
+        for name, series in metrics[section].items():
+            for item in series:
+                value = item["value"]
+                if isinstance(value, float) and not value.is_integer():
+                    value = f"{value:.2f}"
+                else:
+                    value = int(value)
+                lines.append(f"{name}{_format_labels(item['labels'])}: {value}")
+
+    prefetch = stats["prefetch"]
+    hit_ratio = prefetch["hit_ratio"]
+    lines.append("")
+    lines.append(
+        f"Prefetch hit ratio: {'-' if hit_ratio is None else f'{hit_ratio:.0%}'}"
+    )
+    cache = stats["response_cache"]
+    lines.append(
+        f"Response cache: {cache['entries']} entries, {cache['bytes']} bytes"
+    )
     return "\n".join(lines)
 
 
-async def main():
-    """Main entry point for the server."""
-    async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
-        await app.run(read_stream, write_stream, app.create_initialization_options())
-
-
-def cli():
-    """CLI entry point for uvx and pip installations."""
-    parser = argparse.ArgumentParser(
-        prog="whosampled-connector",
-        description=(
-            "WhoSampled MCP Server - Search WhoSampled and discover sampling sources, covers, and remixes\n"
-            "\n"
-            "WhoSampledで検索して結果を返すMCPサーバー\n"
-            "アーティスト名、曲名などの文字列を受け取ってWhoSampled?で検索を実行し、\n"
-            "その曲のサンプリングソースやカバー音源などを発見するためのMCPサーバーです。\n"
-        ),
-        epilog=(
-            "USAGE:\n"
-            "  This is an MCP (Model Context Protocol) server that communicates via stdin/stdout.\n"
-            "  It should be configured in your MCP client (e.g., Claude Desktop, Cursor).\n"
-            "\n"
-            "  使い方:\n"
-            "  これはstdin/stdoutで通信するMCP (Model Context Protocol) サーバーです。\n"
-            "  MCPクライアント（Claude Desktop、Cursorなど）で設定して使用してください。\n"
-            "\n"
-            "AVAILABLE TOOLS:\n"
-            "  search_track              - Find a track on WhoSampled by query\n"
-            "                              クエリでWhoSampledから曲を検索\n"
-            "\n"
-            "  get_track_samples         - Discover what a song sampled, who sampled it,\n"
-            "                              covers, and remixes\n"
-            "                              サンプリング元、カバー、リミックス情報を取得\n"
-            "\n"
-            "  get_track_details_by_url  - Get details from a WhoSampled URL directly\n"
-            "                              WhoSampled URLから直接詳細を取得\n"
-            "\n"
-            "  get_youtube_links         - Get YouTube links from search results\n"
-            "                              検索結果からYouTubeリンクを取得\n"
-            "\n"
-            "EXAMPLES:\n"
-            "  # Run the server (it will listen on stdin/stdout)\n"
-            "  whosampled-connector\n"
-            "\n"
-            "  # Display this help message\n"
-            "  whosampled-connector --help\n"
-            "\n"
-            "  # Configuration in Claude Desktop (claude_desktop_config.json):\n"
-            "  {\n"
-            '    "mcpServers": {\n'
-            '      "whosampled": {\n'
-            '        "command": "uvx",\n'
-            '        "args": ["--from", "git+https://github.com/dj-oyu/whosampled-connector-mcp",\n'
-            '                 "whosampled-connector"]\n'
-            "      }\n"
-            "    }\n"
-            "  }\n"
-            "\n"
-            "TESTING:\n"
-            "  This project has unit tests (fast, mocked) and integration tests (slow, real).\n"
-            "  テストにはユニットテスト（高速・モック）と統合テスト（低速・実環境）があります。\n"
-            "\n"
-            "  # Run unit tests only (recommended, ~0.1s, 20 tests)\n"
-            "  uv run pytest -v -m \"not integration\"\n"
-            "  pytest -v -m \"not integration\"\n"
-            "\n"
-            "  # Run all tests including integration tests (~30-60s, 28 tests)\n"
-            "  # Note: Requires Playwright browser: uv run playwright install chromium\n"
-            "  uv run pytest -v\n"
-            "  pytest -v\n"
-            "\n"
-            "  # Run integration tests only\n"
-            "  uv run pytest -v -m \"integration\"\n"
-            "\n"
-            "  # Run with coverage report\n"
-            "  uv run pytest --cov=whosampled_connector --cov-report=html -m \"not integration\"\n"
-            "\n"
-            "DOCUMENTATION:\n"
-            "  https://github.com/dj-oyu/whosampled-connector-mcp\n"
-        ),
-        formatter_class=argparse.RawDescriptionHelpFormatter,
+def _format_profile(result: dict) -> str:
+    """Format profile_server output."""
+    return "\n".join(
+        [
+            f"Profiled {result['seconds']:g}s, saved to {result['path']}",
+            f"(inspect with: python -m pstats {result['path']})",
+            "",
+            result["summary"],
+        ]
     )
 
-    args = parser.parse_args()
 
-    # Start the MCP server
-    asyncio.run(main())
+def _format_memory_snapshot(result: dict) -> str:
+    """Format memory_snapshot output."""
+    traced = result["traced"]
+    lines = [
+        f"Snapshot saved to {result['path']}",
+        f"Traced memory: {traced['current']} bytes (peak {traced['peak']})",
+    ]
+    if result["started"]:
+        lines.append(
+            "Memory tracing started now; call again later to see what grew."
+        )
+    lines.append("")
+    lines.append("=== LARGEST ALLOCATION SITES ===")
+    for item in result["top"]:
+        lines.append(f"{item['size']:>12} bytes {item['count']:>8} blocks  {item['site']}")
+    if not result["started"]:
+        lines.append("")
+        lines.append("=== GROWTH SINCE PREVIOUS SNAPSHOT ===")
+        for item in result["growth"]:
+            lines.append(
+                f"{item['size_diff']:>+12} bytes {item['count_diff']:>+8} blocks  {item['site']}"
+            )
+        if not result["growth"]:
+            lines.append("(none)")
+    return "\n".join(lines)
 
 
-if __name__ == "__main__":
-    cli()
+async def main():
+    """Main entry point for the server (stdio transport)."""
+    import mcp.server.stdio
+
+    get_scraper()
+    exporter = await start_metrics_exporter()
+    profiling.install_signal_handlers(asyncio.get_running_loop())
+    monitor = loop_monitor.start_monitor()
+    try:
+        async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
+            await app.run(
+                read_stream, write_stream, app.create_initialization_options()
+            )
+    finally:
+        if monitor is not None:
+            monitor.stop()
+        if exporter is not None:
+            exporter.close()
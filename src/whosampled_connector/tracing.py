@@ -0,0 +1,337 @@
+"""
+Lightweight per-request tracing spans, exported in the OTLP JSON format.
+
+A tool call opens a trace with start_trace(); code running under it,
+including tasks it starts, adds child spans with span() or @traced. With
+no trace open, span() does nothing, so instrumented code costs next to
+nothing unless tracing is on.
+
+Finished traces are exported when configured:
+
+- WHOSAMPLED_TRACE_FILE: append one OTLP JSON export request per line
+  (readable by the OpenTelemetry Collector's otlpjsonfile receiver)
+- WHOSAMPLED_OTLP_ENDPOINT: POST them to an OTLP/HTTP collector, e.g.
+  http://127.0.0.1:4318/v1/traces
+"""
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TRACE_FILE_ENV = "WHOSAMPLED_TRACE_FILE"
+OTLP_ENDPOINT_ENV = "WHOSAMPLED_OTLP_ENDPOINT"
+
+SERVICE_NAME = "whosampled-connector"
+
+# Spans kept per trace; the rest are counted in the root's attributes
+MAX_SPANS = 1000
+
+# OTLP span kinds and status codes
+_KIND_INTERNAL = 1
+_KIND_SERVER = 2
+_STATUS_ERROR = 2
+
+
+class Span:
+    """One timed operation in a trace."""
+
+    __slots__ = (
+        "trace",
+        "name",
+        "span_id",
+        "parent_id",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "error",
+    )
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        """Duration in milliseconds (up to now if still open)."""
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+
+class Trace:
+    """Spans of one tool call."""
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self.finished = False
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+    def _add(self, name: str, parent: Optional[Span], attributes: Dict) -> Optional[Span]:
+        if len(self.spans) >= MAX_SPANS:
+            self.dropped += 1
+            return None
+        span = Span(self, name, parent.span_id if parent else None, attributes)
+        self.spans.append(span)
+        return span
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "whosampled_span", default=None
+)
+
+
+@contextmanager
+def _activate(span: Span) -> Iterator[Span]:
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        span.end_ns = time.time_ns()
+        _current_span.reset(token)
+
+
+@contextmanager
+def start_trace(name: str, **attributes) -> Iterator[Trace]:
+    """
+    Open a trace whose root span covers the block.
+
+    The trace is exported when the block ends; spans that end after that
+    (background work started under it) are not included.
+    """
+    trace = Trace()
+    root = trace._add(name, None, attributes)
+    try:
+        with _activate(root):
+            yield trace
+    finally:
+        trace.finished = True
+        if trace.dropped:
+            root.attributes["spans.dropped"] = trace.dropped
+        export(trace)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """Time the block as a child of the current span, if a trace is open."""
+    parent = _current_span.get()
+    if parent is None or parent.trace.finished:
+        yield None
+        return
+    child = parent.trace._add(name, parent, attributes)
+    if child is None:
+        yield None
+        return
+    with _activate(child):
+        yield child
+
+
+def traced(name: str, attributes: Tuple[str, ...] = ()):
+    """
+    Decorator running each call of a function or coroutine in a span.
+
+    Args:
+        name: Span name
+        attributes: Names of arguments recorded as span attributes
+    """
+
+    def decorator(function):
+        signature = inspect.signature(function)
+
+        def call_attributes(args, kwargs) -> Dict:
+            if not attributes:
+                return {}
+            bound = signature.bind_partial(*args, **kwargs).arguments
+            return {key: bound[key] for key in attributes if bound.get(key) is not None}
+
+        if asyncio.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                if _current_span.get() is None:
+                    return await function(*args, **kwargs)
+                with span(name, **call_attributes(args, kwargs)):
+                    return await function(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return function(*args, **kwargs)
+            with span(name, **call_attributes(args, kwargs)):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _attribute_value(value) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(trace: Trace) -> Dict:
+    """
+    Convert a trace to an OTLP JSON export request.
+
+    Returns:
+        Dictionary in the ExportTraceServiceRequest JSON shape
+    """
+    spans = []
+    for item in trace.spans:
+        otlp_span = {
+            "traceId": trace.trace_id,
+            "spanId": item.span_id,
+            "name": item.name,
+            "kind": _KIND_SERVER if item.parent_id is None else _KIND_INTERNAL,
+            "startTimeUnixNano": str(item.start_ns),
+            "endTimeUnixNano": str(item.end_ns or item.start_ns),
+            "attributes": [
+                {"key": key, "value": _attribute_value(value)}
+                for key, value in item.attributes.items()
+            ],
+        }
+        if item.parent_id is not None:
+            otlp_span["parentSpanId"] = item.parent_id
+        if item.error is not None:
+            otlp_span["status"] = {"code": _STATUS_ERROR, "message": item.error}
+        spans.append(otlp_span)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": SERVICE_NAME}}
+                    ]
+                },
+                "scopeSpans": [
+                    {"scope": {"name": "whosampled_connector"}, "spans": spans}
+                ],
+            }
+        ]
+    }
+
+
+def waterfall(trace: Trace, width: int = 30) -> str:
+    """
+    Render a trace as a text timing waterfall.
+
+    Each line shows a span indented under its parent, its start offset
+    from the root, a bar placed on the root's time line and its duration.
+    """
+    root = trace.root
+    total_ns = max((root.end_ns or time.time_ns()) - root.start_ns, 1)
+    children: Dict[Optional[str], List[Span]] = {}
+    for item in trace.spans[1:]:
+        children.setdefault(item.parent_id, []).append(item)
+
+    lines = [f"=== TIMING (trace {trace.trace_id}) ==="]
+
+    def visit(item: Span, depth: int):
+        offset_ns = item.start_ns - root.start_ns
+        end_ns = (item.end_ns or time.time_ns()) - root.start_ns
+        start = min(int(offset_ns * width / total_ns), width - 1)
+        end = max(min(int(end_ns * width / total_ns), width), start + 1)
+        bar = " " * start + "#" * (end - start) + " " * (width - end)
+        label = "  " * depth + item.name
+        detail = item.attributes.get("url") or item.attributes.get("tool") or ""
+        if detail:
+            label += f" {detail}"
+        if len(label) > 60:
+            label = label[:57] + "..."
+        error = " !" if item.error else ""
+        lines.append(
+            f"{label:<60} {offset_ns / 1e6:>9.1f}ms |{bar}| {item.duration_ms:.1f}ms{error}"
+        )
+        for child in sorted(children.get(item.span_id, []), key=lambda s: s.start_ns):
+            visit(child, depth + 1)
+
+    visit(root, 0)
+    if trace.dropped:
+        lines.append(f"({trace.dropped} more spans not recorded)")
+    return "\n".join(lines)
+
+
+def enabled() -> bool:
+    """Check whether finished traces are exported anywhere."""
+    return bool(os.environ.get(TRACE_FILE_ENV) or os.environ.get(OTLP_ENDPOINT_ENV))
+
+
+_file_lock = threading.Lock()
+
+
+def _write_file(path: str, line: str):
+    with _file_lock, open(path, "a", encoding="utf-8") as trace_file:
+        trace_file.write(line + "\n")
+
+
+def _post(endpoint: str, body: bytes):
+    import urllib.request
+
+    request = urllib.request.Request(
+        endpoint,
+        data=body,
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        response.read()
+
+
+def _run_export(function, *args):
+    try:
+        function(*args)
+    except Exception as e:
+        logger.warning("Error exporting trace: %s", e)
+
+
+def export(trace: Trace):
+    """Write a finished trace to the configured file and collector, off the event loop."""
+    path = os.environ.get(TRACE_FILE_ENV)
+    endpoint = os.environ.get(OTLP_ENDPOINT_ENV)
+    if not path and not endpoint:
+        return
+    body = json.dumps(to_otlp(trace), separators=(",", ":"))
+    jobs = []
+    if path:
+        jobs.append((_write_file, path, body))
+    if endpoint:
+        jobs.append((_post, endpoint, body.encode()))
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    for job in jobs:
+        if loop is not None:
+            loop.run_in_executor(None, _run_export, *job)
+        else:
+            _run_export(*job)
@@ -0,0 +1,136 @@
+"""Tests for in-process caches."""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from whosampled_connector.cache import InFlight, ResponseCache, TTLCache
+
+
+def test_ttl_cache_get_put():
+    """Test storing values and counting hits and misses."""
+    cache = TTLCache(max_entries=10, ttl=60)
+
+    assert cache.get("a") is None
+    cache.put("a", 1)
+
+    assert cache.get("a") == 1
+    assert "a" in cache
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    """Test that the least recently used entry is evicted when full."""
+    cache = TTLCache(max_entries=2, ttl=60)
+
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_expires_entries():
+    """Test that entries expire after the TTL."""
+    cache = TTLCache(max_entries=10, ttl=60)
+
+    with patch("whosampled_connector.cache.time.monotonic", return_value=1000.0):
+        cache.put("a", 1)
+    with patch("whosampled_connector.cache.time.monotonic", return_value=1061.0):
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+
+def test_ttl_cache_reports_evictions():
+    """Test that entries dropped by size or expiry are passed to on_evict."""
+    evicted = []
+    cache = TTLCache(max_entries=1, ttl=60, on_evict=lambda k, v: evicted.append((k, v)))
+
+    with patch("whosampled_connector.cache.time.monotonic", return_value=1000.0):
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.pop("b")
+        cache.put("c", 3)
+    with patch("whosampled_connector.cache.time.monotonic", return_value=1061.0):
+        cache.get("c")
+
+    assert evicted == [("a", 1), ("c", 3)]
+
+
+def test_response_cache_evicts_by_size():
+    """Test that the least recently used responses go once over the size budget."""
+    cache = ResponseCache(max_bytes=10)
+    cache.put("a", "aaaa", 4, ttl=60)
+    cache.put("b", "bbbb", 4, ttl=60)
+    cache.get("a")
+    cache.put("c", "cccc", 4, ttl=60)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa"
+    assert cache.size == 8
+
+    # Too big to ever fit
+    cache.put("d", "d" * 11, 11, ttl=60)
+    assert cache.get("d") is None
+    assert len(cache) == 2
+
+
+def test_response_cache_ttl_per_entry():
+    """Test that each entry expires after its own TTL."""
+    cache = ResponseCache(max_bytes=100)
+    with patch("whosampled_connector.cache.time.monotonic", return_value=0):
+        cache.put("short", 1, 1, ttl=10)
+        cache.put("long", 2, 1, ttl=100)
+    with patch("whosampled_connector.cache.time.monotonic", return_value=50):
+        assert cache.get("short") is None
+        assert cache.get("long") == 2
+    assert cache.size == 1
+
+
+@pytest.mark.asyncio
+async def test_in_flight_shares_one_task():
+    """Test that concurrent callers with the same key share one run."""
+    in_flight = InFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "done"
+
+    results = await asyncio.gather(*(in_flight.run("key", work) for _ in range(3)))
+
+    assert results == ["done"] * 3
+    assert len(calls) == 1
+    assert len(in_flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_in_flight_cancels_when_all_callers_cancel():
+    """Test that the shared task survives one cancellation but not all."""
+    in_flight = InFlight()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def work():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    first = asyncio.create_task(in_flight.run("key", work))
+    second = asyncio.create_task(in_flight.run("key", work))
+    await started.wait()
+
+    first.cancel()
+    await asyncio.sleep(0)
+    assert not cancelled.is_set()
+
+    second.cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
@@ -0,0 +1,61 @@
+"""Tests for the command line entry point and its startup cost."""
+
+import os
+import subprocess
+import sys
+
+# Cumulative import time allowed for the CLI module, in microseconds.
+# It needs about 20 ms; the margin is for slow CI machines.
+IMPORT_BUDGET_US = 150_000
+
+# Modules the CLI must not load before a transport is chosen
+HEAVY_MODULES = ("mcp", "playwright", "bs4", "lxml", "sqlite3")
+
+
+def _imported_modules(stderr: str) -> dict:
+    """Parse -X importtime output into {module: cumulative microseconds}."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def _run(*args, env=None):
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        capture_output=True,
+        text=True,
+        timeout=60,
+        env={**os.environ, **(env or {})},
+    )
+
+
+def test_cli_import_budget():
+    """Test that importing the CLI stays within budget and skips heavy modules."""
+    result = _run("-c", "import whosampled_connector.cli")
+    assert result.returncode == 0, result.stderr
+
+    modules = _imported_modules(result.stderr)
+    assert modules["whosampled_connector.cli"] < IMPORT_BUDGET_US
+    loaded = {name.split(".")[0] for name in modules}
+    assert not loaded & set(HEAVY_MODULES)
+
+
+def test_help_does_not_open_data_dir(tmp_path):
+    """Test that --help neither loads the server nor touches the data directory."""
+    result = _run(
+        "-m",
+        "whosampled_connector",
+        "--help",
+        env={"WHOSAMPLED_DATA_DIR": str(tmp_path)},
+    )
+
+    assert result.returncode == 0
+    assert "--transport" in result.stdout
+    loaded = {name.split(".")[0] for name in _imported_modules(result.stderr)}
+    assert not loaded & set(HEAVY_MODULES)
+    assert "whosampled_connector.server" not in _imported_modules(result.stderr)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,182 @@
+"""Tests for the shared daemon and the stdio forwarder."""
+
+import asyncio
+import json
+import os
+import queue
+import signal
+import tempfile
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from whosampled_connector import daemon
+from whosampled_connector.server import response_cache, scraper
+
+
+def _request(request_id, method, params=None):
+    """Encode one JSON-RPC line."""
+    message = {"jsonrpc": "2.0", "method": method, "params": params or {}}
+    if request_id is not None:
+        message["id"] = request_id
+    return (json.dumps(message) + "\n").encode()
+
+
+SESSION_INPUT = b"".join(
+    [
+        _request(
+            1,
+            "initialize",
+            {
+                "protocolVersion": "2025-06-18",
+                "capabilities": {},
+                "clientInfo": {"name": "test", "version": "1"},
+            },
+        ),
+        _request(None, "notifications/initialized"),
+        _request(2, "tools/call", {"name": "search_track", "arguments": {"query": "x"}}),
+    ]
+)
+
+
+class _Client:
+    """stdin/stdout of an MCP client that hangs up after its responses."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.lines = queue.Queue()
+        for line in SESSION_INPUT.splitlines(keepends=True):
+            self.lines.put(line)
+        self.received = b""
+
+    def readline(self):
+        return self.lines.get()
+
+    def write(self, data):
+        self.received += data
+        if self.received.count(b"\n") >= self.responses:
+            self.lines.put(b"")
+
+    def flush(self):
+        pass
+
+    def messages(self):
+        return [json.loads(line) for line in self.received.splitlines()]
+
+
+@pytest.fixture
+def socket_path():
+    """Socket path in a fresh directory (short enough for AF_UNIX)."""
+    with tempfile.TemporaryDirectory(dir="/tmp") as directory:
+        yield os.path.join(directory, "d.sock")
+
+
+@pytest.mark.asyncio
+async def test_forwarded_sessions_share_daemon(socket_path):
+    """Test that forwarded stdio sessions are served by the daemon's scraper."""
+    response_cache.clear()
+    with patch.object(scraper, "search_track", new_callable=AsyncMock) as mock_search, patch.object(
+        scraper, "aclose", new_callable=AsyncMock
+    ):
+        mock_search.return_value = {
+            "title": "Found",
+            "artist": "Artist",
+            "url": "https://www.whosampled.com/Artist/Found/",
+        }
+        server = asyncio.create_task(daemon.serve(socket_path))
+        while not os.path.exists(socket_path):
+            await asyncio.sleep(0.01)
+
+        def run_client():
+            client = _Client(responses=2)
+            sock = daemon.connect(socket_path, autostart=False)
+            daemon.forward(sock, client, client)
+            return client.messages()
+
+        loop = asyncio.get_running_loop()
+        outputs = await asyncio.gather(
+            loop.run_in_executor(None, run_client),
+            loop.run_in_executor(None, run_client),
+        )
+        server.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server
+
+    for messages in outputs:
+        assert [m["id"] for m in messages] == [1, 2]
+        assert "Found" in messages[1]["result"]["content"][0]["text"]
+    assert not os.path.exists(socket_path)
+    response_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_second_daemon_exits(socket_path):
+    """Test that only one daemon serves a socket."""
+    with patch.object(daemon, "_take_lock", return_value=None):
+        await asyncio.wait_for(daemon.serve(socket_path), timeout=5)
+    assert not os.path.exists(socket_path)
+
+
+def test_connect_starts_daemon(socket_path):
+    """Test that attaching starts a daemon when none is running."""
+    sock = daemon.connect(socket_path)
+    try:
+        with open(socket_path + ".lock") as lock_file:
+            pid = int(lock_file.read())
+    finally:
+        sock.close()
+    os.kill(pid, signal.SIGTERM)
+
+    # The daemon removes its socket when stopped
+    with pytest.raises(FileNotFoundError):
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            daemon.connect(socket_path, autostart=False).close()
+            time.sleep(0.1)
+
+
+def test_default_socket_in_private_directory(tmp_path, monkeypatch):
+    """Test that without XDG_RUNTIME_DIR the socket goes to a private directory."""
+    monkeypatch.delenv(daemon.SOCKET_ENV, raising=False)
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+
+    path = daemon.default_socket_path()
+
+    directory = os.path.dirname(path)
+    assert os.path.dirname(directory) == str(tmp_path)
+    assert os.stat(directory).st_mode & 0o777 == 0o700
+
+    os.chmod(directory, 0o755)
+    with pytest.raises(PermissionError):
+        daemon.default_socket_path()
+
+
+def test_lock_does_not_follow_symlinks(socket_path):
+    """Test that a symlink planted as the lock file is not truncated."""
+    target = socket_path + ".victim"
+    with open(target, "w") as victim:
+        victim.write("keep")
+    os.symlink(target, socket_path + ".lock")
+
+    with pytest.raises(OSError):
+        daemon._take_lock(socket_path)
+
+    with open(target) as victim:
+        assert victim.read() == "keep"
+
+
+def test_connect_refuses_socket_of_other_user(socket_path, monkeypatch):
+    """Test that connect() rejects a socket served by another user."""
+    import socket
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen()
+    monkeypatch.setattr(daemon.os, "getuid", lambda: os.geteuid() + 1)
+    try:
+        with pytest.raises(PermissionError):
+            daemon.connect(socket_path, autostart=False)
+    finally:
+        listener.close()
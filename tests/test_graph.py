@@ -0,0 +1,112 @@
+"""Tests for the connection graph store."""
+
+from whosampled_connector.graph import GraphStore
+from whosampled_connector.models import Connection, TrackDetails
+
+DAFT_PUNK_URL = "https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/"
+KANYE = Connection(
+    track="Stronger", artist="Kanye West", url="https://www.whosampled.com/Kanye-West/Stronger/"
+)
+EDWIN = Connection(
+    track="Cola Bottle Baby",
+    artist="Edwin Birdsong",
+    url="https://www.whosampled.com/Edwin-Birdsong/Cola-Bottle-Baby/",
+)
+
+
+def test_record_page_and_rebuild():
+    """Test writing a page and rebuilding it with its connections."""
+    graph = GraphStore()
+    details = TrackDetails(
+        url=DAFT_PUNK_URL,
+        title="Harder, Better, Faster, Stronger",
+        samples=(EDWIN,),
+        sampled_by=(KANYE,),
+    )
+    graph.record_page(details, artist="Daft Punk", youtube_id="gAjR4_CbPpQ")
+
+    rebuilt, youtube_id = graph.track_details(DAFT_PUNK_URL)
+    assert rebuilt == details
+    assert youtube_id == "gAjR4_CbPpQ"
+    assert graph.stats() == {"tracks": 3, "crawled": 1, "artists": 3, "edges": 2}
+
+    # Connections only seen on other pages are not crawled pages
+    assert graph.track_details(KANYE.url) is None
+    assert graph.track_details(DAFT_PUNK_URL, max_age=-1) is None
+
+
+def test_edges_shared_between_pages():
+    """Test that both pages of a sample write the same edge."""
+    graph = GraphStore()
+    graph.record_page(TrackDetails(url=DAFT_PUNK_URL, sampled_by=(KANYE,)))
+    daft_punk = Connection(
+        track="Harder, Better, Faster, Stronger", artist="Daft Punk", url=DAFT_PUNK_URL
+    )
+    graph.record_page(TrackDetails(url=KANYE.url, samples=(daft_punk,)), artist="Kanye")
+
+    assert graph.stats()["edges"] == 1
+    assert graph.connections(KANYE.url, "samples") == [daft_punk]
+    # The page artist guessed from the URL does not replace a known one
+    assert graph.connections(DAFT_PUNK_URL, "sampled_by") == [KANYE]
+
+
+def test_persistence(tmp_path):
+    """Test that a file-backed graph survives reopening."""
+    path = str(tmp_path / "graph.db")
+    graph = GraphStore(path)
+    graph.record_page(TrackDetails(url=DAFT_PUNK_URL, title="HBFS", sampled_by=(KANYE,)))
+    graph.close()
+
+    reopened = GraphStore(path)
+    rebuilt, youtube_id = reopened.track_details(DAFT_PUNK_URL)
+    assert rebuilt.sampled_by == (KANYE,)
+    assert youtube_id is None
+    reopened.close()
+
+
+def test_recrawl_replaces_page_edges():
+    """Test that a page is rebuilt only from what it showed when last crawled."""
+    graph = GraphStore()
+    a = Connection(track="A", artist="X", url="https://www.whosampled.com/X/A/")
+    b = Connection(track="B", artist="X", url="https://www.whosampled.com/X/B/")
+    c = Connection(track="C", artist="X", url="https://www.whosampled.com/X/C/")
+    daft_punk = Connection(
+        track="Harder, Better, Faster, Stronger", artist="Daft Punk", url=DAFT_PUNK_URL
+    )
+
+    graph.record_page(TrackDetails(url=DAFT_PUNK_URL, sampled_by=(a, b)))
+    # C's own page says it sampled the track; Daft Punk's page does not list it
+    graph.record_page(TrackDetails(url=c.url, title="C", samples=(daft_punk,)), artist="X")
+    graph.record_page(TrackDetails(url=DAFT_PUNK_URL, sampled_by=(a,)))
+
+    rebuilt, _ = graph.track_details(DAFT_PUNK_URL)
+    assert rebuilt.sampled_by == (a,)
+    # Everything known about the track still includes C, after the page's own
+    assert graph.connections(DAFT_PUNK_URL, "sampled_by") == [a, c]
+
+    # A partial parse only replaces the parsed connection types
+    graph.record_page(
+        TrackDetails(url=DAFT_PUNK_URL, samples=(EDWIN,), sections=("samples",)),
+        complete=False,
+    )
+    rebuilt, _ = graph.track_details(DAFT_PUNK_URL)
+    assert rebuilt.samples == (EDWIN,)
+    assert rebuilt.sampled_by == (a,)
+
+
+def test_urls_share_one_track_node():
+    """Test that URLs differing only in a trailing slash are one track."""
+    graph = GraphStore()
+    graph.record_page(
+        TrackDetails(url=DAFT_PUNK_URL.rstrip("/"), title="HBFS", sampled_by=(KANYE,))
+    )
+    daft_punk = Connection(track="HBFS", artist="Daft Punk", url=DAFT_PUNK_URL)
+    graph.record_page(TrackDetails(url=KANYE.url, samples=(daft_punk,)))
+
+    assert graph.stats()["tracks"] == 2
+    assert graph.stats()["edges"] == 1
+    rebuilt, _ = graph.track_details(DAFT_PUNK_URL)
+    assert rebuilt.title == "HBFS"
+    assert rebuilt.sampled_by == (KANYE,)
+    # Connections use the site's form of the URL
+    assert graph.connections(KANYE.url, "samples") == [daft_punk]
@@ -0,0 +1,89 @@
+"""Tests for the streamable HTTP transport."""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from mcp import ClientSession
+from mcp.client.streamable_http import streamable_http_client
+
+from whosampled_connector import server
+from whosampled_connector.http_server import MCP_PATH, create_server
+from whosampled_connector.server import response_cache, scraper
+
+
+@pytest.fixture
+async def http_url():
+    """Serve MCP over HTTP on a free loopback port."""
+    http = create_server("127.0.0.1", 0, close_scraper=False)
+    task = asyncio.create_task(http.serve())
+    while not http.started:
+        await asyncio.sleep(0.01)
+    port = http.servers[0].sockets[0].getsockname()[1]
+    response_cache.clear()
+
+    yield f"http://127.0.0.1:{port}{MCP_PATH}"
+
+    http.should_exit = True
+    await task
+    response_cache.clear()
+
+
+async def _search(url, query):
+    """Open a session, list the tools and run search_track."""
+    async with streamable_http_client(url) as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            tools = await session.list_tools()
+            result = await session.call_tool("search_track", {"query": query})
+            return len(tools.tools), result.content[0].text
+
+
+@pytest.mark.asyncio
+async def test_sessions_share_one_scraper(http_url):
+    """Test that concurrent HTTP sessions are served by the shared scraper."""
+    with patch.object(scraper, "search_track", new_callable=AsyncMock) as mock_search:
+        mock_search.side_effect = lambda query, prefetch: {
+            "title": query.upper(),
+            "artist": "Artist",
+            "url": f"https://www.whosampled.com/Artist/{query}/",
+        }
+
+        results = await asyncio.gather(
+            _search(http_url, "one"), _search(http_url, "two")
+        )
+
+    assert [tool_count for tool_count, _ in results] == [10, 10]
+    assert "ONE" in results[0][1]
+    assert "TWO" in results[1][1]
+    assert mock_search.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_session_concurrency_limit(http_url):
+    """Test that one session runs at most SESSION_CONCURRENCY tool calls at once."""
+    running = 0
+    peak = 0
+
+    async def search(query, prefetch):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+        return {"title": query, "artist": "Artist", "url": f"https://x/{query}/"}
+
+    with patch.object(server, "SESSION_CONCURRENCY", 2), patch.object(
+        scraper, "search_track", side_effect=search
+    ):
+        async with streamable_http_client(http_url) as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                await asyncio.gather(
+                    *(
+                        session.call_tool("search_track", {"query": f"q{i}"})
+                        for i in range(5)
+                    )
+                )
+
+    assert peak == 2
@@ -0,0 +1,99 @@
+"""Tests for the local track index."""
+
+from whosampled_connector.index import TrackIndex
+from whosampled_connector.models import Track
+
+DAFT_PUNK = Track(
+    title="Harder, Better, Faster, Stronger",
+    artist="Daft Punk",
+    url="https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/",
+)
+KANYE = Track(
+    title="Stronger", artist="Kanye West", url="https://www.whosampled.com/Kanye-West/Stronger/"
+)
+
+
+def test_index_search_and_lookup():
+    """Test fuzzy matching and the confidence threshold of lookups."""
+    index = TrackIndex()
+    assert index.add(DAFT_PUNK)
+    assert index.add(KANYE)
+    assert not index.add(KANYE)
+    assert len(index) == 2
+
+    results = index.search("stronger kanye west")
+    assert results[0] == (1.0, KANYE)
+    assert results[1][1] == DAFT_PUNK
+
+    assert index.lookup("Daft Punk - Harder Better Faster Stronger") == DAFT_PUNK
+    assert index.lookup("kanye stronger") is None
+    assert index.lookup("stronger") is None
+    assert index.lookup("") is None
+
+
+def test_index_update_replaces_postings():
+    """Test that re-adding a URL with a new title updates its postings."""
+    index = TrackIndex()
+    index.add(Track(title="Untitled", artist="Kanye West", url=KANYE.url))
+    index.add(KANYE)
+
+    assert len(index) == 1
+    assert index.lookup("kanye west stronger") == KANYE
+    assert index.search("untitled") == []
+
+
+def test_index_persistence(tmp_path):
+    """Test saving the index to disk and loading it back."""
+    path = tmp_path / "data" / "tracks.json"
+    index = TrackIndex(str(path))
+    index.add(DAFT_PUNK)
+    index.save()
+
+    loaded = TrackIndex(str(path))
+    assert len(loaded) == 1
+    assert loaded.lookup("daft punk harder better faster stronger") == DAFT_PUNK
+
+
+def test_index_ignores_corrupt_file(tmp_path, caplog):
+    """Test that a corrupt or partial index file leaves an empty index."""
+    path = tmp_path / "tracks.json"
+    path.write_text('{"version": 1, "tracks": [["https://x/", "T"')
+
+    index = TrackIndex(str(path))
+
+    assert len(index) == 0
+    assert "Ignoring unreadable track index" in caplog.text
+    index.add(DAFT_PUNK)
+    index.save()
+    assert len(TrackIndex(str(path))) == 1
+
+
+def test_index_evicts_oldest_tracks():
+    """Test that the index stays within MAX_TRACKS."""
+    index = TrackIndex()
+    index.MAX_TRACKS = 2
+    index.add(DAFT_PUNK)
+    index.add(KANYE)
+    # Updating a track makes it the most recent one
+    index.add(Track(title="Harder Better Faster Stronger", artist="Daft Punk",
+                    url=DAFT_PUNK.url))
+    index.add(Track(title="One More Time", artist="Daft Punk",
+                    url="https://www.whosampled.com/Daft-Punk/One-More-Time/"))
+
+    assert len(index) == 2
+    assert KANYE not in [track for _, track in index.search("kanye west stronger")]
+    assert index.lookup("daft punk harder better faster stronger").url == DAFT_PUNK.url
+
+
+async def test_index_maybe_save_writes_in_background(tmp_path):
+    """Test that periodic saves inside the event loop run in a worker thread."""
+    path = tmp_path / "tracks.json"
+    index = TrackIndex(str(path))
+    index.SAVE_INTERVAL = 0
+    index.add(DAFT_PUNK)
+
+    index.maybe_save()
+    assert index._saving is not None
+    await index._saving
+
+    assert len(TrackIndex(str(path))) == 1
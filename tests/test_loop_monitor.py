@@ -0,0 +1,77 @@
+"""Tests for the event loop lag monitor."""
+
+import asyncio
+import logging
+import time
+
+import pytest
+
+from whosampled_connector import loop_monitor
+from whosampled_connector.loop_monitor import LoopMonitor
+from whosampled_connector.metrics import METRICS
+
+
+def _parse_synchronously():
+    time.sleep(0.3)
+
+
+async def _handler():
+    _parse_synchronously()
+
+
+def _lag_count() -> int:
+    histogram = METRICS.histogram("whosampled_loop_lag_seconds")
+    return histogram.count if histogram else 0
+
+
+@pytest.mark.asyncio
+async def test_blocking_call_is_logged_with_its_stack(caplog):
+    """Test that a stall logs the blocking function and is counted."""
+    monitor = LoopMonitor(asyncio.get_running_loop(), threshold=0.1, interval=0.02)
+    blocked_before = METRICS.counter("whosampled_loop_blocked_total")
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        with caplog.at_level(logging.WARNING, logger=loop_monitor.__name__):
+            await asyncio.create_task(_handler(), name="slow-handler")
+            await asyncio.sleep(0.05)
+    finally:
+        monitor.stop()
+
+    reports = [r.getMessage() for r in caplog.records]
+    assert len(reports) == 2
+    assert "_parse_synchronously" in reports[0]
+    assert "slow-handler" in reports[0]
+    assert reports[1].startswith("Event loop was blocked for")
+    assert METRICS.counter("whosampled_loop_blocked_total") == blocked_before + 1
+    assert METRICS.histogram("whosampled_loop_lag_seconds").quantile(1.0) >= 0.25
+
+
+@pytest.mark.asyncio
+async def test_idle_loop_records_lag_without_reports(caplog):
+    """Test that an idle loop records lag samples and logs nothing."""
+    count_before = _lag_count()
+    monitor = LoopMonitor(asyncio.get_running_loop(), threshold=1.0, interval=0.01)
+    monitor.start()
+    try:
+        with caplog.at_level(logging.WARNING, logger=loop_monitor.__name__):
+            await asyncio.sleep(0.2)
+    finally:
+        monitor.stop()
+
+    assert _lag_count() - count_before >= 5
+    assert caplog.records == []
+
+
+@pytest.mark.asyncio
+async def test_start_monitor_can_be_turned_off(monkeypatch):
+    """Test that a threshold of 0 turns the monitor off."""
+    monkeypatch.setenv(loop_monitor.LAG_THRESHOLD_ENV, "0")
+    assert loop_monitor.start_monitor() is None
+
+    monkeypatch.setenv(loop_monitor.LAG_THRESHOLD_ENV, "250")
+    monitor = loop_monitor.start_monitor()
+    try:
+        assert monitor.threshold == 0.25
+    finally:
+        monitor.stop()
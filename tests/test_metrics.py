@@ -0,0 +1,76 @@
+"""Tests for the metrics registry and Prometheus exporter."""
+
+import asyncio
+
+import pytest
+
+from whosampled_connector.metrics import Histogram, Metrics, start_exporter
+
+
+def test_histogram_quantiles():
+    """Test bucket counts and quantile estimates."""
+    histogram = Histogram(buckets=(0.1, 1.0, 10.0))
+    for value in (0.05, 0.05, 0.5, 5.0, 50.0):
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 1, 1, 1]
+    assert histogram.quantile(0.4) == 0.1
+    assert histogram.quantile(0.6) == 1.0
+    # Values past the last bucket report its bound
+    assert histogram.quantile(1.0) == 10.0
+    assert Histogram().quantile(0.5) is None
+
+
+def test_render_prometheus():
+    """Test the text exposition of counters, collected gauges and histograms."""
+    metrics = Metrics()
+    metrics.increment("whosampled_fetches_total", outcome="ok")
+    metrics.increment("whosampled_fetches_total", outcome="ok")
+    metrics.observe("whosampled_parse_seconds", 0.003, kind="html")
+    metrics.add_collector(
+        lambda: [("whosampled_fetches_queued", "gauge", {"priority": "bulk"}, 3)]
+    )
+
+    text = metrics.render_prometheus()
+
+    assert "# TYPE whosampled_fetches_total counter" in text
+    assert 'whosampled_fetches_total{outcome="ok"} 2' in text
+    assert 'whosampled_fetches_queued{priority="bulk"} 3' in text
+    assert "# TYPE whosampled_parse_seconds histogram" in text
+    assert 'whosampled_parse_seconds_bucket{kind="html",le="0.0025"} 0' in text
+    assert 'whosampled_parse_seconds_bucket{kind="html",le="0.005"} 1' in text
+    assert 'whosampled_parse_seconds_bucket{kind="html",le="+Inf"} 1' in text
+    assert 'whosampled_parse_seconds_count{kind="html"} 1' in text
+
+
+def test_timer_records_failures():
+    """Test that timed blocks are recorded even when they raise."""
+    metrics = Metrics()
+    with pytest.raises(ValueError):
+        with metrics.timer("whosampled_format_seconds", format="text"):
+            raise ValueError
+
+    assert metrics.histogram("whosampled_format_seconds", format="text").count == 1
+    snapshot = metrics.snapshot()
+    assert snapshot["histograms"]["whosampled_format_seconds"][0]["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_exporter_serves_metrics():
+    """Test scraping the exporter over HTTP on loopback."""
+    from whosampled_connector.metrics import METRICS
+
+    METRICS.increment("whosampled_fetch_challenge_total")
+    server = await start_exporter(0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        response = (await reader.read()).decode()
+        writer.close()
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    assert response.startswith("HTTP/1.1 200 OK")
+    assert "whosampled_fetch_challenge_total" in response
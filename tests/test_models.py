@@ -0,0 +1,114 @@
+"""Tests for record types."""
+
+from whosampled_connector.models import (
+    CONNECTION_TYPES,
+    Connection,
+    Track,
+    TrackDetails,
+)
+
+
+def test_track_to_dict():
+    """Test converting a search hit to the scraper dictionary shape."""
+    track = Track(
+        "One More Time",
+        "Daft Punk",
+        "https://www.whosampled.com/Daft-Punk/One-More-Time/",
+    )
+
+    assert track.to_dict() == {
+        "title": "One More Time",
+        "artist": "Daft Punk",
+        "url": "https://www.whosampled.com/Daft-Punk/One-More-Time/",
+    }
+
+
+def test_connection_to_dict_youtube_key():
+    """Test that youtube_url is only present when requested or found."""
+    connection = Connection(
+        "Stronger", "Kanye West", "https://www.whosampled.com/Kanye-West/Stronger/"
+    )
+
+    assert "youtube_url" not in connection.to_dict()
+    assert connection.to_dict(keep_missing_youtube=True)["youtube_url"] is None
+
+    with_video = Connection(
+        "Stronger", "Kanye West", connection.url, "https://youtu.be/abc123"
+    )
+    assert with_video.to_dict()["youtube_url"] == "https://youtu.be/abc123"
+
+
+def test_records_are_slotted_and_intern_artists():
+    """Test that records have no instance dict and share artist strings."""
+    # Build the artist names at runtime so they are distinct objects
+    first = Connection("A", "".join(["Daft", " Punk"]), "/a/")
+    second = Connection("B", "".join(["Daft ", "Punk"]), "/b/")
+
+    assert not hasattr(first, "__dict__")
+    assert first.artist is second.artist
+
+
+def test_track_details_to_dict():
+    """Test converting track details to the get_track_details shape."""
+    details = TrackDetails(
+        url="https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/",
+        title="Harder, Better, Faster, Stronger",
+        samples=(
+            Connection("Cola Bottle Baby", "Edwin Birdsong", "/Cola-Bottle-Baby/"),
+        ),
+    )
+
+    result = details.to_dict()
+
+    assert result["title"] == "Harder, Better, Faster, Stronger"
+    assert "youtube_url" not in result
+    assert result["samples"] == [
+        {
+            "track": "Cola Bottle Baby",
+            "artist": "Edwin Birdsong",
+            "url": "/Cola-Bottle-Baby/",
+        }
+    ]
+    for connection_type in CONNECTION_TYPES[1:]:
+        assert result[connection_type] == []
+    assert details.connections("samples") == details.samples
+
+
+def test_track_details_select_sections():
+    """Test keeping only some connection types and the first few of each."""
+    details = TrackDetails(
+        url="/Daft-Punk/Harder,-Better,-Faster,-Stronger/",
+        samples=(Connection("A", "X", "/a/"), Connection("B", "X", "/b/")),
+        sampled_by=(Connection("C", "Y", "/c/"),),
+    )
+
+    selected = details.select(["samples"], max_items=1)
+
+    assert selected.samples == (Connection("A", "X", "/a/"),)
+    assert selected.sampled_by == ()
+    assert selected.sections == ("samples",)
+    assert list(selected.to_dict()) == ["url", "samples"]
+    assert selected.has_sections(["samples"])
+    assert not selected.has_sections(["samples", "covers"])
+    assert details.select() is details
+
+
+def test_track_details_select_pages_within_max_items():
+    """Test paging connections while max_items stays a hard cap."""
+    samples = tuple(Connection(str(i), "X", f"/{i}/") for i in range(5))
+    details = TrackDetails(url="/Daft-Punk/HBFS/", samples=samples)
+
+    first = details.select(limit=2)
+    assert first.samples == samples[:2]
+    assert first.next_offset == 2
+    assert first.to_dict()["next_offset"] == 2
+
+    last = details.select(offset=4, limit=2)
+    assert last.samples == samples[4:]
+    assert last.next_offset is None
+    assert "next_offset" not in last.to_dict()
+
+    # Nothing past max_items, so no page after the cap
+    capped = details.select(max_items=3, offset=2, limit=2)
+    assert capped.samples == samples[2:3]
+    assert capped.next_offset is None
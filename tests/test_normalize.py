@@ -0,0 +1,39 @@
+"""Tests for query normalization."""
+
+from whosampled_connector.normalize import kana_to_romaji, normalize_query, track_key
+
+
+def test_normalize_query_variants_share_key():
+    """Test that trivial query variants normalize to the same key."""
+    assert normalize_query("Chiba Yuki") == "chiba yuki"
+    assert normalize_query(" chiba  yuki ") == "chiba yuki"
+    assert normalize_query("yuki chiba") == "chiba yuki"
+    assert normalize_query("ＣＨＩＢＡ　ＹＵＫＩ") == "chiba yuki"
+    assert normalize_query("Harder, Better, Faster, Stronger!") == (
+        "better faster harder stronger"
+    )
+
+
+def test_normalize_query_options():
+    """Test turning off word sorting and kana transliteration."""
+    assert normalize_query("Yuki Chiba", sort_tokens=False) == "yuki chiba"
+    assert normalize_query("ちば ゆき", sort_tokens=False) == "chiba yuki"
+    assert normalize_query("ちば", transliterate_kana=False) == "ちば"
+
+
+def test_kana_to_romaji():
+    """Test Hepburn transliteration of hiragana and katakana."""
+    assert kana_to_romaji("ちばゆき") == "chibayuki"
+    assert kana_to_romaji("ともだち") == "tomodachi"
+    assert kana_to_romaji("きっと") == "kitto"
+    assert kana_to_romaji("マッチ") == "matchi"
+    assert kana_to_romaji("シャッフル") == "shaffuru"
+    assert kana_to_romaji("ラーメン") == "ramen"
+    assert kana_to_romaji("Team ともだち") == "Team tomodachi"
+
+
+def test_track_key_ignores_trailing_slash_and_fragment():
+    """Test that equivalent track URLs share one key."""
+    url = "https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/"
+    assert track_key(url) == track_key(url.rstrip("/"))
+    assert track_key(url + "#samples") == track_key(url)
@@ -0,0 +1,88 @@
+"""Tests for on-demand profiling and memory snapshots."""
+
+import asyncio
+import os
+import pstats
+import signal
+
+import pytest
+
+from whosampled_connector import profiling
+
+
+@pytest.fixture(autouse=True)
+def profile_dir(tmp_path, monkeypatch):
+    """Write profiles to a temporary directory and stop memory tracing afterwards."""
+    monkeypatch.setenv(profiling.PROFILE_DIR_ENV, str(tmp_path))
+    yield tmp_path
+    profiling.stop_memory_tracing()
+
+
+def _busy_work():
+    return sum(i * i for i in range(20000))
+
+
+async def _keep_busy(stop: asyncio.Event):
+    while not stop.is_set():
+        _busy_work()
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_profile_covers_other_tasks(profile_dir):
+    """Test that a profile records work done by other tasks on the loop."""
+    stop = asyncio.Event()
+    worker = asyncio.create_task(_keep_busy(stop))
+    try:
+        result = await profiling.profile(0.2)
+    finally:
+        stop.set()
+        await worker
+
+    assert os.path.dirname(result["path"]) == str(profile_dir)
+    assert "_busy_work" in result["summary"]
+    stats = pstats.Stats(result["path"])
+    assert any(func[2] == "_busy_work" for func in stats.stats)
+
+
+@pytest.mark.asyncio
+async def test_profile_refuses_concurrent_runs():
+    """Test that only one profile runs at a time."""
+    first = asyncio.create_task(profiling.profile(0.1))
+    await asyncio.sleep(0)
+    with pytest.raises(RuntimeError):
+        await profiling.profile(0.1)
+    await first
+
+
+def test_memory_snapshot_reports_growth(profile_dir):
+    """Test that the second snapshot shows allocations made since the first."""
+    first = profiling.memory_snapshot()
+    assert first["started"] is True
+    assert first["growth"] == []
+
+    retained = [bytearray(1024) for _ in range(2000)]
+    second = profiling.memory_snapshot()
+
+    assert second["started"] is False
+    assert retained
+    assert second["growth"][0]["size_diff"] >= 2000 * 1024
+    assert "test_profiling.py" in second["growth"][0]["site"]
+    assert len(list(profile_dir.glob("*.snapshot"))) == 2
+
+
+@pytest.mark.asyncio
+async def test_memory_signal_writes_snapshot(profile_dir):
+    """Test that SIGUSR2 takes a memory snapshot."""
+    loop = asyncio.get_running_loop()
+    profiling.install_signal_handlers(loop)
+    try:
+        os.kill(os.getpid(), signal.SIGUSR2)
+        for _ in range(100):
+            if list(profile_dir.glob("*.snapshot")):
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        profiling.remove_signal_handlers(loop)
+
+    assert len(list(profile_dir.glob("*.snapshot"))) == 1
@@ -0,0 +1,163 @@
+"""Tests for the priority fetch scheduler."""
+
+import asyncio
+
+import pytest
+
+from whosampled_connector.scheduler import (
+    BULK,
+    INTERACTIVE,
+    PREFETCH,
+    FetchScheduler,
+    current_priority,
+    fetch_priority,
+)
+
+
+async def _hold(scheduler, priority, release, order, name):
+    """Take a slot, record the start order and hold it until released."""
+    async with scheduler.slot(priority):
+        order.append(name)
+        await release.wait()
+
+
+@pytest.mark.asyncio
+async def test_scheduler_limits_concurrency():
+    """Test that no more than capacity fetches run at once."""
+    scheduler = FetchScheduler(capacity=2)
+    release = asyncio.Event()
+    order = []
+
+    tasks = [
+        asyncio.create_task(_hold(scheduler, INTERACTIVE, release, order, i))
+        for i in range(4)
+    ]
+    await asyncio.sleep(0)
+
+    stats = scheduler.stats()[INTERACTIVE]
+    assert stats["in_flight"] == 2
+    assert stats["queued"] == 2
+
+    release.set()
+    await asyncio.gather(*tasks)
+
+    assert order == [0, 1, 2, 3]
+    assert scheduler.stats()[INTERACTIVE]["completed"] == 4
+
+
+@pytest.mark.asyncio
+async def test_scheduler_interactive_goes_first():
+    """Test that queued interactive fetches start before background ones."""
+    scheduler = FetchScheduler(capacity=2)
+    release_first = asyncio.Event()
+    release = asyncio.Event()
+    release.set()
+    order = []
+
+    first = asyncio.create_task(
+        _hold(scheduler, INTERACTIVE, release_first, order, "first")
+    )
+    await asyncio.sleep(0)
+    bulk = asyncio.create_task(_hold(scheduler, BULK, release, order, "bulk"))
+    prefetch = asyncio.create_task(
+        _hold(scheduler, PREFETCH, release, order, "prefetch")
+    )
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(
+        _hold(scheduler, INTERACTIVE, release, order, "interactive")
+    )
+    await asyncio.sleep(0)
+
+    # One slot is reserved for interactive work, so the background fetches wait
+    assert order == ["first", "interactive"]
+
+    release_first.set()
+    await asyncio.gather(first, bulk, prefetch, interactive)
+
+    assert order == ["first", "interactive", "prefetch", "bulk"]
+    assert scheduler.stats()[BULK]["wait_max"] > 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_class_at_its_share_does_not_block_lower_ones():
+    """Test that a prefetch backlog held back by its share lets bulk fetches run."""
+    scheduler = FetchScheduler(capacity=4)
+    release = asyncio.Event()
+    order = []
+
+    tasks = [
+        asyncio.create_task(_hold(scheduler, PREFETCH, release, order, "prefetch 1")),
+        asyncio.create_task(_hold(scheduler, PREFETCH, release, order, "prefetch 2")),
+    ]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(_hold(scheduler, BULK, release, order, "bulk")))
+    await asyncio.sleep(0)
+
+    assert order == ["prefetch 1", "bulk"]
+    assert scheduler.stats()[PREFETCH]["queued"] == 1
+
+    # Further bulk fetches start too, up to the background slots
+    tasks.append(asyncio.create_task(_hold(scheduler, BULK, release, order, "bulk 2")))
+    await asyncio.sleep(0)
+    assert order == ["prefetch 1", "bulk", "bulk 2"]
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert order[-1] == "prefetch 2"
+
+
+@pytest.mark.asyncio
+async def test_scheduler_cancelled_waiter_does_not_leak_slot():
+    """Test that cancelling a queued fetch leaves capacity intact."""
+    scheduler = FetchScheduler(capacity=1)
+    release = asyncio.Event()
+    order = []
+
+    holder = asyncio.create_task(_hold(scheduler, INTERACTIVE, release, order, "a"))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(_hold(scheduler, INTERACTIVE, release, order, "b"))
+    await asyncio.sleep(0)
+
+    waiter.cancel()
+    release.set()
+    await holder
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    stats = scheduler.stats()[INTERACTIVE]
+    assert stats["in_flight"] == 0
+    assert stats["queued"] == 0
+
+    # The slot is freed after the cancellation but before the waiter
+    # resumes, so the cancelled waiter has already left the queue
+    release.clear()
+    holder = asyncio.create_task(_hold(scheduler, INTERACTIVE, release, order, "c"))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(_hold(scheduler, INTERACTIVE, release, order, "d"))
+    await asyncio.sleep(0)
+
+    release.set()
+    waiter.cancel()
+    await holder
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    stats = scheduler.stats()[INTERACTIVE]
+    assert stats["in_flight"] == 0
+    assert stats["queued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_fetch_priority_context():
+    """Test that the fetch priority follows the current task."""
+    assert current_priority() == INTERACTIVE
+
+    with fetch_priority(BULK):
+        assert current_priority() == BULK
+        inner = asyncio.create_task(asyncio.sleep(0, result=current_priority()))
+        assert await inner == BULK
+
+    assert current_priority() == INTERACTIVE
+    with pytest.raises(ValueError):
+        with fetch_priority("urgent"):
+            pass
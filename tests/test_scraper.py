@@ -1,8 +1,11 @@
 """Tests for WhoSampled scraper."""
 
+import asyncio
+
 import pytest
 from unittest.mock import AsyncMock, patch
-from whosampled_connector.scraper import WhoSampledScraper
+from whosampled_connector.scheduler import PREFETCH, fetch_priority
+from whosampled_connector.scraper import PageStatusError, WhoSampledScraper
 
 
 @pytest.mark.asyncio
@@ -60,8 +63,14 @@ async def test_get_track_details_with_youtube(scraper, mock_track_details_html):
     """Test getting track details with YouTube link."""
     test_url = "https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/"
 
-    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+    with (
+        patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch,
+        patch.object(
+            scraper, "_fetch_attribute", new_callable=AsyncMock
+        ) as mock_fetch_attribute,
+    ):
         mock_fetch.return_value = mock_track_details_html
+        mock_fetch_attribute.return_value = None
 
         result = await scraper.get_track_details(test_url, include_youtube=True)
 
@@ -184,30 +193,16 @@ async def test_extract_connections_with_youtube():
     </section>
     """
 
-    track_page_with_youtube = """
-    <html>
-        <body>
-            <div class="embed-placeholder youtube-placeholder" data-id="abc123"></div>
-        </body>
-    </html>
-    """
-
-    track_page_without_youtube = """
-    <html>
-        <body>
-            <p>No YouTube link here</p>
-        </body>
-    </html>
-    """
-
     from bs4 import BeautifulSoup
 
     soup = BeautifulSoup(html, "lxml")
     section = soup.find("section", {"class": "subsection"})
 
-    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+    with patch.object(
+        scraper, "_fetch_attribute", new_callable=AsyncMock
+    ) as mock_fetch:
         # First track has YouTube, second doesn't
-        mock_fetch.side_effect = [track_page_with_youtube, track_page_without_youtube]
+        mock_fetch.side_effect = ["abc123", None]
 
         connections = await scraper._extract_connections_with_youtube(
             section, include_youtube=True
@@ -246,18 +241,15 @@ async def test_get_youtube_links_from_search(scraper):
     </html>
     """
 
-    mock_track_page_html = """
-    <html>
-        <body>
-            <h1 class="trackName">Track Title</h1>
-            <div class="embed-placeholder youtube-placeholder" data-id="test"></div>
-        </body>
-    </html>
-    """
-
-    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
-        # First call returns search results, subsequent calls return track pages
-        mock_fetch.side_effect = [mock_search_html] + [mock_track_page_html] * 10
+    with (
+        patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch,
+        patch.object(
+            scraper, "_fetch_attribute", new_callable=AsyncMock
+        ) as mock_fetch_attribute,
+    ):
+        # Search results come from a full page, YouTube IDs from track pages
+        mock_fetch.return_value = mock_search_html
+        mock_fetch_attribute.return_value = "test"
 
         result = await scraper.get_youtube_links_from_search(
             "Daft Punk One More Time", max_per_section=2
@@ -282,6 +274,39 @@ async def test_get_youtube_links_from_search(scraper):
                     assert "v=" in youtube_url or "youtu.be/" in youtube_url
 
 
+@pytest.mark.asyncio
+async def test_get_youtube_links_from_search_pages(scraper):
+    """Test that later pages skip tracks and only look those up."""
+    mock_search_html = """
+    <html>
+        <body>
+            <a class="trackName" href="/A/One/">One</a>
+            <a class="trackName" href="/B/Two/">Two</a>
+            <a class="trackName" href="/C/Three/">Three</a>
+        </body>
+    </html>
+    """
+
+    with (
+        patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch,
+        patch.object(
+            scraper, "_get_youtube_url", new_callable=AsyncMock
+        ) as mock_youtube,
+    ):
+        mock_fetch.return_value = mock_search_html
+        mock_youtube.return_value = None
+
+        result = await scraper.get_youtube_links_from_search(
+            "query", max_per_section=1, offset=1
+        )
+
+        # No top hit section: the first track is only the top hit on page 1
+        assert result["top_hit"] == []
+        assert [t["track"] for t in result["tracks"]] == ["Three"]
+        assert not result["has_more"]
+        mock_youtube.assert_called_once_with(scraper.BASE_URL + "/C/Three/")
+
+
 @pytest.mark.asyncio
 async def test_get_youtube_links_from_search_no_results(scraper):
     """Test getting YouTube links with no search results."""
@@ -327,19 +352,13 @@ async def test_extract_single_track_with_youtube(scraper):
     </div>
     """
 
-    track_page_html = """
-    <html>
-        <body>
-            <div class="embed-placeholder youtube-placeholder" data-id="abc123"></div>
-        </body>
-    </html>
-    """
-
     soup = BeautifulSoup(html, "lxml")
     track_link = soup.select_one("a.trackName")
 
-    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
-        mock_fetch.return_value = track_page_html
+    with patch.object(
+        scraper, "_fetch_attribute", new_callable=AsyncMock
+    ) as mock_fetch:
+        mock_fetch.return_value = "abc123"
 
         result = await scraper._extract_single_track_with_youtube(track_link)
 
@@ -364,19 +383,13 @@ async def test_extract_single_track_without_youtube(scraper):
     </div>
     """
 
-    track_page_html = """
-    <html>
-        <body>
-            <p>No YouTube link here</p>
-        </body>
-    </html>
-    """
-
     soup = BeautifulSoup(html, "lxml")
     track_link = soup.select_one("a.trackName")
 
-    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
-        mock_fetch.return_value = track_page_html
+    with patch.object(
+        scraper, "_fetch_attribute", new_callable=AsyncMock
+    ) as mock_fetch:
+        mock_fetch.return_value = None
 
         result = await scraper._extract_single_track_with_youtube(track_link)
 
@@ -486,3 +499,918 @@ async def test_extract_artist_name_single_artist():
     assert artist_name == "Hololive English -Advent-"
 
     await scraper.aclose()
+
+
+def test_classify_header():
+    """Test mapping subsection headers to connection types."""
+    from whosampled_connector.scraper import _classify_header
+
+    assert _classify_header("Contains samples of 2 songs") == "samples"
+    assert _classify_header("Sampled") == "samples"
+    assert _classify_header("Was sampled in 342 songs") == "sampled_by"
+    assert _classify_header("Cover of") == "covers"
+    assert _classify_header("Covered in 5 songs") == "covered_by"
+    assert _classify_header("Covered by") == "covered_by"
+    assert _classify_header("Remix of") == "remixes"
+    assert _classify_header("Remixed in 3 songs") == "remixed_by"
+    assert _classify_header("Music Video") is None
+
+
+@pytest.mark.asyncio
+async def test_youtube_index_avoids_refetch(scraper, mock_track_details_html):
+    """Test that YouTube IDs are fetched once per track URL and remembered."""
+    from bs4 import BeautifulSoup
+
+    html = """
+    <section class="subsection">
+        <h3>Contains samples</h3>
+        <a class="trackName" href="/Sample-1/">Sample Track 1</a>
+        <a class="trackName" href="/Sample-2/">Sample Track 2</a>
+        <a class="trackName" href="/Sample-1/">Sample Track 1</a>
+    </section>
+    """
+    section = BeautifulSoup(html, "lxml").find("section")
+
+    with patch.object(
+        scraper, "_fetch_attribute", new_callable=AsyncMock
+    ) as mock_fetch:
+        mock_fetch.side_effect = ["abc123", None]
+
+        connections = await scraper._extract_connections_with_youtube(
+            section, include_youtube=True
+        )
+        # Second call is answered from the index, including the known-missing one
+        again = await scraper._extract_connections_with_youtube(
+            section, include_youtube=True
+        )
+
+        assert mock_fetch.call_count == 2
+        assert connections[0]["youtube_url"] == "https://youtu.be/abc123"
+        assert connections[2]["youtube_url"] == "https://youtu.be/abc123"
+        assert "youtube_url" not in connections[1]
+        assert again == connections
+
+
+@pytest.mark.asyncio
+async def test_youtube_index_missing_video_expires(scraper):
+    """Test that a track without a video is looked up again after the TTL."""
+    track_url = "https://www.whosampled.com/Test/Track/"
+
+    with (
+        patch.object(
+            scraper, "_fetch_attribute", new_callable=AsyncMock
+        ) as mock_fetch_attribute,
+        patch("whosampled_connector.cache.time.monotonic") as mock_time,
+    ):
+        mock_time.return_value = 1000.0
+        mock_fetch_attribute.side_effect = [None, "abc123"]
+
+        assert await scraper._get_youtube_url(track_url) is None
+        assert await scraper._get_youtube_url(track_url) is None
+        assert mock_fetch_attribute.call_count == 1
+
+        mock_time.return_value = 1000.0 + scraper.YOUTUBE_MISSING_TTL
+        assert await scraper._get_youtube_url(track_url) == "https://youtu.be/abc123"
+        assert mock_fetch_attribute.call_count == 2
+
+        # A later miss (e.g. a challenge page) does not forget the video
+        scraper._remember_youtube_id(track_url, None)
+        assert await scraper._get_youtube_url(track_url) == "https://youtu.be/abc123"
+
+
+@pytest.mark.asyncio
+async def test_deferred_youtube_lookups_run_at_bulk_priority(scraper):
+    """Test that background lookups yield to interactive fetches and stop when evicted."""
+    from whosampled_connector.scheduler import BULK, current_priority
+
+    priorities = []
+    release = asyncio.Event()
+
+    async def get_youtube_url(url):
+        priorities.append(current_priority())
+        await release.wait()
+        return None
+
+    scraper.YOUTUBE_JOBS_SIZE = 1
+    scraper._youtube_jobs.max_entries = 1
+    with patch.object(scraper, "_get_youtube_url", side_effect=get_youtube_url):
+        first = scraper.start_youtube_lookups(["https://x/1/"])
+        first_task = scraper._youtube_jobs.get(first)["task"]
+        while not priorities:
+            await asyncio.sleep(0)
+
+        # A newer job pushes the first one out, which cancels its lookups
+        second = scraper.start_youtube_lookups(["https://x/2/"])
+        await asyncio.sleep(0)
+        assert first_task.cancelled() or first_task.cancelling()
+        assert await scraper.youtube_lookup_results(first) is None
+
+        release.set()
+        result = await scraper.youtube_lookup_results(second, wait=1)
+
+    assert result["done"]
+    assert priorities == [BULK, BULK]
+
+
+@pytest.mark.asyncio
+async def test_youtube_index_filled_from_track_page(scraper, mock_track_details_html):
+    """Test that parsing a track page indexes its own YouTube video."""
+    test_url = "https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/"
+
+    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.return_value = mock_track_details_html
+
+        await scraper.get_track_details(test_url, include_youtube=False)
+        youtube_url = await scraper._get_youtube_url(test_url)
+
+        assert mock_fetch.call_count == 1
+        assert youtube_url == "https://youtu.be/gAjR4_CbPpQ"
+
+
+@pytest.mark.asyncio
+async def test_youtube_lookup_uses_minimal_fetch(scraper):
+    """Test that YouTube lookups wait for the embed only, not the whole page."""
+    track_url = "https://www.whosampled.com/Test/Track/"
+
+    with (
+        patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch,
+        patch.object(
+            scraper, "_fetch_attribute", new_callable=AsyncMock
+        ) as mock_fetch_attribute,
+    ):
+        mock_fetch_attribute.return_value = "abc123"
+
+        youtube_url = await scraper._get_youtube_url(track_url)
+
+        assert youtube_url == "https://youtu.be/abc123"
+        mock_fetch.assert_not_called()
+        url, selector, attribute = mock_fetch_attribute.call_args.args
+        assert url == track_url
+        assert "div.embed-placeholder[data-id]" in selector
+        assert attribute == "data-id"
+
+
+def _mock_browser_page(scraper):
+    """Patch _new_page with a mocked context and page sharing one call log."""
+    from unittest.mock import MagicMock
+
+    calls = MagicMock()
+    context = calls.context
+    page = calls.page
+    for method in ("close", "goto", "wait_for_function", "evaluate"):
+        setattr(page, method, AsyncMock())
+    context.close = AsyncMock()
+    handle = MagicMock()
+    handle.json_value = AsyncMock(return_value={"value": "abc123"})
+    page.wait_for_function.return_value = handle
+    new_page = patch.object(
+        scraper, "_new_page", new_callable=AsyncMock, return_value=(context, page)
+    )
+    return calls, new_page
+
+
+@pytest.mark.asyncio
+async def test_fetch_attribute_stops_loading_and_closes_page(scraper):
+    """Test the minimal fetch: commit, wait for the element, stop, clean up."""
+    from unittest.mock import ANY, call
+    from whosampled_connector.scraper import _WAIT_FOR_ATTRIBUTE_JS
+
+    calls, new_page = _mock_browser_page(scraper)
+    with new_page:
+        value = await scraper._fetch_attribute(
+            "https://www.whosampled.com/Test/Track/", "div.embed", "data-id", 500
+        )
+
+    assert value == "abc123"
+    assert [c for c in calls.mock_calls if not c[0].endswith("json_value")] == [
+        call.page.goto(
+            "https://www.whosampled.com/Test/Track/", wait_until="commit", timeout=ANY
+        ),
+        call.page.wait_for_function(
+            _WAIT_FOR_ATTRIBUTE_JS, arg=["div.embed", "data-id", 500], timeout=ANY
+        ),
+        call.page.evaluate("window.stop()"),
+        call.page.close(),
+        call.context.close(),
+    ]
+    assert all(s["in_flight"] == 0 for s in scraper.scheduler.stats().values())
+
+
+@pytest.mark.asyncio
+async def test_fetch_attribute_closes_page_on_error(scraper):
+    """Test that a failed minimal fetch still closes the page and context."""
+    calls, new_page = _mock_browser_page(scraper)
+    calls.page.wait_for_function.side_effect = TimeoutError("timed out")
+
+    with new_page, pytest.raises(TimeoutError):
+        await scraper._fetch_attribute("https://x/", "div.embed", "data-id")
+
+    calls.page.evaluate.assert_not_called()
+    calls.page.close.assert_awaited_once()
+    calls.context.close.assert_awaited_once()
+    assert all(s["in_flight"] == 0 for s in scraper.scheduler.stats().values())
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_records_metrics(scraper, capsys):
+    """Test that page fetches record stage latencies, blocks and challenges."""
+    from unittest.mock import MagicMock
+    from whosampled_connector.metrics import METRICS
+
+    calls, new_page = _mock_browser_page(scraper)
+    for method in ("wait_for_load_state", "wait_for_timeout", "content"):
+        setattr(calls.page, method, AsyncMock())
+    calls.page.goto.return_value = MagicMock(status=403)
+    calls.page.content.return_value = "<title>Just a moment...</title>"
+
+    def navigations():
+        histogram = METRICS.histogram("whosampled_navigation_seconds")
+        return histogram.count if histogram else 0
+
+    before = (
+        navigations(),
+        METRICS.counter("whosampled_fetch_blocked_total", status=403),
+        METRICS.counter("whosampled_fetch_challenge_total"),
+        METRICS.counter("whosampled_fetches_total", outcome="error"),
+    )
+    with new_page:
+        await scraper._fetch_page("https://x/")
+        calls.page.content.side_effect = RuntimeError("crashed")
+        with pytest.raises(RuntimeError):
+            await scraper._fetch_page("https://x/")
+
+    after = (
+        navigations(),
+        METRICS.counter("whosampled_fetch_blocked_total", status=403),
+        METRICS.counter("whosampled_fetch_challenge_total"),
+        METRICS.counter("whosampled_fetches_total", outcome="error"),
+    )
+    assert [a - b for a, b in zip(after, before)] == [2, 2, 1, 1]
+    # Errors are logged, never printed next to the stdio transport
+    assert capsys.readouterr().out == ""
+
+
+def test_candidate_track_urls():
+    """Test building direct track URLs from an artist/title query."""
+    scraper = WhoSampledScraper()
+
+    urls = scraper._candidate_track_urls("daft punk one more time")
+
+    assert urls == [
+        "https://www.whosampled.com/Daft-Punk/One-More-Time/",
+        "https://www.whosampled.com/Daft/Punk-One-More-Time/",
+    ]
+    assert scraper._candidate_track_urls("tomodachi") == []
+
+
+@pytest.mark.asyncio
+async def test_find_track_details_uses_direct_url(scraper, mock_track_details_html):
+    """Test that a valid probed track page is used without a search round trip."""
+    direct_url = "https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/"
+
+    async def fetch(url):
+        if url == direct_url:
+            return mock_track_details_html
+        if "/search/" in url:
+            # The search is slower than the direct probe
+            await asyncio.sleep(1)
+        return "<html><body><h1>Page not found</h1></body></html>"
+
+    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.side_effect = fetch
+
+        result = await scraper.find_track_details(
+            "daft punk harder, better, faster, stronger"
+        )
+
+        assert result["url"] == direct_url
+        assert result["title"] == "Harder, Better, Faster, Stronger"
+        assert result["samples"][0]["track"] == "Cola Bottle Baby"
+        # Only the search and the two probes were fetched, no extra detail fetch
+        assert mock_fetch.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_find_track_details_falls_back_to_search(
+    scraper, mock_search_html, mock_track_details_html
+):
+    """Test that the top search hit is used when no probe is a track page."""
+    search_url_prefix = "https://www.whosampled.com/search/"
+    track_url = "https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/"
+
+    async def fetch(url):
+        if url.startswith(search_url_prefix):
+            return mock_search_html
+        if url == track_url:
+            return mock_track_details_html
+        return "<html><body><h1>Page not found</h1></body></html>"
+
+    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.side_effect = fetch
+
+        result = await scraper.find_track_details("daft punk hbfs")
+
+        assert result["url"] == track_url
+        assert result["sampled_by"][0]["artist"] == "Kanye West"
+
+
+@pytest.mark.asyncio
+async def test_find_track_details_not_found(scraper):
+    """Test that None is returned when neither search nor probes find a track."""
+    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.return_value = "<html><body></body></html>"
+
+        result = await scraper.find_track_details(
+            "nonexistent artist nonexistent track"
+        )
+
+        assert result is None
+
+
+@pytest.mark.asyncio
+async def test_get_track_details_cached(scraper, mock_track_details_html):
+    """Test that a parsed track page is served from cache the second time."""
+    test_url = "https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/"
+
+    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.return_value = mock_track_details_html
+
+        first = await scraper.get_track_details(test_url)
+        second = await scraper.get_track_details(test_url)
+
+        assert mock_fetch.call_count == 1
+        assert first == second
+
+
+@pytest.mark.asyncio
+async def test_search_track_prefetches_top_hit(
+    scraper, mock_search_html, mock_track_details_html
+):
+    """Test that the top search hit's page is fetched in the background."""
+    track_url = "https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/"
+    fetching = asyncio.Event()
+
+    async def fetch(url):
+        if "/search/" in url:
+            return mock_search_html
+        async with scraper.scheduler.slot():
+            fetching.set()
+            await asyncio.sleep(0.01)
+        return mock_track_details_html
+
+    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.side_effect = fetch
+
+        result = await scraper.search_track("daft punk hbfs", prefetch=True)
+        assert result["url"] == track_url
+
+        # The follow-up call is served by the running prefetch, not a new fetch
+        await fetching.wait()
+        details = await scraper.get_track_details(track_url)
+
+        assert details["title"] == "Harder, Better, Faster, Stronger"
+        assert mock_fetch.call_count == 2
+        stats = scraper.prefetch_stats()
+        assert stats["started"] == 1
+        assert stats["completed"] == 1
+        assert stats["hits"] == 1
+        assert stats["hit_ratio"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_queued_prefetch_does_not_delay_interactive_fetch(
+    scraper, mock_track_details_html
+):
+    """Test that a prefetch still waiting for a slot is replaced, not awaited."""
+    track_url = "https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/"
+    release = asyncio.Event()
+
+    async def hold_prefetch_share():
+        with fetch_priority(PREFETCH):
+            async with scraper.scheduler.slot():
+                await release.wait()
+
+    async def fetch(url):
+        async with scraper.scheduler.slot():
+            return mock_track_details_html
+
+    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.side_effect = fetch
+
+        # Another prefetch holds the only prefetch slot, so this one queues
+        holder = asyncio.create_task(hold_prefetch_share())
+        await asyncio.sleep(0)
+        task = scraper.prefetch_track_details(track_url)
+        await asyncio.sleep(0)
+        assert scraper.scheduler.stats()["prefetch"]["queued"] == 1
+
+        details = await asyncio.wait_for(scraper.get_track_details(track_url), 1)
+
+        assert details["title"] == "Harder, Better, Faster, Stronger"
+        assert task.cancelled()
+        assert scraper.prefetch_stats()["cancelled"] == 1
+
+        release.set()
+        await holder
+
+
+@pytest.mark.asyncio
+async def test_prefetch_cancel_and_waste(scraper):
+    """Test cancelling prefetches and counting unused ones as wasted."""
+    fetch_started = asyncio.Event()
+
+    async def slow_fetch(url):
+        fetch_started.set()
+        await asyncio.sleep(10)
+
+    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.side_effect = slow_fetch
+
+        task = scraper.prefetch_track_details("https://www.whosampled.com/A/B/")
+        await fetch_started.wait()
+        scraper.cancel_prefetches()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert scraper.prefetch_stats()["cancelled"] == 1
+
+    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.return_value = '<html><body><h1 class="trackName">B</h1></body></html>'
+
+        await scraper.prefetch_track_details("https://www.whosampled.com/A/C/")
+        scraper.PREFETCH_WINDOW = 0
+
+        stats = scraper.prefetch_stats()
+        assert stats["wasted"] == 1
+        assert stats["hit_ratio"] == 0.0
+
+
+@pytest.mark.asyncio
+async def test_search_tracks_candidates(scraper):
+    """Test listing scored candidates from a single search page."""
+    search_html = """
+    <html>
+        <body>
+            <div class="topResult">
+                <a class="trackTitle" href="/Yuki-Chiba/Team-Tomodachi/">Team Tomodachi</a>
+                <span class="trackArtist">by <a href="/Yuki-Chiba/">Yuki Chiba</a></span>
+            </div>
+            <section>
+                <h3>Connections</h3>
+                <a class="trackName" href="/sample/1/Knxwledge-Tomodachi!/">Tomodachi!</a>
+                <span class="trackArtist">by <a href="/Knxwledge/">Knxwledge</a></span>
+            </section>
+            <section>
+                <h3>Tracks</h3>
+                <a class="trackName" href="/Yuki-Chiba/Team-Tomodachi/">Team Tomodachi</a>
+                <a class="trackName" href="/Other/Song/">Other Song</a>
+                <span class="trackArtist">by <a href="/Other/">Other</a></span>
+            </section>
+        </body>
+    </html>
+    """
+
+    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.return_value = search_html
+
+        candidates = await scraper.search_tracks("yuki chiba team tomodachi", limit=5)
+
+        assert mock_fetch.call_count == 1
+        assert [c["url"] for c in candidates] == [
+            "https://www.whosampled.com/Yuki-Chiba/Team-Tomodachi/",
+            "https://www.whosampled.com/sample/1/Knxwledge-Tomodachi!/",
+            "https://www.whosampled.com/Other/Song/",
+        ]
+        assert candidates[0]["section"] == "top_hit"
+        assert candidates[0]["artist"] == "Yuki Chiba"
+        assert candidates[0]["score"] == 1.0
+        assert candidates[1]["section"] == "connections"
+        assert candidates[2]["section"] == "tracks"
+        assert candidates[2]["score"] == 0.0
+
+        assert len(await scraper.search_tracks("yuki chiba", limit=1)) == 1
+
+
+@pytest.mark.asyncio
+async def test_search_track_normalized_query_cache(scraper, mock_search_html):
+    """Test that query variants are answered from the learned query mapping."""
+    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.return_value = mock_search_html
+
+        first = await scraper.search_track("Daft Punk Harder Better Faster Stronger")
+        second = await scraper.search_track("harder better faster stronger, daft  punk")
+
+        assert mock_fetch.call_count == 1
+        assert first == second
+
+
+@pytest.mark.asyncio
+async def test_search_pages_coalesced(scraper, mock_search_html):
+    """Test that concurrent searches for equivalent queries share one fetch."""
+
+    async def fetch(url):
+        await asyncio.sleep(0.01)
+        return mock_search_html
+
+    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.side_effect = fetch
+
+        results = await asyncio.gather(
+            scraper.search_tracks("Chiba Yuki"),
+            scraper.search_tracks("yuki  chiba"),
+        )
+
+        assert mock_fetch.call_count == 1
+        assert results[0] == results[1]
+
+
+@pytest.mark.asyncio
+async def test_search_track_answered_from_index(scraper, mock_track_details_html):
+    """Test that tracks seen on earlier pages are found without searching."""
+    track_url = "https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/"
+
+    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.return_value = mock_track_details_html
+        await scraper.get_track_details(track_url)
+
+        # The connection "Stronger" by Kanye West was indexed from the page
+        result = await scraper.search_track("Kanye West - Stronger")
+
+        assert mock_fetch.call_count == 1
+        assert result == {
+            "title": "Stronger",
+            "artist": "Kanye West",
+            "url": "https://www.whosampled.com/Kanye-West/Stronger/",
+        }
+
+        # Links that are not /Artist/Track/ pages are not indexed
+        assert len(scraper.track_index) == 2
+
+
+@pytest.mark.asyncio
+async def test_get_track_details_from_graph(
+    tmp_path, monkeypatch, mock_track_details_html
+):
+    """Test that crawled pages are served from the connection graph."""
+    test_url = "https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/"
+    monkeypatch.setenv(WhoSampledScraper.DATA_DIR_ENV, str(tmp_path))
+    scraper = WhoSampledScraper()
+
+    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.return_value = mock_track_details_html
+        first = await scraper.get_track_details(test_url)
+
+        # Drop the in-memory caches, as after a restart with a data directory
+        scraper._details_cache.clear()
+        scraper._youtube_ids.clear()
+
+        with patch.object(
+            scraper, "_fetch_attribute", new_callable=AsyncMock
+        ) as mock_attribute:
+            mock_attribute.return_value = None
+            second = await scraper.get_track_details(test_url, include_youtube=True)
+
+            # The page's own video came back with it, only connections are looked up
+            looked_up = [call.args[0] for call in mock_attribute.call_args_list]
+            assert test_url not in looked_up
+
+        assert mock_fetch.call_count == 1
+        assert second["youtube_url"] == "https://youtu.be/gAjR4_CbPpQ"
+        second.pop("youtube_url")
+        assert second == first
+    await scraper.aclose()
+
+
+@pytest.mark.asyncio
+async def test_no_graph_without_data_dir(scraper, mock_track_details_html):
+    """Test that without a data directory pages live only in the details cache."""
+    test_url = "https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/"
+    assert scraper.graph is None
+
+    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.return_value = mock_track_details_html
+        await scraper.get_track_details(test_url)
+        scraper._details_cache.clear()
+        await scraper.get_track_details(test_url)
+
+    assert mock_fetch.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_trace_sample_lineage(scraper):
+    """Test breadth-first lineage crawl with dedupe and node limit."""
+    base = "https://www.whosampled.com"
+
+    def page(title, *samples):
+        links = "".join(
+            f'<a class="trackName" href="{href}">{name}</a>'
+            f'<span class="trackArtist">by <a href="/X/">X</a></span>'
+            for href, name in samples
+        )
+        return (
+            f'<html><body><h1 class="trackName">{title}</h1>'
+            f'<section class="subsection"><h3>Contains samples</h3>{links}</section>'
+            f"</body></html>"
+        )
+
+    pages = {
+        f"{base}/A/Root/": page("Root", ("/B/Mid/", "Mid"), ("/C/Other/", "Other")),
+        f"{base}/B/Mid/": page("Mid", ("/D/Leaf/", "Leaf"), ("/A/Root/", "Root")),
+        f"{base}/C/Other/": page("Other", ("/D/Leaf/", "Leaf")),
+        f"{base}/D/Leaf/": page("Leaf", ("/E/Deep/", "Deep")),
+    }
+
+    async def fetch(url):
+        return pages[url]
+
+    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.side_effect = fetch
+
+        result = await scraper.trace_sample_lineage(f"{base}/A/Root/", depth=2)
+
+        assert [node["title"] for node in result["nodes"]] == [
+            "Root", "Mid", "Other", "Leaf",
+        ]
+        assert result["nodes"][3]["parent"] == f"{base}/B/Mid/"
+        # Leaf is reached from both Mid and Other but fetched at most once,
+        # and depth 2 stops before fetching it
+        assert mock_fetch.call_count == 3
+        assert len(result["edges"]) == 5
+        assert not result["truncated"]
+
+        limited = await scraper.trace_sample_lineage(
+            f"{base}/A/Root/", depth=3, max_nodes=2
+        )
+        assert [node["title"] for node in limited["nodes"]] == ["Root", "Mid"]
+        assert limited["truncated"]
+
+        with pytest.raises(ValueError):
+            await scraper.trace_sample_lineage(f"{base}/A/Root/", connection_types=("bogus",))
+
+
+def _see_all_page(names, next_page=None, header="Was sampled in 4 songs"):
+    """Build a "see all" page listing the given track names."""
+    links = "".join(
+        f'<a class="trackName" href="/X/{name}/">{name}</a>'
+        f'<span class="trackArtist">by <a href="/X/">X</a></span>'
+        for name in names
+    )
+    pagination = f'<a href="?cp={next_page}">Next</a>' if next_page else ""
+    return (
+        f'<html><body><section class="subsection"><h3>{header}</h3>{links}</section>'
+        f"{pagination}</body></html>"
+    )
+
+
+@pytest.mark.asyncio
+async def test_iter_connections_pages(scraper):
+    """Test streaming a connection type across paginated see-all pages."""
+    base = "https://www.whosampled.com/A/Song/sampled/"
+    pages = {
+        base: _see_all_page(["S1", "S2"], next_page=2),
+        f"{base}?cp=2": _see_all_page(["S3"], next_page=3),
+        f"{base}?cp=3": _see_all_page(["S4"]),
+    }
+
+    async def fetch(url, require_ok=False):
+        assert require_ok
+        return pages[url]
+
+    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.side_effect = fetch
+
+        names = [
+            c.track
+            async for c in scraper.iter_connections(
+                "https://www.whosampled.com/A/Song/", "sampled_by"
+            )
+        ]
+        assert names == ["S1", "S2", "S3", "S4"]
+
+        # A window only fetches the pages it needs (plus one page ahead)
+        mock_fetch.reset_mock()
+        result = await scraper.get_track_connections(
+            "https://www.whosampled.com/A/Song/", "sampled_by", limit=1
+        )
+        assert [c["track"] for c in result["connections"]] == ["S1"]
+        assert result["has_more"]
+        assert mock_fetch.call_count <= 2
+
+
+@pytest.mark.asyncio
+async def test_iter_connections_falls_back_to_preview(
+    scraper, mock_track_details_html
+):
+    """Test that tracks without see-all pages use the track page preview."""
+    track_url = "https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/"
+
+    async def fetch(url, require_ok=False):
+        if url.endswith("/sampled/"):
+            raise PageStatusError(url, 404)
+        return mock_track_details_html
+
+    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.side_effect = fetch
+
+        result = await scraper.get_track_connections(track_url, "sampled_by")
+
+        assert [c["track"] for c in result["connections"]] == ["Stronger"]
+        assert not result["has_more"]
+
+
+@pytest.mark.asyncio
+async def test_see_all_page_of_other_type_is_ignored(scraper, mock_track_details_html):
+    """Test that a page listing another connection type falls back to the preview."""
+    track_url = "https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/"
+
+    async def fetch(url, require_ok=False):
+        if url.endswith("/sampled/"):
+            # e.g. a redirect to a page with other track links
+            return _see_all_page(["Unrelated"], header="Contains samples of 1 song")
+        return mock_track_details_html
+
+    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.side_effect = fetch
+
+        result = await scraper.get_track_connections(track_url, "sampled_by")
+
+    assert [c["track"] for c in result["connections"]] == ["Stronger"]
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_require_ok(scraper):
+    """Test that require_ok turns a non-2xx answer into PageStatusError."""
+    from unittest.mock import MagicMock
+
+    calls, new_page = _mock_browser_page(scraper)
+    for method in ("wait_for_load_state", "wait_for_timeout", "content"):
+        setattr(calls.page, method, AsyncMock())
+    calls.page.goto.return_value = MagicMock(status=404)
+    calls.page.content.return_value = "<html>Not found</html>"
+
+    with new_page:
+        assert await scraper._fetch_page("https://x/") == "<html>Not found</html>"
+        with pytest.raises(PageStatusError) as error:
+            await scraper._fetch_page("https://x/", require_ok=True)
+
+    assert error.value.status == 404
+
+
+@pytest.mark.asyncio
+async def test_get_track_details_sections(scraper, mock_track_details_html):
+    """Test that unrequested sections are not parsed or looked up on YouTube."""
+    test_url = "https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/"
+
+    with patch.object(
+        scraper, "_fetch_page", new_callable=AsyncMock
+    ) as mock_fetch, patch.object(
+        scraper, "_fetch_attribute", new_callable=AsyncMock
+    ) as mock_attribute:
+        mock_fetch.return_value = mock_track_details_html
+        mock_attribute.return_value = None
+
+        result = await scraper.get_track_details(
+            test_url, include_youtube=True, sections=["sampled_by"], max_items=1
+        )
+
+        assert set(result) == {"url", "title", "youtube_url", "sampled_by"}
+        assert [c["track"] for c in result["sampled_by"]] == ["Stronger"]
+        looked_up = [call.args[0] for call in mock_attribute.call_args_list]
+        assert looked_up == ["https://www.whosampled.com/Kanye-West/Stronger/"]
+
+        # Narrower requests are served from the partial parse, wider ones
+        # parse the page again
+        await scraper.get_track_details(test_url, sections=["sampled_by"])
+        assert mock_fetch.call_count == 1
+        full = await scraper.get_track_details(test_url)
+        assert mock_fetch.call_count == 2
+        assert full["samples"][0]["track"] == "Cola Bottle Baby"
+
+        error = await scraper.get_track_details(test_url, sections=["bogus"])
+        assert "error" in error
+
+
+@pytest.mark.asyncio
+async def test_youtube_links_report_progress(scraper, mock_track_details_html):
+    """Test that YouTube enrichment reports progress per finished lookup."""
+    from whosampled_connector.progress import progress_callback
+
+    test_url = "https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/"
+    reports = []
+
+    async def record(progress, total, message):
+        reports.append((progress, total))
+
+    with patch.object(
+        scraper, "_fetch_page", new_callable=AsyncMock
+    ) as mock_fetch, patch.object(
+        scraper, "_fetch_attribute", new_callable=AsyncMock
+    ) as mock_attribute:
+        mock_fetch.return_value = mock_track_details_html
+        mock_attribute.return_value = None
+
+        with progress_callback(record):
+            await scraper.get_track_details(test_url, include_youtube=True)
+
+    # The page itself plus one connection in each of the six sections
+    assert reports == [(done, 7) for done in range(1, 8)]
+
+
+@pytest.mark.asyncio
+async def test_find_track_details_batch(scraper):
+    """Test batch dedupe, per-item errors and the batch deadline."""
+    from whosampled_connector.scheduler import BULK, current_priority
+
+    calls = []
+    priorities = set()
+
+    async def find_track_details(query, *args):
+        calls.append(query)
+        priorities.add(current_priority())
+        if query == "slow":
+            await asyncio.sleep(10)
+        if query == "broken":
+            raise RuntimeError("boom")
+        if query == "nothing":
+            return None
+        return {"url": f"https://www.whosampled.com/{query}/"}
+
+    async def get_track_details(url, *args):
+        calls.append(url)
+        return {"error": "Page failed", "url": url}
+
+    with patch.object(
+        scraper, "find_track_details", side_effect=find_track_details
+    ), patch.object(scraper, "get_track_details", side_effect=get_track_details):
+        results = await scraper.find_track_details_batch(
+            [
+                "Daft Punk",
+                "daft  punk",
+                "nothing",
+                "broken",
+                "slow",
+                "https://www.whosampled.com/A/B/",
+                "https://www.whosampled.com/A/B",
+            ],
+            deadline=0.1,
+        )
+
+    assert len(calls) == 5
+    assert priorities == {BULK}
+    assert [r["status"] for r in results] == [
+        "ok", "ok", "not_found", "error", "timeout", "error", "error",
+    ]
+    assert results[1]["item"] == "daft  punk"
+    assert results[0]["details"] == results[1]["details"]
+    assert results[3]["error"] == "boom"
+    assert results[5]["error"] == "Page failed"
+
+
+@pytest.mark.asyncio
+async def test_find_track_details_batch_progress_only_increases(scraper):
+    """Test that item progress does not mix with the batch's own counter."""
+    from whosampled_connector.progress import progress_callback, report_progress
+
+    reports = []
+
+    async def record(progress, total, message):
+        reports.append((progress, total, message))
+
+    async def find_track_details(query, *args):
+        # Like get_track_details with include_youtube: per-item progress
+        for done in range(1, 5):
+            await report_progress(done, 4, "Fetching YouTube links")
+            await asyncio.sleep(0)
+        return {"url": f"https://www.whosampled.com/{query}/"}
+
+    with patch.object(scraper, "find_track_details", side_effect=find_track_details):
+        with progress_callback(record):
+            await scraper.find_track_details_batch(["a", "b"], include_youtube=True)
+
+    assert {message for _, _, message in reports} == {"Resolving tracks"}
+    progress = [done for done, _, _ in reports]
+    assert progress == sorted(progress)
+    assert progress[-1] == 2
+
+
+@pytest.mark.asyncio
+async def test_bypass_caches_fetches_again(scraper, mock_track_details_html):
+    """Test that cached pages and the graph are skipped inside bypass_caches()."""
+    from whosampled_connector.cache import bypass_caches
+
+    test_url = "https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/"
+
+    with patch.object(scraper, "_fetch_page", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.return_value = mock_track_details_html
+
+        await scraper.fetch_track_details(test_url)
+        await scraper.fetch_track_details(test_url)
+        assert mock_fetch.call_count == 1
+
+        with bypass_caches():
+            await scraper.fetch_track_details(test_url)
+        assert mock_fetch.call_count == 2
+
+        # The fresh page is cached for later calls
+        await scraper.fetch_track_details(test_url)
+        assert mock_fetch.call_count == 2
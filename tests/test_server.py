@@ -6,21 +6,36 @@ from whosampled_connector.server import (
     call_tool,
     list_tools,
     _format_track_details,
+    response_cache,
     scraper,
 )
 
 
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    """Start every test without cached tool responses."""
+    response_cache.clear()
+    yield
+    response_cache.clear()
+
+
 @pytest.mark.asyncio
 async def test_list_tools():
     """Test that all tools are listed."""
     tools = await list_tools()
 
-    assert len(tools) == 4
+    assert len(tools) == 10
     tool_names = [tool.name for tool in tools]
     assert "search_track" in tool_names
+    assert "search_tracks" in tool_names
     assert "get_track_samples" in tool_names
+    assert "get_track_samples_batch" in tool_names
     assert "get_track_details_by_url" in tool_names
     assert "get_youtube_links" in tool_names
+    assert "get_track_connections" in tool_names
+    assert "get_deferred_youtube_links" in tool_names
+    assert "trace_sample_lineage" in tool_names
+    assert "server_stats" in tool_names
 
 
 @pytest.mark.asyncio
@@ -137,9 +152,14 @@ async def test_get_track_samples_tool_success():
             "whosampled_connector.server.scraper.get_track_details",
             new_callable=AsyncMock,
         ) as mock_get_details,
+        patch(
+            "whosampled_connector.server.scraper._probe_track_urls",
+            new_callable=AsyncMock,
+        ) as mock_probe,
     ):
         mock_search.return_value = mock_search_result
         mock_get_details.return_value = mock_details
+        mock_probe.return_value = None
 
         result = await call_tool(
             "get_track_samples",
@@ -185,9 +205,14 @@ async def test_get_track_samples_with_youtube():
             "whosampled_connector.server.scraper.get_track_details",
             new_callable=AsyncMock,
         ) as mock_get_details,
+        patch(
+            "whosampled_connector.server.scraper._probe_track_urls",
+            new_callable=AsyncMock,
+        ) as mock_probe,
     ):
         mock_search.return_value = mock_search_result
         mock_get_details.return_value = mock_details
+        mock_probe.return_value = None
 
         result = await call_tool(
             "get_track_samples",
@@ -402,7 +427,7 @@ async def test_get_youtube_links_tool_with_custom_max():
         )
 
         # Verify the method was called with correct max_per_section
-        mock_get.assert_called_once_with("Artist Track", 5)
+        mock_get.assert_called_once_with("Artist Track", 5, 0)
         assert len(result) == 1
 
 
@@ -477,3 +502,517 @@ def test_format_youtube_links_with_error():
 
     assert "Error" in result
     assert "Network error occurred" in result
+
+
+@pytest.mark.asyncio
+async def test_search_tracks_tool():
+    """Test search_tracks tool listing several candidates."""
+    mock_candidates = [
+        {
+            "title": "Team Tomodachi",
+            "artist": "Yuki Chiba",
+            "url": "https://www.whosampled.com/Yuki-Chiba/Team-Tomodachi/",
+            "section": "top_hit",
+            "score": 1.0,
+        },
+        {
+            "title": "Team Tomodachi",
+            "artist": "Hololive English -Advent-",
+            "url": "https://www.whosampled.com/Hololive-English-Advent/Team-Tomodachi/",
+            "section": "tracks",
+            "score": 0.55,
+        },
+    ]
+
+    with patch(
+        "whosampled_connector.server.scraper.search_tracks", new_callable=AsyncMock
+    ) as mock_search:
+        mock_search.return_value = mock_candidates
+
+        result = await call_tool("search_tracks", {"query": "team tomodachi", "limit": 2})
+
+        mock_search.assert_called_once_with("team tomodachi", 3)
+        text = result[0].text
+        assert "1. Team Tomodachi by Yuki Chiba" in text
+        assert "2. Team Tomodachi by Hololive English -Advent-" in text
+        assert "relevance: 0.55" in text
+
+
+@pytest.mark.asyncio
+async def test_search_tracks_tool_no_results():
+    """Test search_tracks tool with no candidates."""
+    with patch(
+        "whosampled_connector.server.scraper.search_tracks", new_callable=AsyncMock
+    ) as mock_search:
+        mock_search.return_value = []
+
+        result = await call_tool("search_tracks", {"query": "nothing"})
+
+        assert "No results found" in result[0].text
+
+
+@pytest.mark.asyncio
+async def test_trace_sample_lineage_tool():
+    """Test trace_sample_lineage tool renders the lineage as a tree."""
+    root_url = "https://www.whosampled.com/A/Root/"
+    mock_result = {
+        "url": root_url,
+        "nodes": [
+            {"url": root_url, "title": "Root", "artist": "A", "depth": 0,
+             "parent": None, "type": None},
+            {"url": "https://www.whosampled.com/B/Mid/", "title": "Mid", "artist": "B",
+             "depth": 1, "parent": root_url, "type": "samples"},
+            {"url": "https://www.whosampled.com/C/Leaf/", "title": "Leaf", "artist": "C",
+             "depth": 2, "parent": "https://www.whosampled.com/B/Mid/", "type": "samples"},
+        ],
+        "edges": [
+            {"source": root_url, "type": "samples",
+             "target": "https://www.whosampled.com/B/Mid/"},
+            {"source": "https://www.whosampled.com/B/Mid/", "type": "samples",
+             "target": "https://www.whosampled.com/C/Leaf/"},
+        ],
+        "errors": [],
+        "truncated": True,
+    }
+
+    with patch(
+        "whosampled_connector.server.scraper.trace_sample_lineage",
+        new_callable=AsyncMock,
+    ) as mock_trace:
+        mock_trace.return_value = mock_result
+
+        result = await call_tool(
+            "trace_sample_lineage", {"url": root_url, "depth": 2}
+        )
+
+        mock_trace.assert_called_once_with(root_url, 2, 50, ("samples",))
+        text = result[0].text
+        assert "Lineage of: Root by A" in text
+        assert "Tracks: 3, connections: 2" in text
+        assert "  • [samples] Mid by B" in text
+        assert "      • [samples] Leaf by C" in text
+        assert "raise max_nodes" in text
+
+
+@pytest.mark.asyncio
+async def test_trace_sample_lineage_tool_missing_params():
+    """Test trace_sample_lineage tool without URL or query."""
+    result = await call_tool("trace_sample_lineage", {})
+
+    assert "Error" in result[0].text
+
+
+@pytest.mark.asyncio
+async def test_get_track_connections_tool():
+    """Test get_track_connections tool with more results available."""
+    track_url = "https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/"
+    mock_result = {
+        "url": track_url,
+        "type": "sampled_by",
+        "offset": 10,
+        "connections": [
+            {"track": "Stronger", "artist": "Kanye West",
+             "url": "https://www.whosampled.com/Kanye-West/Stronger/"},
+        ],
+        "has_more": True,
+    }
+
+    with patch(
+        "whosampled_connector.server.scraper.get_track_connections",
+        new_callable=AsyncMock,
+    ) as mock_connections:
+        mock_connections.return_value = mock_result
+
+        result = await call_tool(
+            "get_track_connections",
+            {"url": track_url, "connection_type": "sampled_by", "offset": 10},
+        )
+
+        mock_connections.assert_called_once_with(track_url, "sampled_by", 50, 10)
+        text = result[0].text
+        assert "=== SAMPLED_BY (11-11) ===" in text
+        assert "Stronger by Kanye West" in text
+        assert "offset=11" in text
+
+
+@pytest.mark.asyncio
+async def test_get_track_connections_tool_missing_params():
+    """Test get_track_connections tool without connection type."""
+    result = await call_tool("get_track_connections", {"url": "https://x/"})
+
+    assert "Error" in result[0].text
+
+
+@pytest.mark.asyncio
+async def test_get_track_details_by_url_sections():
+    """Test that section filters are passed to the scraper."""
+    track_url = "https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/"
+
+    with patch(
+        "whosampled_connector.server.scraper.get_track_details",
+        new_callable=AsyncMock,
+    ) as mock_details:
+        mock_details.return_value = {"url": track_url, "samples": []}
+
+        result = await call_tool(
+            "get_track_details_by_url",
+            {"url": track_url, "sections": ["samples"], "max_items": 3},
+        )
+
+        mock_details.assert_called_once_with(
+            track_url, False, ["samples"], 3, offset=0, limit=None
+        )
+        assert "No samples, covers, or remixes found" in result[0].text
+
+
+@pytest.mark.asyncio
+async def test_get_track_details_deferred_youtube():
+    """Test returning connections at once and collecting YouTube links later."""
+    track_url = "https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/"
+    kanye_url = "https://www.whosampled.com/Kanye-West/Stronger/"
+    mock_details = {
+        "url": track_url,
+        "sampled_by": [{"track": "Stronger", "artist": "Kanye West", "url": kanye_url}],
+    }
+    links = {track_url: "https://youtu.be/gAjR4_CbPpQ"}
+
+    async def get_youtube_url(url):
+        return links.get(url)
+
+    with patch(
+        "whosampled_connector.server.scraper.get_track_details",
+        new_callable=AsyncMock,
+    ) as mock_details_call, patch.object(
+        scraper, "_get_youtube_url", side_effect=get_youtube_url
+    ):
+        mock_details_call.return_value = mock_details
+
+        result = await call_tool(
+            "get_track_details_by_url",
+            {"url": track_url, "include_youtube": True, "defer_youtube": True},
+        )
+
+        # The details are fetched without YouTube links
+        mock_details_call.assert_called_once_with(
+            track_url, False, None, None, offset=0, limit=None
+        )
+        text = result[0].text
+        assert "Stronger by Kanye West" in text
+        cursor = text.split('cursor "')[1].split('"')[0]
+
+        result = await call_tool("get_deferred_youtube_links", {"cursor": cursor})
+
+        text = result[0].text
+        assert "YouTube links: 1 found, 0 pending" in text
+        assert "YouTube: https://youtu.be/gAjR4_CbPpQ" in text
+        assert f"  • {kanye_url}\n    YouTube: Not found" in text
+
+    result = await call_tool("get_deferred_youtube_links", {"cursor": "missing"})
+    assert "Unknown or expired cursor" in result[0].text
+
+
+@pytest.mark.asyncio
+async def test_call_tool_sends_progress_notifications():
+    """Test that progress reports become MCP progress notifications."""
+    from types import SimpleNamespace
+    from mcp.server.lowlevel.server import request_ctx
+    from whosampled_connector.progress import report_progress
+
+    class Session:
+        send_progress_notification = AsyncMock()
+
+    session = Session()
+    ctx = SimpleNamespace(meta=SimpleNamespace(progressToken="token-1"), session=session)
+
+    async def get_track_details(url, *args, **kwargs):
+        await report_progress(1, 2, "Fetching YouTube links")
+        return {"url": url}
+
+    token = request_ctx.set(ctx)
+    try:
+        with patch(
+            "whosampled_connector.server.scraper.get_track_details",
+            side_effect=get_track_details,
+        ):
+            await call_tool("get_track_details_by_url", {"url": "https://x/"})
+    finally:
+        request_ctx.reset(token)
+
+    session.send_progress_notification.assert_called_once_with(
+        "token-1", 1, 2, message="Fetching YouTube links"
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_track_samples_batch_tool():
+    """Test batch tool output with per-item results and errors."""
+    mock_results = [
+        {"item": "daft punk hbfs", "status": "ok",
+         "details": {"url": "https://www.whosampled.com/Daft-Punk/HBFS/", "title": "HBFS"}},
+        {"item": "nothing", "status": "not_found"},
+        {"item": "slow", "status": "timeout", "error": "Deadline exceeded"},
+    ]
+
+    with patch(
+        "whosampled_connector.server.scraper.find_track_details_batch",
+        new_callable=AsyncMock,
+    ) as mock_batch:
+        mock_batch.return_value = mock_results
+
+        result = await call_tool(
+            "get_track_samples_batch",
+            {"items": ["daft punk hbfs", "nothing", "slow"], "deadline": 30},
+        )
+
+        mock_batch.assert_called_once_with(
+            ["daft punk hbfs", "nothing", "slow"],
+            False,
+            None,
+            None,
+            30,
+            offset=0,
+            limit=None,
+        )
+        text = result[0].text
+        assert "3 items: 1 ok, 1 not_found, 1 timeout" in text
+        assert "##### 1. daft punk hbfs\nTrack: HBFS" in text
+        assert "No results found for 'nothing'" in text
+        assert "Error (timeout): Deadline exceeded" in text
+
+
+@pytest.mark.asyncio
+async def test_get_track_samples_batch_mixed_pages():
+    """Test that the batch cursor comes from the items that have another page."""
+    import json
+
+    mock_results = [
+        {"item": "paged", "status": "ok",
+         "details": {"url": "https://www.whosampled.com/A/Paged/", "next_offset": 5}},
+        {"item": "last page", "status": "ok",
+         "details": {"url": "https://www.whosampled.com/B/Last/"}},
+    ]
+
+    with patch(
+        "whosampled_connector.server.scraper.find_track_details_batch",
+        new_callable=AsyncMock,
+    ) as mock_batch:
+        mock_batch.return_value = mock_results
+
+        result = await call_tool(
+            "get_track_samples_batch",
+            {"items": ["paged", "last page"], "limit": 5, "output_format": "json"},
+        )
+
+    batch = json.loads(result[0].text)
+    assert batch["next_cursor"] == "5"
+    assert batch["results"][0]["details"]["next_cursor"] == "5"
+    assert "next_cursor" not in batch["results"][1]["details"]
+
+
+@pytest.mark.asyncio
+async def test_get_track_details_by_url_json_pages():
+    """Test compact JSON output with a cursor for the next page."""
+    import json
+
+    track_url = "https://www.whosampled.com/Daft-Punk/Harder,-Better,-Faster,-Stronger/"
+
+    with patch(
+        "whosampled_connector.server.scraper.get_track_details",
+        new_callable=AsyncMock,
+    ) as mock_details:
+        mock_details.return_value = {
+            "url": track_url,
+            "samples": [{"track": "Cola Bottle Baby", "artist": "Edwin Birdsong",
+                         "url": "https://www.whosampled.com/Edwin-Birdsong/Cola-Bottle-Baby/"}],
+            "next_offset": 4,
+        }
+
+        result = await call_tool(
+            "get_track_details_by_url",
+            {"url": track_url, "limit": 2, "cursor": "2", "output_format": "json"},
+        )
+
+        mock_details.assert_called_once_with(
+            track_url, False, None, None, offset=2, limit=2
+        )
+        text = result[0].text
+        assert ", " not in text and ": " not in text
+        data = json.loads(text)
+        assert data["next_cursor"] == "4"
+        assert "next_offset" not in data
+        assert data["samples"][0]["artist"] == "Edwin Birdsong"
+
+        result = await call_tool(
+            "get_track_details_by_url", {"url": track_url, "limit": 2, "cursor": "4"}
+        )
+        assert 'call again with cursor "4"' in result[0].text
+
+        result = await call_tool(
+            "get_track_details_by_url", {"url": track_url, "cursor": "nope"}
+        )
+        assert "Error: Invalid cursor 'nope'" in result[0].text
+
+
+@pytest.mark.asyncio
+async def test_trace_sample_lineage_tool_pages():
+    """Test paging lineage tracks, keeping the starting track on every page."""
+    root_url = "https://www.whosampled.com/A/Root/"
+    nodes = [{"url": root_url, "title": "Root", "artist": "A", "depth": 0,
+              "parent": None, "type": None}]
+    edges = []
+    parent = root_url
+    for i in range(3):
+        url = f"https://www.whosampled.com/B/T{i}/"
+        nodes.append({"url": url, "title": f"T{i}", "artist": "B", "depth": i + 1,
+                      "parent": parent, "type": "samples"})
+        edges.append({"source": parent, "type": "samples", "target": url})
+        parent = url
+
+    with patch(
+        "whosampled_connector.server.scraper.trace_sample_lineage",
+        new_callable=AsyncMock,
+    ) as mock_trace:
+        mock_trace.return_value = {"url": root_url, "nodes": nodes, "edges": edges,
+                                   "errors": [], "truncated": False}
+
+        result = await call_tool(
+            "trace_sample_lineage", {"url": root_url, "limit": 1, "cursor": "1"}
+        )
+
+        text = result[0].text
+        assert "Tracks: 2, connections: 1" in text
+        assert f"      • [samples] T1 by B (via https://www.whosampled.com/B/T0/)" in text
+        assert "T2 by B" not in text
+        assert 'call again with cursor "2"' in text
+
+
+@pytest.mark.asyncio
+async def test_repeated_call_uses_response_cache():
+    """Test that an identical call is answered from the response cache."""
+    details = {"url": "https://www.whosampled.com/A/B/", "title": "B", "samples": []}
+    with patch.object(
+        scraper, "find_track_details", new_callable=AsyncMock
+    ) as mock_find:
+        mock_find.return_value = details
+
+        first = await call_tool("get_track_samples", {"query": "a b"})
+        # Same call once defaults and whitespace are normalized
+        second = await call_tool(
+            "get_track_samples", {"query": " a  b", "include_youtube": False}
+        )
+        assert second[0].text == first[0].text
+        assert mock_find.call_count == 1
+
+        await call_tool("get_track_samples", {"query": "a b", "no_cache": True})
+        assert mock_find.call_count == 2
+
+        await call_tool("get_track_samples", {"query": "a b", "output_format": "json"})
+        assert mock_find.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_errors_are_not_cached():
+    """Test that misses, which may be transient, run again."""
+    with patch.object(
+        scraper, "find_track_details", new_callable=AsyncMock
+    ) as mock_find:
+        mock_find.return_value = None
+
+        await call_tool("get_track_samples", {"query": "a b"})
+        await call_tool("get_track_samples", {"query": "a b"})
+
+        assert mock_find.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_cacheability_comes_from_result_data():
+    """Test that a track named like an error is cached and no_cache reaches the scraper."""
+    from whosampled_connector.cache import caches_bypassed
+
+    details = {"url": "https://www.whosampled.com/A/Error/", "title": "Error", "samples": []}
+    bypassed = []
+
+    async def find_track_details(*args, **kwargs):
+        bypassed.append(caches_bypassed())
+        return details
+
+    with patch.object(scraper, "find_track_details", side_effect=find_track_details):
+        first = await call_tool("get_track_samples", {"query": "error"})
+        await call_tool("get_track_samples", {"query": "error"})
+        await call_tool("get_track_samples", {"query": "error", "no_cache": True})
+
+    assert "Track: Error" in first[0].text
+    assert bypassed == [False, True]
+    assert not caches_bypassed()
+
+
+@pytest.mark.asyncio
+async def test_server_stats_tool():
+    """Test that server_stats reports tool latency and cache layers."""
+    import json
+
+    with patch.object(scraper, "search_track", new_callable=AsyncMock) as mock_search:
+        mock_search.return_value = None
+        await call_tool("search_track", {"query": "x"})
+
+    result = await call_tool("server_stats", {})
+    assert "whosampled_tool_seconds{cache=miss, tool=search_track}" in result[0].text
+    assert "Response cache:" in result[0].text
+
+    result = await call_tool("server_stats", {"output_format": "json"})
+    stats = json.loads(result[0].text)
+    layers = {
+        item["labels"]["layer"]
+        for item in stats["metrics"]["counters"]["whosampled_cache_hits_total"]
+    }
+    assert {"response", "details", "query"} <= layers
+    assert "whosampled_fetches_queued" in stats["metrics"]["gauges"]
+
+
+@pytest.mark.asyncio
+async def test_debug_timing_appends_waterfall():
+    """Test that debug_timing adds a timing waterfall and skips the cache."""
+    details = {"url": "https://www.whosampled.com/A/B/", "title": "B", "samples": []}
+    with patch.object(
+        scraper, "find_track_details", new_callable=AsyncMock
+    ) as mock_find:
+        mock_find.return_value = details
+
+        await call_tool("get_track_samples", {"query": "a b"})
+        result = await call_tool(
+            "get_track_samples", {"query": "a b", "debug_timing": True}
+        )
+
+    assert mock_find.call_count == 2
+    assert len(result) == 2
+    assert result[1].text.startswith("=== TIMING")
+    assert "call_tool get_track_samples" in result[1].text
+    assert "  format" in result[1].text
+
+
+@pytest.mark.asyncio
+async def test_admin_tools(tmp_path, monkeypatch):
+    """Test that the admin tools are hidden by default and work when enabled."""
+    from whosampled_connector import profiling, server
+
+    tool_names = [tool.name for tool in await list_tools()]
+    assert "profile_server" not in tool_names
+    result = await call_tool("memory_snapshot", {})
+    assert "Unknown tool" in result[0].text
+
+    monkeypatch.setattr(server, "ADMIN_TOOLS", True)
+    monkeypatch.setenv(profiling.PROFILE_DIR_ENV, str(tmp_path))
+    tool_names = [tool.name for tool in await list_tools()]
+    assert {"profile_server", "memory_snapshot"} <= set(tool_names)
+
+    result = await call_tool("profile_server", {"seconds": 1})
+    assert "Profiled 1s" in result[0].text
+    try:
+        result = await call_tool("memory_snapshot", {"top": 3})
+        assert "Memory tracing started" in result[0].text
+        result = await call_tool("memory_snapshot", {"output_format": "json"})
+        assert '"started":false' in result[0].text
+    finally:
+        profiling.stop_memory_tracing()
+    assert len(list(tmp_path.glob("*.pstats"))) == 1
+    assert len(list(tmp_path.glob("*.snapshot"))) == 2
@@ -0,0 +1,74 @@
+"""Tests for request tracing spans."""
+
+import asyncio
+import json
+
+import pytest
+
+from whosampled_connector import tracing
+from whosampled_connector.tracing import span, start_trace, traced, to_otlp, waterfall
+
+
+@traced("work", ("item",))
+async def _work(item, delay=0.01):
+    with span("inner"):
+        await asyncio.sleep(delay)
+    return item
+
+
+@pytest.mark.asyncio
+async def test_spans_nest_across_tasks():
+    """Test that spans in tasks started under a trace join it with the right parent."""
+    with start_trace("call_tool", tool="test") as trace:
+        await asyncio.gather(_work("a"), _work("b"))
+
+    names = [s.name for s in trace.spans]
+    assert names.count("work") == 2 and names.count("inner") == 2
+    root = trace.root
+    works = [s for s in trace.spans if s.name == "work"]
+    assert all(s.parent_id == root.span_id for s in works)
+    assert {s.attributes["item"] for s in works} == {"a", "b"}
+    inner = [s for s in trace.spans if s.name == "inner"]
+    assert {s.parent_id for s in inner} == {s.span_id for s in works}
+    assert all(s.end_ns >= s.start_ns for s in trace.spans)
+
+
+@pytest.mark.asyncio
+async def test_no_spans_without_trace():
+    """Test that instrumented code runs untraced outside a trace."""
+    with span("orphan") as orphan:
+        assert orphan is None
+    assert await _work("x", 0) == "x"
+
+
+@pytest.mark.asyncio
+async def test_otlp_export_and_waterfall(tmp_path, monkeypatch):
+    """Test the OTLP JSON file export, error status and the text waterfall."""
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setenv(tracing.TRACE_FILE_ENV, str(path))
+
+    with pytest.raises(ValueError):
+        with start_trace("call_tool", tool="test") as trace:
+            await _work("a")
+            with span("format"):
+                raise ValueError("bad")
+    # The file is written off the event loop
+    for _ in range(100):
+        if path.exists():
+            break
+        await asyncio.sleep(0.01)
+
+    request = json.loads(path.read_text().splitlines()[0])
+    spans = request["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert [s["name"] for s in spans] == ["call_tool", "work", "inner", "format"]
+    assert all(s["traceId"] == trace.trace_id for s in spans)
+    assert "parentSpanId" not in spans[0]
+    assert spans[3]["status"] == {"code": 2, "message": "ValueError: bad"}
+    assert to_otlp(trace) == request
+
+    lines = waterfall(trace).splitlines()
+    assert lines[0] == f"=== TIMING (trace {trace.trace_id}) ==="
+    assert lines[1].startswith("call_tool test")
+    assert lines[2].startswith("  work")
+    assert lines[3].startswith("    inner")
+    assert lines[4].endswith("!")